@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Проверка бюджета времени холодного старта: импорт CLI и run() до первого
+приглашения ввода (python -X importtime).
+
+Запуск: make bench-import | python benchmarks/bench_importtime.py [бюджет_мс]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+# Модуль, импорт которого соответствует запуску CLI
+ENTRY_MODULE = 'valutatrade_hub.cli.interface'
+
+# Запуск CLI до первого приглашения: input подменяется и завершает процесс,
+# напечатав время от начала импорта точки входа
+STARTUP_SCRIPT = f"""
+import builtins, sys, time
+started = time.perf_counter()
+
+def first_prompt(prompt=''):
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f'FIRST_PROMPT_MS {{elapsed:.3f}}', file=sys.stderr)
+    raise SystemExit(0)
+
+builtins.input = first_prompt
+from {ENTRY_MODULE} import run
+run()
+"""
+
+# Бюджет на запуск до первого приглашения, миллисекунды
+DEFAULT_BUDGET_MS = 60.0
+
+# Число прогонов (берётся медиана)
+RUNS = 5
+
+# Модули, которые не должны загружаться до первой записи курсов
+FORBIDDEN_MODULES = (
+    'requests',
+    'valutatrade_hub.parser_service.api_clients',
+    'valutatrade_hub.parser_service.updater',
+    'valutatrade_hub.core.alerts',
+    'valutatrade_hub.core.conversion_graph',
+    'valutatrade_hub.core.orders',
+    'valutatrade_hub.core.recurring',
+    'valutatrade_hub.core.valuation',
+)
+
+
+def measure_once(root: str) -> tuple[float, set[str]]:
+    """
+    Один запуск CLI до первого приглашения в чистом интерпретаторе.
+
+    :param root: Корень проекта
+    :type root: str
+    :return: Время до приглашения (мс) и множество загруженных модулей
+    :rtype: tuple[float, set[str]]
+    """
+
+    proc = subprocess.run([sys.executable, '-X', 'importtime',
+                           '-c', STARTUP_SCRIPT],
+                          cwd=root,
+                          capture_output=True,
+                          text=True,
+                          check=True)
+
+    elapsed = 0.0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith('FIRST_PROMPT_MS '):
+            elapsed = float(line.split()[1])
+            continue
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+    return elapsed, modules
+
+
+def main() -> int:
+    """
+    Проверить бюджет и отсутствие сетевого стека при старте.
+
+    :return: Код возврата (0 - бюджет соблюдён)
+    :rtype: int
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+
+    timings = []
+    loaded = set()
+    for _ in range(RUNS):
+        elapsed, modules = measure_once(root)
+        timings.append(elapsed)
+        loaded |= modules
+
+    median = statistics.median(timings)
+    print(f"{ENTRY_MODULE}.run() до приглашения: median {median:.1f} ms "
+          f"(min {min(timings):.1f}, max {max(timings):.1f}, budget {budget:.1f})")
+
+    failed = False
+    leaked = [name for name in FORBIDDEN_MODULES if name in loaded]
+    if leaked:
+        print(f"FAIL: при старте загружены модули {', '.join(leaked)}")
+        failed = True
+    if median > budget:
+        print(f"FAIL: время запуска превышает бюджет {budget:.1f} ms")
+        failed = True
+
+    if not failed:
+        print('OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
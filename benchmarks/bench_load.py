@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон торговли: N одновременных трейдеров (потоки или процессы)
+выполняют смесь login/get_rate/buy/sell/show_portfolio над временным
+каталогом данных. Выводит пропускную способность, перцентили задержек
+и проверку согласованности балансов с журналом сделок.
+
+Запуск: make bench-load | python benchmarks/bench_load.py [трейдеров]
+        [--ops N] [--mode thread|process] [--mix op=вес,...] [--shards N]
+        [--seed N]
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from valutatrade_hub.core.currencies import get_currency  # noqa: E402
+from valutatrade_hub.core.exceptions import InsufficientFundsError  # noqa: E402
+from valutatrade_hub.core.money import (  # noqa: E402
+    ROUND_CREDIT,
+    ROUND_DEBIT,
+    convert_units,
+    from_units,
+    to_units,
+)
+from valutatrade_hub.core.portfolio_store import PortfolioStore  # noqa: E402
+from valutatrade_hub.core.sharding import get_shard_map, rebalance  # noqa: E402
+from valutatrade_hub.core.usecases import (  # noqa: E402
+    buy,
+    get_rate,
+    login,
+    register,
+    sell,
+    show_portfolio,
+)
+from valutatrade_hub.core.utils import load_portfolios, load_users  # noqa: E402
+from valutatrade_hub.logging_config import run_logging  # noqa: E402
+
+DEFAULT_MIX = 'login=10,get_rate=30,buy=25,sell=15,show_portfolio=20'
+START_USD = 100
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """
+    Разобрать смесь операций вида 'buy=25,sell=15'.
+
+    :param mix: Смесь операций
+    :type mix: str
+    :return: {операция: вес}
+    :rtype: dict[str, float]
+    """
+
+    weights = dict()
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        if name not in ('login', 'get_rate', 'buy', 'sell', 'show_portfolio'):
+            raise ValueError(f"Неизвестная операция '{name}'")
+        weights[name] = float(weight)
+    return weights
+
+
+def trader(index: int, ops: int, seed: int, mix: dict[str, float]) -> dict:
+    """
+    Один симулированный трейдер (пользователь trader<index>).
+
+    :param index: Номер трейдера
+    :type index: int
+    :param ops: Число операций
+    :type ops: int
+    :param seed: Зерно генератора
+    :type seed: int
+    :param mix: {операция: вес}
+    :type mix: dict[str, float]
+    :return: Задержки по операциям (мс), журнал сделок и счётчики
+    :rtype: dict
+    """
+
+    rng = random.Random(seed * 1000003 + index)
+    username = f'trader{index}'
+    with open(os.path.join('data', 'rates.json')) as fp:
+        rates = {pair.split('_')[0]: record['rate']
+                 for pair, record in json.load(fp)['pairs'].items()
+                 if pair.endswith('_USD')}
+    codes = sorted(rates)
+    names, weights = list(mix), list(mix.values())
+
+    latencies: dict[str, list[float]] = {name: [] for name in names}
+    holdings: dict[str, int] = dict()
+    trades = []
+    rejected = errors = 0
+
+    for _ in range(ops):
+        op = rng.choices(names, weights)[0]
+        held = [code for code, units in holdings.items() if units > 0]
+        if op == 'sell' and not held:
+            op = 'buy'
+        started = time.perf_counter()
+        try:
+            if op == 'login':
+                login(username, f'pass{index}')
+            elif op == 'get_rate':
+                get_rate(rng.choice(codes), 'USD')
+            elif op == 'show_portfolio':
+                show_portfolio(username)
+            elif op == 'buy':
+                code = rng.choice(codes)
+                amount = round(rng.uniform(0.5, 2.0) / rates[code],
+                               get_currency(code).scale)
+                result = buy(username, code, amount)
+                if result is None:
+                    rejected += 1
+                else:
+                    units = to_units(amount, code)
+                    trades.append((code, units, -convert_units(
+                        units, code, 'USD', result['rate'], ROUND_DEBIT)))
+                    holdings[code] = holdings.get(code, 0) + units
+            else:
+                code = rng.choice(held)
+                units = max(holdings[code] // 2, 1)
+                result = sell(username, code, from_units(units, code))
+                if result is None:
+                    rejected += 1
+                else:
+                    trades.append((code, -units, convert_units(
+                        units, code, 'USD', result['rate'], ROUND_CREDIT)))
+                    holdings[code] -= units
+        except InsufficientFundsError:
+            rejected += 1
+        except Exception:
+            errors += 1
+        latencies[op].append((time.perf_counter() - started) * 1000)
+
+    return {'username': username, 'latencies': latencies, 'trades': trades,
+            'rejected': rejected, 'errors': errors}
+
+
+def _process_trader(args: tuple) -> dict:
+    """
+    Трейдер в отдельном процессе (вывод команд подавляется, журнал действий
+    пишется во временный каталог, как в CLI).
+
+    :param args: Аргументы trader
+    :type args: tuple
+    :return: Результат trader
+    :rtype: dict
+    """
+
+    run_logging()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return trader(*args)
+
+
+def prepare(traders: int, shards: int) -> None:
+    """
+    Подготовить каталог данных: свежий кэш курсов, шарды и пользователи
+    trader0..trader<N-1>.
+
+    :param traders: Число трейдеров
+    :type traders: int
+    :param shards: Число шардов пользовательских данных
+    :type shards: int
+    """
+
+    os.makedirs('data', exist_ok=True)
+    if shards > 1:
+        rebalance(shards)
+    with open(os.path.join(ROOT, 'data', 'rates.json')) as fp:
+        rates = json.load(fp)
+    rates['last_refresh'] = datetime.now().isoformat()
+    with open(os.path.join('data', 'rates.json'), 'w') as fp:
+        json.dump(rates, fp)
+    for index in range(traders):
+        register(f'trader{index}', f'pass{index}')
+
+
+def check_consistency(results: list[dict]) -> list[str]:
+    """
+    Сверить балансы в portfolios.json с журналом сделок трейдеров:
+    у каждого пользователя баланс каждой валюты должен равняться
+    начальному плюс сумма его сделок (иначе сделка потеряна).
+
+    :param results: Результаты трейдеров
+    :type results: list[dict]
+    :return: Описания расхождений
+    :rtype: list[str]
+    """
+
+    paths = get_shard_map().paths()
+    users = {user['username']: user['user_id']
+             for path in paths for user in load_users(path)}
+    store = PortfolioStore.from_records([record for path in paths
+                                         for record in load_portfolios(path)])
+    problems = []
+    if len(users) != len(results):
+        problems.append(f"users.json: {len(users)} пользователей "
+                        f"вместо {len(results)}")
+
+    for result in results:
+        expected = {'USD': to_units(START_USD, 'USD')}
+        for code, units, usd_units in result['trades']:
+            expected[code] = expected.get(code, 0) + units
+            expected['USD'] += usd_units
+        user_id = users.get(result['username'])
+        actual = store.wallets(user_id) if user_id in store else {}
+        for code in sorted(set(expected) | set(actual)):
+            if expected.get(code, 0) != actual.get(code, 0):
+                problems.append(f"{result['username']} {code}: ожидалось "
+                                f"{expected.get(code, 0)}, в файле "
+                                f"{actual.get(code, 0)}")
+    return problems
+
+
+def percentile(values: list[float], level: float) -> float:
+    """
+    Перцентиль отсортированной выборки (ближайший ранг).
+
+    :param values: Отсортированные значения
+    :type values: list[float]
+    :param level: Уровень, 0..100
+    :type level: float
+    :return: Значение перцентиля
+    :rtype: float
+    """
+
+    return values[max(int(len(values) * level / 100 + 0.5) - 1, 0)]
+
+
+def main() -> int:
+    """
+    Прогнать нагрузку и вывести статистику.
+
+    :return: Код возврата (0 - балансы согласованы и ошибок нет)
+    :rtype: int
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('traders', type=int, nargs='?', default=8)
+    parser.add_argument('--ops', type=int, default=200)
+    parser.add_argument('--mode', choices=['thread', 'process'], default='process')
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    # Данные пишутся во временный каталог, чтобы не трогать data/ проекта
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                prepare(args.traders, args.shards)
+        run_logging()
+
+        jobs = [(index, args.ops, args.seed, mix) for index in range(args.traders)]
+        started = time.perf_counter()
+        if args.mode == 'process':
+            context = multiprocessing.get_context(
+                'fork' if 'fork' in multiprocessing.get_all_start_methods()
+                else 'spawn')
+            with ProcessPoolExecutor(args.traders, mp_context=context) as pool:
+                results = list(pool.map(_process_trader, jobs))
+        else:
+            with open(os.devnull, 'w') as devnull, \
+                    contextlib.redirect_stdout(devnull), \
+                    ThreadPoolExecutor(args.traders) as pool:
+                results = list(pool.map(lambda job: trader(*job), jobs))
+        elapsed = time.perf_counter() - started
+
+        problems = check_consistency(results)
+        os.chdir(ROOT)
+
+    total_ops = sum(len(values) for result in results
+                    for values in result['latencies'].values())
+    total_trades = sum(len(result['trades']) for result in results)
+    rejected = sum(result['rejected'] for result in results)
+    errors = sum(result['errors'] for result in results)
+
+    print(f"traders: {args.traders} ({args.mode}), shards: {args.shards}, "
+          f"wall: {elapsed:.2f} s")
+    print(f"throughput: {total_ops / elapsed:.1f} ops/s, "
+          f"{total_trades / elapsed:.1f} trades/s "
+          f"(trades: {total_trades}, rejected: {rejected}, errors: {errors})")
+    print(f"{'op':>15} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for name in mix:
+        values = sorted(value for result in results
+                        for value in result['latencies'][name])
+        if not values:
+            continue
+        print(f"{name:>15} {len(values):7d} {percentile(values, 50):9.2f} "
+              f"{percentile(values, 95):9.2f} {percentile(values, 99):9.2f} "
+              f"{values[-1]:9.2f}")
+
+    if problems:
+        print(f"consistency: FAILED ({len(problems)} расхождений)")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+    else:
+        print("consistency: OK (балансы совпадают с журналом сделок)")
+    return 1 if problems or errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон RatesUpdater против локального симулятора провайдеров.
+
+Запуск: make bench-updater | python benchmarks/bench_updater.py [итераций]
+        [--latency-ms N] [--error-rate P] [--timeout-rate P] [--seed N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from valutatrade_hub.core.exceptions import ApiRequestError  # noqa: E402
+from valutatrade_hub.parser_service.config import ParserConfig  # noqa: E402
+from valutatrade_hub.parser_service.simulator import (  # noqa: E402
+    ProviderSimulator,
+    SimulatorConfig,
+)
+from valutatrade_hub.parser_service.updater import RatesUpdater  # noqa: E402
+
+
+def main() -> int:
+    """
+    Прогнать обновление курсов заданное число раз и вывести статистику.
+
+    :return: Код возврата (0 - хотя бы одно обновление записало курсы)
+    :rtype: int
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('iterations', type=int, nargs='?', default=200)
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    simulator = ProviderSimulator(SimulatorConfig(
+        PORT=0, LATENCY_MS=args.latency_ms, JITTER_MS=args.jitter_ms,
+        RATE_LIMIT_RATE=args.error_rate / 2, SERVER_ERROR_RATE=args.error_rate / 2,
+        TIMEOUT_RATE=args.timeout_rate, HANG_SECONDS=2.0, SEED=args.seed))
+    url = simulator.start()
+
+    config = ParserConfig(SIMULATOR_URL=url, REQUEST_TIMEOUT=1)
+    timings = []
+    failed = partial = 0
+
+    # Данные пишутся во временный каталог, чтобы не трогать data/ проекта
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        updater = RatesUpdater(config)
+        for _ in range(args.iterations):
+            output = io.StringIO()
+            started = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(output):
+                    updater.run_update()
+            except ApiRequestError:
+                failed += 1
+            else:
+                partial += 'ERROR' in output.getvalue()
+            timings.append((time.perf_counter() - started) * 1000)
+        os.chdir(ROOT)
+
+    simulator.stop()
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"updates: {args.iterations}, failed: {failed}, partial: {partial}")
+    print(f"latency ms: median {statistics.median(timings):.1f}, "
+          f"p95 {p95:.1f}, max {timings[-1]:.1f}")
+    print(f"simulator: {simulator.stats}")
+    return 1 if failed == args.iterations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
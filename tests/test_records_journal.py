@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+
+from valutatrade_hub.core import utils
+from valutatrade_hub.core.utils import (
+    append_portfolios,
+    append_users,
+    load_portfolios,
+    load_users,
+    records_version,
+    save_users,
+)
+
+
+def _user(user_id: int, username: str, salt: str = 's') -> dict:
+    """
+    Запись пользователя для тестов.
+    """
+
+    return {'user_id': user_id, 'username': username,
+            'hashed_password': 'h', 'salt': salt,
+            'registration_date': '2025-01-01T00:00:00'}
+
+
+def _journal(data_path, name: str = 'users') -> str:
+    return os.path.join(data_path, f'{name}.journal')
+
+
+def test_append_reload_and_merge(tmp_path):
+    save_users([_user(1, 'a'), _user(2, 'b')], tmp_path)
+    before = records_version(tmp_path, 'users.json')
+
+    append_users([_user(2, 'b', salt='new'), _user(3, 'c')], tmp_path)
+
+    assert os.path.exists(_journal(tmp_path))
+    assert records_version(tmp_path, 'users.json') != before
+    users = load_users(tmp_path)
+    assert [user['user_id'] for user in users] == [1, 2, 3]
+    assert users[1]['salt'] == 'new'
+    # Основной файл не переписывался: изменения только в журнале
+    with open(tmp_path / 'users.json') as fp:
+        assert len(json.load(fp)) == 2
+
+
+def test_later_journal_records_win(tmp_path):
+    save_users([_user(1, 'a')], tmp_path)
+    append_users([_user(1, 'a', salt='first')], tmp_path)
+    append_users([_user(1, 'a', salt='second')], tmp_path)
+
+    assert load_users(tmp_path) == [_user(1, 'a', salt='second')]
+
+
+def test_append_without_file_writes_file(tmp_path):
+    append_portfolios([{'user_id': 1, 'wallets': {}}], tmp_path)
+
+    assert os.path.exists(tmp_path / 'portfolios.json')
+    assert not os.path.exists(_journal(tmp_path, 'portfolios'))
+    assert load_portfolios(tmp_path) == [{'user_id': 1, 'wallets': {}}]
+
+
+def test_journal_with_other_base_is_skipped(tmp_path):
+    save_users([_user(1, 'a')], tmp_path)
+    with open(_journal(tmp_path), 'w') as fp:
+        fp.write(json.dumps({'base': 12345}) + '\n')
+        fp.write(json.dumps(_user(2, 'b')) + '\n')
+
+    assert load_users(tmp_path) == [_user(1, 'a')]
+
+
+def test_journal_of_replaced_file_is_skipped(tmp_path):
+    save_users([_user(1, 'a')], tmp_path)
+    append_users([_user(2, 'b')], tmp_path)
+    # Другой процесс заменил файл, не успев удалить журнал
+    with open(tmp_path / 'users.json', 'w') as fp:
+        json.dump([_user(7, 'z')], fp)
+
+    assert load_users(tmp_path) == [_user(7, 'z')]
+    # Следующая дозапись начинает журнал заново, для нового файла
+    append_users([_user(8, 'y')], tmp_path)
+    assert load_users(tmp_path) == [_user(7, 'z'), _user(8, 'y')]
+
+
+def test_partial_last_line_is_ignored(tmp_path):
+    save_users([_user(1, 'a')], tmp_path)
+    append_users([_user(2, 'b')], tmp_path)
+    with open(_journal(tmp_path), 'a') as fp:
+        fp.write('{"user_id": 3, "usern')
+
+    assert [user['user_id'] for user in load_users(tmp_path)] == [1, 2]
+
+
+def test_copied_directory_keeps_journal(tmp_path):
+    source, target = tmp_path / 'a', tmp_path / 'b'
+    os.makedirs(source)
+    save_users([_user(1, 'a')], source)
+    append_users([_user(2, 'b')], source)
+    os.makedirs(target)
+    for name in ('users.json', 'users.journal'):
+        with open(source / name, 'rb') as src, open(target / name, 'wb') as dst:
+            dst.write(src.read())
+
+    assert load_users(target) == load_users(source)
+
+
+def test_rollover_rewrites_file_and_removes_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'RECORDS_JOURNAL_BYTES', 200)
+    save_users([_user(1, 'a')], tmp_path)
+    append_users([_user(i, f'u{i}') for i in range(2, 5)], tmp_path)
+    assert os.path.getsize(_journal(tmp_path)) >= 200
+
+    append_users([_user(5, 'u5')], tmp_path)
+
+    assert not os.path.exists(_journal(tmp_path))
+    with open(tmp_path / 'users.json') as fp:
+        on_disk = json.load(fp)
+    assert [user['user_id'] for user in on_disk] == [1, 2, 3, 4, 5]
+    assert load_users(tmp_path) == on_disk
+
+
+def test_read_retries_when_file_is_replaced_mid_read(tmp_path, monkeypatch):
+    save_users([_user(1, 'a')], tmp_path)
+    append_users([_user(2, 'b')], tmp_path)
+
+    read_journal = utils._read_journal
+    calls = []
+
+    def compact_then_read(filepath, base):
+        # Между чтением файла и журнала другой процесс сворачивает журнал
+        if not calls:
+            utils._dump_atomic([_user(1, 'a'), _user(2, 'b'), _user(3, 'c')],
+                               filepath)
+        calls.append(base)
+        return read_journal(filepath, base)
+
+    monkeypatch.setattr(utils, '_read_journal', compact_then_read)
+
+    users = load_users(tmp_path)
+
+    assert len(calls) == 2
+    assert [user['user_id'] for user in users] == [1, 2, 3]
+
+
+def test_reads_during_rollover_never_lose_records(tmp_path, monkeypatch):
+    # Журнал сворачивается в файл каждые несколько дозаписей: читатель,
+    # прочитавший старый файл до замены, не должен потерять записи журнала
+    monkeypatch.setattr(utils, 'RECORDS_JOURNAL_BYTES', 400)
+    save_users([_user(1, 'u1')], tmp_path)
+    n_records = 1000
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        try:
+            for user_id in range(2, n_records + 1):
+                with utils.data_lock(str(tmp_path)):
+                    append_users([_user(user_id, f'u{user_id}')], tmp_path)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def reader():
+        seen = 0
+        while not done.is_set():
+            try:
+                ids = [user['user_id'] for user in load_users(tmp_path)]
+            except Exception as e:
+                errors.append(e)
+                return None
+            if ids != list(range(1, len(ids) + 1)) or len(ids) < seen:
+                errors.append(AssertionError(f'{seen} -> {ids}'))
+                return None
+            seen = len(ids)
+
+    threads = [threading.Thread(target=writer)] + \
+        [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(load_users(tmp_path)) == n_records
@@ -0,0 +1,81 @@
+import json
+import os
+
+from valutatrade_hub.core.repository import Repository
+from valutatrade_hub.core.utils import save_portfolios, save_users
+
+
+def _journal_lines(path) -> list[dict]:
+    with open(path) as fp:
+        return [json.loads(line) for line in fp.read().splitlines()]
+
+
+def _repository_with_users(data_path, count: int) -> Repository:
+    """
+    Каталог с count пользователями по 100 USD.
+    """
+
+    repository = Repository(str(data_path))
+    for i in range(1, count + 1):
+        user = repository.add_user(f'u{i}', 'password', user_id=i)
+        repository.get_portfolio(user.user_id).ensure_wallet('USD') \
+            .deposit_units(10000)
+    repository.commit()
+    return repository
+
+
+def test_commit_appends_only_changed_records(tmp_path):
+    save_users([], tmp_path)
+    save_portfolios([], tmp_path)
+    _repository_with_users(tmp_path, 3)
+
+    repository = Repository(str(tmp_path))
+    repository.get_portfolio(2).ensure_wallet('BTC').deposit_units(5)
+    repository.commit()
+
+    records = _journal_lines(tmp_path / 'portfolios.journal')
+    assert records[-1]['user_id'] == 2
+    assert set(records[-1]['wallets']) == {'USD', 'BTC'}
+    # Пользователи не менялись - журнал пользователей не рос
+    users_journal = _journal_lines(tmp_path / 'users.journal')
+    assert [record['user_id'] for record in users_journal[1:]] == [1, 2, 3]
+
+
+def test_commit_is_visible_to_new_repository(tmp_path):
+    save_users([], tmp_path)
+    save_portfolios([], tmp_path)
+    _repository_with_users(tmp_path, 2)
+
+    repository = Repository(str(tmp_path))
+    assert repository.find_user('u2').user_id == 2
+    wallets = repository.get_portfolio(2).wallets
+    assert wallets['USD'].units == 10000
+
+
+def test_commit_patches_built_store(tmp_path):
+    save_users([], tmp_path)
+    save_portfolios([], tmp_path)
+    _repository_with_users(tmp_path, 2)
+
+    repository = Repository(str(tmp_path))
+    store = repository.store
+    repository.get_portfolio(1).ensure_wallet('ETH').deposit_units(7)
+    repository.get_portfolio(1).get_wallet('USD').withdraw_units(100)
+    repository.commit()
+
+    assert store.wallets(1) == {'USD': 9900, 'ETH': 7}
+    assert store.wallets(2) == {'USD': 10000}
+    assert Repository(str(tmp_path)).store.wallets(1) == store.wallets(1)
+
+
+def test_get_portfolio_hydrates_only_requested_user(tmp_path):
+    save_users([], tmp_path)
+    save_portfolios([], tmp_path)
+    _repository_with_users(tmp_path, 3)
+
+    repository = Repository(str(tmp_path))
+    repository.get_portfolio(3)
+
+    assert list(repository._portfolios) == [3]
+    assert repository._store is None
+    assert os.path.exists(tmp_path / 'portfolios.journal')
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from valutatrade_hub.core import sharding
+from valutatrade_hub.core.sharding import (
+    ROOT_SHARD_DIR,
+    ShardMap,
+    get_shard_map,
+    rebalance,
+)
+from valutatrade_hub.core.utils import load_users, save_portfolios, save_users
+from valutatrade_hub.infra.settings import config
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    """
+    Временный каталог данных с 39 пользователями в корне.
+    """
+
+    config.get('data_path')
+    monkeypatch.setitem(config._config, 'data_path', str(tmp_path))
+    monkeypatch.setattr(sharding, '_maps', dict())
+    save_users([{'user_id': i, 'username': f'user{i}', 'hashed_password': 'h',
+                 'salt': 's', 'registration_date': '2025-01-01T00:00:00'}
+                for i in range(1, 40)], tmp_path)
+    save_portfolios([{'user_id': i, 'wallets': {}} for i in range(1, 40)],
+                    tmp_path)
+    return tmp_path
+
+
+def test_single_shard_stays_in_root(data_path):
+    shard_map = get_shard_map()
+
+    assert shard_map.paths() == [os.path.normpath(data_path)]
+    assert shard_map.locate('user1')[0] == os.path.normpath(data_path)
+    assert os.path.exists(data_path / 'users.json')
+    assert not os.path.exists(data_path / ROOT_SHARD_DIR)
+
+
+def test_rebalance_moves_root_shard_and_keeps_users(data_path):
+    result = rebalance(3)
+
+    assert not os.path.exists(data_path / 'users.json')
+    assert ShardMap.load(str(data_path)).home == ROOT_SHARD_DIR
+    assert sum(result['users'].values()) == 39
+    shard_map = get_shard_map()
+    for i in range(1, 40):
+        path, _ = shard_map.locate(f'user{i}')
+        assert f'user{i}' in {user['username'] for user in load_users(path)}
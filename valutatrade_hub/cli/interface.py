@@ -6,16 +6,81 @@ from valutatrade_hub.core.exceptions import (
     InsufficientFundsError,
 )
 from valutatrade_hub.core.usecases import (
+    add_alert,
+    add_recurring,
+    backfill,
     buy,
+    cancel_order,
+    compact_history,
+    create_backup,
+    export_portfolios,
     get_rate,
+    import_users,
     login,
+    place_order,
+    publish_rates,
+    rebalance_portfolios,
+    rebalance_shards,
     register,
+    remove_alert,
+    remove_recurring,
+    restore_backup,
+    risk_report,
+    run_recurring,
     sell,
+    show_alerts,
+    show_arbitrage,
+    show_backups,
+    show_best_route,
+    show_currencies,
+    show_leaderboard,
+    show_orders,
     show_portfolio,
+    show_rate_stats,
     show_rates,
+    show_recurring,
+    show_risk,
+    subscribe_rates,
+    update_metadata,
     update_rates,
+    watch_rates,
 )
 from valutatrade_hub.logging_config import run_logging
+from valutatrade_hub.parser_service.storage import add_rates_setup
+
+
+def parse_options(options: list[str],
+                  required: tuple[str, ...],
+                  optional: tuple[str, ...] = ()) -> dict[str, str]:
+    """
+    Разобрать параметры вида --ключ значение, указанные в любом порядке.
+    
+    :param options: Токены параметров
+    :type options: list[str]
+    :param required: Обязательные параметры (без --)
+    :type required: tuple[str, ...]
+    :param optional: Необязательные параметры (без --)
+    :type optional: tuple[str, ...]
+    :return: Словарь параметр → значение
+    :rtype: dict[str, str]
+    """
+
+    if len(options) % 2 != 0:
+        raise ValueError('Некорректно введена команда! Введите info.')
+
+    parsed = dict()
+    for key, value in zip(options[::2], options[1::2]):
+        name = key[2:]
+        if not key.startswith('--') or name not in required + optional:
+            raise ValueError(f"Неизвестный параметр '{key}'! Введите info.")
+        if name in parsed:
+            raise ValueError(f"Параметр '{key}' указан дважды!")
+        parsed[name] = value
+
+    for name in required:
+        if name not in parsed:
+            raise ValueError(f"Не указан параметр '--{name}'!")
+    return parsed
 
 
 def show_info(key: str = 'all') -> None:
@@ -38,6 +103,15 @@ def show_info(key: str = 'all') -> None:
                              "отобразить портфель пользователя в базовой валюте "\
                              "(по умолчанию - в USD)"
     
+    info['show-risk'] = "<command> show-risk - отобразить волатильность, "\
+                        "корреляции и VaR/ES своего портфеля"
+    
+    info['leaderboard'] = "<command> leaderboard [--top <N>] [--base <код_валюты>] "\
+                          "- отобразить рейтинг портфелей и своё место"
+    
+    info['risk-report'] = "<command> risk-report [--file <путь>] - посчитать "\
+                          "VaR/ES всех портфелей и сохранить отчёт в CSV"
+    
     info['buy'] = "<command> buy --currency <код_валюты> --amount "\
                   "<количество_валюты> - купить валюту (за USD)"
     
@@ -50,8 +124,89 @@ def show_info(key: str = 'all') -> None:
     info['update-rates'] = "<command> update-rates [--source "\
                            "coingecko|exchangerate] - обновить курс валют"
     
+    info['update-metadata'] = "<command> update-metadata - обновить капитализацию, "\
+                              "эмиссию и названия криптовалют"
+    
+    info['currencies'] = "<command> currencies - отобразить поддерживаемые валюты"
+    
+    info['backfill'] = "<command> backfill --pair <пара> --from <ГГГГ-ММ-ДД> "\
+                       "--to <ГГГГ-ММ-ДД> - загрузить историю курсов пары"
+    
+    info['compact-history'] = "<command> compact-history - перенести "\
+                              "устаревшую историю курсов в сжатый архив"
+    
+    info['rebalance-shards'] = "<command> rebalance-shards --count <число> - "\
+                               "разнести пользователей по шардам каталога данных"
+    
+    info['rebalance-portfolios'] = "<command> rebalance-portfolios --target "\
+                                   "<валюта>=<вес>[,...] [--users <имя>[,...]] "\
+                                   "[--min-trade <USD>] [--mode dry-run|apply] - "\
+                                   "привести портфели к целевому распределению"
+    
+    info['import-users'] = "<command> import-users --file <путь.csv> - "\
+                           "зарегистрировать пользователей из CSV (username,password)"
+    
+    info['export-portfolios'] = "<command> export-portfolios --format csv|jsonl "\
+                                "[--file <путь>] - выгрузить портфели всех "\
+                                "пользователей"
+    
+    info['backup'] = "<command> backup - сделать резервную копию каталога данных"
+    
+    info['backups'] = "<command> backups - отобразить список резервных копий"
+    
+    info['restore'] = "<command> restore --name <копия> [--files <файл>[,<файл>...]] "\
+                      "- восстановить данные из резервной копии"
+    
     info['show-rates'] = "<command> show-rates [--currency <код_валюты>] [--top "\
-                         "<топ_курсов>] [--base <баз_валюта>] - отобразить курсы валют"
+                         "<топ_курсов>] [--base <баз_валюта>] [--sort rate|change] "\
+                         "- отобразить курсы валют"
+    
+    info['rate-stats'] = "<command> rate-stats --pair <пара> - отобразить "\
+                         "статистику курса за 1ч/24ч/7д"
+    
+    info['best-route'] = "<command> best-route --from <исх_валюта> --to "\
+                         "<цел_валюта> - найти маршрут конвертации с лучшим курсом"
+    
+    info['arbitrage'] = "<command> arbitrage - найти арбитражные циклы в "\
+                        "текущих курсах"
+    
+    info['order-add'] = "<command> order-add --side buy|sell --type limit|stop "\
+                        "--currency <код_валюты> --amount <количество_валюты> "\
+                        "--price <курс> - выставить отложенную заявку"
+    
+    info['orders'] = "<command> orders - отобразить свои открытые заявки"
+    
+    info['order-cancel'] = "<command> order-cancel --id <номер> - "\
+                           "отменить заявку"
+    
+    info['dca-add'] = "<command> dca-add --side buy|sell --currency <код_валюты> "\
+                      "--usd <сумма> --every <период: 30m|12h|1d|1w> - "\
+                      "создать регулярную заявку"
+    
+    info['dca'] = "<command> dca - отобразить свои регулярные заявки"
+    
+    info['dca-remove'] = "<command> dca-remove --id <номер> - "\
+                         "удалить регулярную заявку"
+    
+    info['dca-run'] = "<command> dca-run - исполнить наступившие регулярные заявки"
+    
+    info['watch-rates'] = "<command> watch-rates [--pair <пара>[,<пара>...]] - "\
+                          "выводить изменения курсов по мере обновления"
+    
+    info['publish-rates'] = "<command> publish-rates [--address <хост:порт>] - "\
+                            "обновлять курсы и рассылать их другим узлам"
+    
+    info['subscribe-rates'] = "<command> subscribe-rates [--address <хост:порт>] "\
+                              "- получать курсы от узла-публикатора"
+    
+    info['alert-add'] = "<command> alert-add --pair <пара> --above|--below "\
+                        "<курс> | --move <процент> [--window <секунд>] - "\
+                        "создать оповещение о курсе"
+    
+    info['alerts'] = "<command> alerts - отобразить свои оповещения"
+    
+    info['alert-remove'] = "<command> alert-remove --id <номер> - "\
+                           "удалить оповещение"
     
     info['info'] = "<command> info - отобразить справку"
     info['help'] = "<command> help <команда> - отобразить справку для команды"
@@ -66,6 +221,40 @@ def show_info(key: str = 'all') -> None:
         print(info[key])
 
 
+def print_alert(event: dict) -> None:
+    """
+    Вывести сработавшее оповещение в консоль.
+    
+    :param event: Событие срабатывания оповещения
+    :type event: dict
+    """
+
+    alert = event['alert']
+    print(f"ОПОВЕЩЕНИЕ #{alert['id']} ({alert['username']}): {event['pair']} "
+          f"{event['old_rate']:.8f} → {event['new_rate']:.8f}")
+
+
+def install_engines() -> None:
+    """
+    Подключить движки оповещений, оценки, заявок, регулярных заявок и
+    арбитража к обновлениям кэша курсов.
+    """
+
+    from valutatrade_hub.core import (
+        alerts,
+        conversion_graph,
+        orders,
+        recurring,
+        valuation,
+    )
+    alerts.install()
+    alerts.get_alerts_engine().add_hook(print_alert)
+    valuation.install()
+    orders.install()
+    recurring.install()
+    conversion_graph.install()
+
+
 def run():
     """
     Интерфейс программы.
@@ -74,6 +263,9 @@ def run():
     print('Введите info для отображения интерфейса, quit - для выхода из программы.')
 
     run_logging()
+    # Движки нужны только при записи курсов: они импортируются и
+    # подключаются перед первой рассылкой изменений, а не при запуске
+    add_rates_setup(install_engines)
     logged_username = None
     while True:
         if logged_username is None:
@@ -83,7 +275,7 @@ def run():
 
 
         sh = shlex.shlex(command)
-        sh.wordchars += '-.'
+        sh.wordchars += '-.:/,'
         args = list(sh)
 
         try:
@@ -96,6 +288,16 @@ def run():
                     logged_username = login(username, password)
                 case ['show-portfolio', '--base', currency]:
                     show_portfolio(logged_username, currency)
+                case ['leaderboard', *options]:
+                    params = parse_options(options, (), ('top', 'base'))
+                    show_leaderboard(logged_username, int(params.get('top', 10)),
+                                     params.get('base', 'USD'))
+                case ['show-risk']:
+                    show_risk(logged_username)
+                case ['risk-report', '--file', path]:
+                    risk_report(path)
+                case ['risk-report']:
+                    risk_report()
                 case ['show-portfolio']:
                     show_portfolio(logged_username)
                 case ['buy', '--currency', currency, '--amount', amount] |\
@@ -133,53 +335,110 @@ def run():
                     update_rates('exchangerate')
                 case ['update-rates']:
                     update_rates()
-                case ['show-rates', '--currency', currency,
-                                    '--top', top,
-                                    '--base', base] |\
-                     ['show-rates', '--currency', currency,
-                                    '--base', base,
-                                    '--top', top] |\
-                     ['show-rates', '--top', top,
-                                    '--currency', currency,
-                                    '--base', base] |\
-                     ['show-rates', '--base', base,
-                                    '--currency', currency,
-                                    '--top', top] |\
-                     ['show-rates', '--top', top,
-                                    '--base', base,
-                                    '--currency', currency] |\
-                     ['show-rates', '--base', base,
-                                    '--top', top,
-                                    '--currency', currency]:
-                    show_rates(currency=currency,
-                               top=int(top),
-                               base=base)
-                case ['show-rates', '--currency', currency,
-                                    '--top', top] |\
-                     ['show-rates', '--top', top,
-                                    '--currency', currency]:
-                    show_rates(currency=currency,
-                               top=int(top))
-                case ['show-rates', '--currency', currency,
-                                    '--base', base] |\
-                     ['show-rates', '--base', base,
-                                    '--currency', currency]:
-                    show_rates(currency=currency,
-                               base=base)
-                case ['show-rates', '--top', top,
-                                    '--base', base] |\
-                     ['show-rates', '--base', base,
-                                    '--top', top]:
-                    show_rates(top=int(top),
-                               base=base)
-                case ['show-rates', '--currency', currency]:
-                    show_rates(currency=currency)
-                case ['show-rates', '--top', top]:
-                    show_rates(top=int(top))
-                case ['show-rates', '--base', base]:
-                    show_rates(base=base)
-                case ['show-rates']:
-                    show_rates()
+                case ['update-metadata']:
+                    update_metadata()
+                case ['currencies']:
+                    show_currencies()
+                case ['compact-history']:
+                    compact_history()
+                case ['backfill', *options]:
+                    params = parse_options(options, ('pair', 'from', 'to'))
+                    backfill(params['pair'], params['from'], params['to'])
+                case ['alert-add', '--pair', pair, '--above' | '--below' as kind,
+                      value] |\
+                     ['alert-add', '--above' | '--below' as kind, value,
+                      '--pair', pair]:
+                    add_alert(logged_username, pair, kind[2:], float(value))
+                case ['alert-add', '--pair', pair, '--move', value,
+                      '--window', window] |\
+                     ['alert-add', '--pair', pair, '--window', window,
+                      '--move', value] |\
+                     ['alert-add', '--move', value, '--window', window,
+                      '--pair', pair] |\
+                     ['alert-add', '--window', window, '--move', value,
+                      '--pair', pair] |\
+                     ['alert-add', '--move', value, '--pair', pair,
+                      '--window', window] |\
+                     ['alert-add', '--window', window, '--pair', pair,
+                      '--move', value]:
+                    add_alert(logged_username, pair, 'move', float(value),
+                              int(window))
+                case ['alert-add', '--pair', pair, '--move', value] |\
+                     ['alert-add', '--move', value, '--pair', pair]:
+                    add_alert(logged_username, pair, 'move', float(value))
+                case ['alerts']:
+                    show_alerts(logged_username)
+                case ['alert-remove', '--id', alert_id]:
+                    remove_alert(logged_username, int(alert_id))
+                case ['order-add', *options]:
+                    params = parse_options(options, ('side', 'type', 'currency',
+                                                     'amount', 'price'))
+                    place_order(logged_username, params['side'], params['type'],
+                                params['currency'], float(params['amount']),
+                                float(params['price']))
+                case ['orders']:
+                    show_orders(logged_username)
+                case ['order-cancel', '--id', order_id]:
+                    cancel_order(logged_username, int(order_id))
+                case ['dca-add', *options]:
+                    params = parse_options(options, ('side', 'currency', 'usd',
+                                                     'every'))
+                    add_recurring(logged_username, params['side'],
+                                  params['currency'], float(params['usd']),
+                                  params['every'])
+                case ['dca']:
+                    show_recurring(logged_username)
+                case ['dca-remove', '--id', order_id]:
+                    remove_recurring(logged_username, int(order_id))
+                case ['dca-run']:
+                    run_recurring()
+                case ['watch-rates', '--pair', pairs]:
+                    watch_rates(pairs)
+                case ['watch-rates']:
+                    watch_rates()
+                case ['publish-rates', '--address', address]:
+                    publish_rates(address)
+                case ['publish-rates']:
+                    publish_rates()
+                case ['subscribe-rates', '--address', address]:
+                    subscribe_rates(address)
+                case ['subscribe-rates']:
+                    subscribe_rates()
+                case ['rebalance-shards', '--count', count]:
+                    rebalance_shards(int(count))
+                case ['rebalance-portfolios', *options]:
+                    params = parse_options(options, ('target',),
+                                           ('users', 'min-trade', 'mode'))
+                    rebalance_portfolios(params['target'], params.get('users'),
+                                         float(params['min-trade'])
+                                         if 'min-trade' in params else None,
+                                         params.get('mode', 'dry-run'))
+                case ['import-users', '--file', path]:
+                    import_users(path)
+                case ['export-portfolios', *options]:
+                    params = parse_options(options, ('format',), ('file',))
+                    export_portfolios(params['format'], params.get('file'))
+                case ['backup']:
+                    create_backup()
+                case ['backups']:
+                    show_backups()
+                case ['restore', *options]:
+                    params = parse_options(options, ('name',), ('files',))
+                    restore_backup(params['name'], params.get('files'))
+                case ['show-rates', *options]:
+                    params = parse_options(options, (),
+                                           ('currency', 'top', 'base', 'sort'))
+                    show_rates(currency=params.get('currency'),
+                               top=int(params['top']) if 'top' in params else None,
+                               base=params.get('base', 'USD'),
+                               sort=params.get('sort', 'rate'))
+                case ['rate-stats', '--pair', pair]:
+                    show_rate_stats(pair)
+                case ['best-route', *options]:
+                    params = parse_options(options, ('from', 'to'))
+                    show_best_route(params['from'], params['to'])
+                case ['arbitrage']:
+                    show_arbitrage()
                 case ['info']:
                     show_info()
                 case ['help', command]:
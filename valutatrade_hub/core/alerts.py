@@ -0,0 +1,547 @@
+import heapq
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from valutatrade_hub.core.ranking import RankIndex
+from valutatrade_hub.core.utils import data_lock
+from valutatrade_hub.infra.settings import config
+from valutatrade_hub.parser_service.storage import add_rates_listener
+
+# Виды оповещений:
+#   above - курс пересёк порог снизу вверх (old < порог <= new);
+#   below - курс пересёк порог сверху вниз (old > порог >= new);
+#   move  - курс отклонился на percent% от опорного значения, которое
+#           не старше window секунд (опорный курс обновляется по истечении
+#           окна). Хранится как пара порогов anchor*(1±percent/100).
+ALERT_KINDS = ('above', 'below', 'move')
+DEFAULT_MOVE_WINDOW = 3600
+# Число записей журнала срабатываний, после которого пересобирается снимок
+ALERTS_JOURNAL_LIMIT = 1000
+
+AlertHook = Callable[[dict[str, Any]], None]
+
+
+class _ThresholdIndex:
+    """
+    Индекс порогов одной пары и одного направления поверх списка с
+    пропусками (счёт - порог со знаком минус, поэтому обход идёт по
+    возрастанию порога): вставка и удаление - O(log n).
+    """
+
+    __slots__ = ('index',)
+
+    def __init__(self) -> None:
+        """
+        Создать пустой индекс.
+        """
+
+        self.index = RankIndex()
+
+
+    def insert(self, price: float, alert_id: int) -> None:
+        """
+        Добавить порог.
+
+        :param price: Порог
+        :type price: float
+        :param alert_id: ID оповещения
+        :type alert_id: int
+        """
+
+        self.index.update(alert_id, -price)
+
+
+    def remove(self, alert_id: int) -> None:
+        """
+        Удалить порог.
+
+        :param alert_id: ID оповещения
+        :type alert_id: int
+        """
+
+        self.index.discard(alert_id)
+
+
+    def pop_range(self, lo_price: float, hi_price: float, right: bool) -> list[int]:
+        """
+        Извлечь пороги из полуинтервала: (lo, hi] при right=True,
+        иначе [lo, hi). O((k + 1) log n), где k - число извлечённых.
+
+        :param lo_price: Нижняя граница
+        :type lo_price: float
+        :param hi_price: Верхняя граница
+        :type hi_price: float
+        :param right: Включать верхнюю границу вместо нижней
+        :type right: bool
+        :return: ID сработавших оповещений
+        :rtype: list[int]
+        """
+
+        fired = self.index.between(-hi_price, -lo_price,
+                                   include_low=right, include_high=not right)
+        for alert_id in fired:
+            self.index.discard(alert_id)
+        return fired
+
+
+class AlertsEngine:
+    """
+    Пользовательские ценовые оповещения, проверяемые инкрементально
+    при каждом обновлении кэша курсов.
+
+    На одно изменение курса пары выбираются только пороги между старым
+    и новым значением: O((k + 1) log n), где k - число сработавших
+    оповещений. Срабатывания и смена опорных курсов дописываются в
+    журнал alerts.journal, а не переписывают alerts.json; снимок
+    пересобирается, когда журнал дорастает до ALERTS_JOURNAL_LIMIT
+    записей. Все изменения - под блокировкой каталога данных.
+    """
+
+    def __init__(self, data_path: str) -> None:
+        """
+        Создать движок оповещений.
+
+        :param data_path: Путь к данным
+        :type data_path: str
+        """
+
+        self.data_path = data_path
+        self.alerts_path = os.path.join(data_path, 'alerts.json')
+        self.journal_path = os.path.join(data_path, 'alerts.journal')
+        self.log_path = os.path.join(data_path, 'alerts.log')
+
+        self._alerts: dict[int, dict[str, Any]] = dict()
+        self._up: dict[str, _ThresholdIndex] = dict()
+        self._down: dict[str, _ThresholdIndex] = dict()
+        self._expiry: dict[str, list[tuple[float, int]]] = dict()
+        self._next_id = 1
+        self._version: Optional[tuple[int, int, int]] = None
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._loaded = False
+        self._hooks: list[AlertHook] = []
+
+
+    def add_hook(self, hook: AlertHook) -> None:
+        """
+        Подписаться на срабатывания оповещений.
+
+        :param hook: Обработчик события срабатывания
+        :type hook: AlertHook
+        """
+
+        self._hooks.append(hook)
+
+
+    def _file_version(self) -> Optional[tuple[int, int, int]]:
+        """
+        Версия alerts.json: (inode, mtime_ns, размер). Файл заменяется
+        атомарно, поэтому каждая запись даёт новый inode.
+
+        :return: Версия (или None, если файла нет)
+        :rtype: Optional[tuple[int, int, int]]
+        """
+
+        try:
+            stat = os.stat(self.alerts_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+    def _ensure_loaded(self) -> None:
+        """
+        Загрузить оповещения из снимка, если он изменился с прошлой
+        загрузки, и применить новые записи журнала (вызывается под
+        блокировкой каталога данных).
+        """
+
+        version = self._file_version()
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            journal_size = 0
+
+        if not self._loaded or version != self._version or \
+           journal_size < self._journal_offset:
+            data = {'next_id': 1, 'alerts': []}
+            if version is not None:
+                with open(self.alerts_path, 'r') as fp:
+                    data = json.load(fp)
+
+            self._alerts = dict()
+            self._up = dict()
+            self._down = dict()
+            self._expiry = dict()
+            self._next_id = data.get('next_id', 1)
+            for alert in data.get('alerts', []):
+                self._index(alert)
+            self._version = version
+            self._journal_offset = 0
+            self._journal_lines = 0
+            self._loaded = True
+
+        if journal_size == self._journal_offset:
+            return None
+        with open(self.journal_path, 'rb') as fp:
+            fp.seek(self._journal_offset)
+            for line in fp:
+                # Недописанная строка будет прочитана при следующей загрузке
+                if not line.endswith(b'\n'):
+                    break
+                self._apply(json.loads(line))
+                self._journal_offset += len(line)
+                self._journal_lines += 1
+
+
+    def _apply(self, record: dict[str, Any]) -> None:
+        """
+        Применить запись журнала к оповещениям в памяти. Применение
+        идемпотентно: запись, уже вошедшая в снимок, ничего не меняет.
+
+        :param record: Запись журнала (op: fired или anchor)
+        :type record: dict[str, Any]
+        """
+
+        alert = self._alerts.get(record['id'])
+        if alert is None:
+            return None
+        self._unindex(alert)
+        if record['op'] == 'anchor':
+            alert.update(anchor=record['anchor'], anchor_at=record['anchor_at'])
+            self._index(alert)
+
+
+    def _append_journal(self, records: list[dict[str, Any]]) -> None:
+        """
+        Дописать записи в журнал (вызывается под блокировкой каталога
+        данных); при переполнении журнала пересобрать снимок.
+
+        :param records: Записи журнала
+        :type records: list[dict[str, Any]]
+        """
+
+        if self._journal_lines + len(records) >= ALERTS_JOURNAL_LIMIT:
+            self._save()
+            return None
+        payload = ''.join(json.dumps(record) + '\n' for record in records)
+        with open(self.journal_path, 'a') as fp:
+            fp.write(payload)
+        self._journal_offset += len(payload.encode())
+        self._journal_lines += len(records)
+
+
+    def _save(self) -> None:
+        """
+        Сохранить снимок оповещений и очистить журнал (вызывается под
+        блокировкой каталога данных).
+        """
+
+        os.makedirs(self.data_path, exist_ok=True)
+        data = {'next_id': self._next_id,
+                'alerts': list(self._alerts.values())}
+        tmp_file = f"{self.alerts_path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump(data, fp, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.alerts_path)
+        # Если процесс упадёт здесь, журнал применится к новому снимку
+        # повторно - без последствий
+        open(self.journal_path, 'w').close()
+        self._version = self._file_version()
+        self._journal_offset = 0
+        self._journal_lines = 0
+
+
+    @staticmethod
+    def _bounds(alert: dict[str, Any]) -> tuple[Optional[float], Optional[float]]:
+        """
+        Пороги оповещения для роста и для падения курса.
+
+        :param alert: Оповещение
+        :type alert: dict[str, Any]
+        :return: Порог вверх и порог вниз (None - нет порога)
+        :rtype: tuple[Optional[float], Optional[float]]
+        """
+
+        if alert['kind'] == 'above':
+            return alert['threshold'], None
+        if alert['kind'] == 'below':
+            return None, alert['threshold']
+        ratio = alert['percent'] / 100
+        return alert['anchor'] * (1 + ratio), alert['anchor'] * (1 - ratio)
+
+
+    def _index(self, alert: dict[str, Any]) -> None:
+        """
+        Добавить оповещение в индексы порогов.
+
+        :param alert: Оповещение
+        :type alert: dict[str, Any]
+        """
+
+        self._alerts[alert['id']] = alert
+        up, down = self._bounds(alert)
+        if up is not None:
+            self._up.setdefault(alert['pair'], _ThresholdIndex())\
+                .insert(up, alert['id'])
+        if down is not None:
+            self._down.setdefault(alert['pair'], _ThresholdIndex())\
+                .insert(down, alert['id'])
+        if alert['kind'] == 'move':
+            heapq.heappush(self._expiry.setdefault(alert['pair'], []),
+                           (alert['anchor_at'] + alert['window'], alert['id']))
+
+
+    def _unindex(self, alert: dict[str, Any]) -> None:
+        """
+        Удалить оповещение из индексов порогов (очередь истечения
+        очищается лениво).
+
+        :param alert: Оповещение
+        :type alert: dict[str, Any]
+        """
+
+        up, down = self._bounds(alert)
+        if up is not None and alert['pair'] in self._up:
+            self._up[alert['pair']].remove(alert['id'])
+        if down is not None and alert['pair'] in self._down:
+            self._down[alert['pair']].remove(alert['id'])
+        self._alerts.pop(alert['id'], None)
+
+
+    def add_alert(self,
+                  username: str,
+                  pair: str,
+                  kind: str,
+                  value: float,
+                  current_rate: Optional[float] = None,
+                  window: Optional[int] = None) -> dict[str, Any]:
+        """
+        Создать оповещение.
+
+        :param username: Имя пользователя
+        :type username: str
+        :param pair: Пара (например, 'BTC_USD')
+        :type pair: str
+        :param kind: Вид оповещения (above, below, move)
+        :type kind: str
+        :param value: Порог (above/below) или процент отклонения (move)
+        :type value: float
+        :param current_rate: Текущий курс пары (опорный для move)
+        :type current_rate: Optional[float]
+        :param window: Окно для move, секунды
+        :type window: Optional[int]
+        :return: Созданное оповещение
+        :rtype: dict[str, Any]
+        """
+
+        if kind not in ALERT_KINDS:
+            raise ValueError(f"Неизвестный вид оповещения '{kind}'!")
+        if value <= 0:
+            raise ValueError('Порог оповещения должен быть положительным числом!')
+        if kind == 'move' and current_rate is None:
+            raise ValueError(f'Курс {pair} неизвестен: нельзя задать '
+                             'оповещение об изменении курса.')
+        if kind == 'move' and value >= 100:
+            raise ValueError('Процент изменения курса должен быть меньше 100!')
+
+        with data_lock(self.data_path):
+            self._ensure_loaded()
+            alert = {'id': self._next_id,
+                     'username': username,
+                     'pair': pair,
+                     'kind': kind,
+                     'created_at': datetime.now().isoformat()}
+            if kind == 'move':
+                alert.update(percent=value,
+                             window=window or DEFAULT_MOVE_WINDOW,
+                             anchor=current_rate,
+                             anchor_at=time.time())
+            else:
+                alert['threshold'] = value
+
+            self._next_id += 1
+            self._index(alert)
+            self._save()
+        return alert
+
+
+    def remove_alert(self, username: str, alert_id: int) -> bool:
+        """
+        Удалить оповещение пользователя.
+
+        :param username: Имя пользователя
+        :type username: str
+        :param alert_id: ID оповещения
+        :type alert_id: int
+        :return: Флаг удаления
+        :rtype: bool
+        """
+
+        with data_lock(self.data_path):
+            self._ensure_loaded()
+            alert = self._alerts.get(alert_id)
+            if alert is None or alert['username'] != username:
+                return False
+            self._unindex(alert)
+            self._save()
+        return True
+
+
+    def list_alerts(self, username: str) -> list[dict[str, Any]]:
+        """
+        Получить оповещения пользователя.
+
+        :param username: Имя пользователя
+        :type username: str
+        :return: Список оповещений
+        :rtype: list[dict[str, Any]]
+        """
+
+        with data_lock(self.data_path):
+            self._ensure_loaded()
+        return [alert for alert in self._alerts.values()
+                if alert['username'] == username]
+
+
+    def _reanchor_expired(self,
+                          pair: str,
+                          rate: float,
+                          now: float) -> list[dict[str, Any]]:
+        """
+        Обновить опорный курс у move-оповещений с истёкшим окном.
+
+        :param pair: Пара
+        :type pair: str
+        :param rate: Курс, становящийся опорным
+        :type rate: float
+        :param now: Текущее время (эпоха)
+        :type now: float
+        :return: Записи журнала о смене опорного курса
+        :rtype: list[dict[str, Any]]
+        """
+
+        heap = self._expiry.get(pair)
+        records = []
+        while heap and heap[0][0] <= now:
+            expires_at, alert_id = heapq.heappop(heap)
+            alert = self._alerts.get(alert_id)
+            if alert is None or \
+               alert['anchor_at'] + alert['window'] != expires_at:
+                continue
+            record = {'op': 'anchor', 'id': alert_id,
+                      'anchor': rate, 'anchor_at': now}
+            self._apply(record)
+            records.append(record)
+        return records
+
+
+    def on_rates_update(self,
+                        changes: dict[str, tuple[Optional[float], float]]) -> list:
+        """
+        Проверить оповещения по изменениям курсов.
+
+        :param changes: {пара: (старый курс или None, новый курс)}
+        :type changes: dict[str, tuple[Optional[float], float]]
+        :return: События сработавших оповещений
+        :rtype: list[dict[str, Any]]
+        """
+
+        events = []
+        with data_lock(self.data_path):
+            self._ensure_loaded()
+            now = time.time()
+            records = []
+
+            for pair, (old_rate, new_rate) in changes.items():
+                if old_rate is None:
+                    continue
+                records.extend(self._reanchor_expired(pair, old_rate, now))
+
+                if new_rate > old_rate and pair in self._up:
+                    fired = self._up[pair].pop_range(old_rate, new_rate, right=True)
+                elif new_rate < old_rate and pair in self._down:
+                    fired = self._down[pair].pop_range(new_rate, old_rate, right=False)
+                else:
+                    fired = []
+
+                for alert_id in fired:
+                    alert = self._alerts.get(alert_id)
+                    if alert is None:
+                        continue
+                    self._unindex(alert)
+                    records.append({'op': 'fired', 'id': alert_id})
+                    events.append({'alert': alert,
+                                   'pair': pair,
+                                   'old_rate': old_rate,
+                                   'new_rate': new_rate,
+                                   'triggered_at': datetime.now().isoformat()})
+
+            if records:
+                self._append_journal(records)
+
+        if events:
+            self._notify(events)
+        return events
+
+
+    def _notify(self, events: list[dict[str, Any]]) -> None:
+        """
+        Записать срабатывания в журнал оповещений и передать обработчикам.
+
+        :param events: События срабатывания
+        :type events: list[dict[str, Any]]
+        """
+
+        logger = logging.getLogger('base')
+        with open(self.log_path, 'a') as fp:
+            for event in events:
+                fp.write(json.dumps(event, ensure_ascii=False) + '\n')
+                alert = event['alert']
+                logger.info(f"ALERT id={alert['id']} user='{alert['username']}' "
+                            f"pair='{event['pair']}' kind='{alert['kind']}' "
+                            f"old={event['old_rate']:.8f} "
+                            f"new={event['new_rate']:.8f}")
+                for hook in self._hooks:
+                    hook(event)
+
+
+_engines: dict[str, AlertsEngine] = dict()
+
+
+def get_alerts_engine() -> AlertsEngine:
+    """
+    Получить движок оповещений для текущего каталога данных.
+
+    :return: Движок оповещений
+    :rtype: AlertsEngine
+    """
+
+    data_path = config.get('data_path', 'data/')
+    engine = _engines.get(data_path)
+    if engine is None:
+        engine = _engines[data_path] = AlertsEngine(data_path)
+    return engine
+
+
+def _on_rates_update(changes: dict[str, tuple[Optional[float], float]]) -> None:
+    """
+    Обработчик изменений курсов из хранилища.
+
+    :param changes: Изменения курсов
+    :type changes: dict[str, tuple[Optional[float], float]]
+    """
+
+    get_alerts_engine().on_rates_update(changes)
+
+
+def install() -> None:
+    """
+    Подключить проверку оповещений к обновлениям кэша курсов.
+    """
+
+    add_rates_listener(_on_rates_update)
@@ -0,0 +1,257 @@
+import logging
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.money import ROUND_CREDIT, ROUND_DEBIT, convert_units
+from valutatrade_hub.core.portfolio_store import PortfolioStore
+from valutatrade_hub.core.repository import Repository
+from valutatrade_hub.core.sharding import get_shard_map
+from valutatrade_hub.core.trading import TRADE_BASE, execute_buy, execute_sell
+from valutatrade_hub.core.utils import data_lock, load_users
+from valutatrade_hub.infra.settings import config
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+# Сделки ребалансировки меньше этой суммы (USD) не проводятся
+DEFAULT_MIN_TRADE_USD = 1.0
+
+
+def _numpy():
+    """
+    Импортировать NumPy (только для ребалансировки, чтобы не увеличивать
+    время старта CLI).
+
+    :return: Модуль numpy
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError('Для ребалансировки нужен пакет numpy: '
+                         'выполните poetry install.')
+    return numpy
+
+
+def parse_weights(spec: str) -> dict[str, float]:
+    """
+    Разобрать целевое распределение вида 'USD=50,BTC=30,ETH=20'
+    (веса нормируются к сумме 1).
+
+    :param spec: Распределение
+    :type spec: str
+    :return: {валюта: доля}
+    :rtype: dict[str, float]
+    """
+
+    weights = dict()
+    for item in spec.split(','):
+        code, _, weight = item.strip().partition('=')
+        code = get_currency(code.strip().upper()).code
+        try:
+            value = float(weight)
+        except ValueError:
+            raise ValueError(f"Некорректный вес валюты '{code}': '{weight}'!")
+        if value < 0:
+            raise ValueError(f"Вес валюты '{code}' не может быть отрицательным!")
+        weights[code] = weights.get(code, 0.0) + value
+
+    total = sum(weights.values())
+    if not total > 0:
+        raise ValueError('Сумма весов целевого распределения должна быть '
+                         'положительной!')
+    return {code: value / total for code, value in weights.items()}
+
+
+def _prices() -> dict[str, float]:
+    """
+    Курсы валют к USD из кэша (с проверкой TTL).
+
+    :return: {валюта: курс к USD}
+    :rtype: dict[str, float]
+    """
+
+    rates = RatesStorage().load_rates()
+    last_refresh = rates.get('last_refresh') or '2000-01-01T00:00:00Z'
+    if (datetime.fromisoformat(last_refresh.replace('Z', '')) <
+            datetime.now() - timedelta(seconds=config.get('rates_ttl_seconds', 300))):
+        raise ValueError('Курсы валют устарели! Обновите курсы с помощью '
+                         'команды update-rates.')
+
+    suffix = f'_{TRADE_BASE}'
+    prices = {TRADE_BASE: 1.0}
+    for rate_key, record in rates.get('pairs', {}).items():
+        if rate_key.endswith(suffix) and record.get('rate'):
+            prices[rate_key[:-len(suffix)]] = float(record['rate'])
+    return prices
+
+
+def plan_trades(store: PortfolioStore,
+                targets: dict[int, dict[str, float]],
+                prices: dict[str, float],
+                min_trade_usd: float = DEFAULT_MIN_TRADE_USD) -> dict[int, list]:
+    """
+    Рассчитать сделки, приводящие портфели к целевым долям.
+
+    Стоимости и отклонения от цели считаются матрично по колонкам
+    хранилища (пользователи × валюты): V = units / 10**scale * курс,
+    D = W * V.sum(1) - V. Отклонения меньше min_trade_usd отбрасываются,
+    USD - остаток после сделок. Затем по каждому пользователю с
+    ненулевыми сделками точно (в минимальных единицах, с округлением
+    как у buy/sell) считаются выручка продаж и стоимость покупок;
+    если USD не хватает, покупки пропорционально уменьшаются.
+    Валюты без курса к USD не продаются и не учитываются в стоимости.
+
+    :param store: Портфели шарда
+    :type store: PortfolioStore
+    :param targets: {ID пользователя: {валюта: доля}}
+    :type targets: dict[int, dict[str, float]]
+    :param prices: Курсы валют к USD
+    :type prices: dict[str, float]
+    :param min_trade_usd: Минимальный размер сделки, USD
+    :type min_trade_usd: float
+    :return: {ID пользователя: [(валюта, Δ в мин. единицах, Δ USD в мин. единицах)]}
+    :rtype: dict[int, list]
+    """
+
+    np = _numpy()
+    user_ids = [user_id for user_id in targets if user_id in store]
+    if not user_ids:
+        return dict()
+
+    codes = list(dict.fromkeys(list(store.currencies) + [TRADE_BASE] +
+                               [code for weights in targets.values()
+                                for code in weights]))
+    missing = [code for weights in targets.values() for code, weight
+               in weights.items() if weight > 0 and code not in prices]
+    if missing:
+        raise ValueError(f"Нет курса {missing[0]}→{TRADE_BASE} для ребалансировки!")
+
+    rows = np.array([store.row(user_id) for user_id in user_ids], dtype=np.int64)
+    units = np.zeros((len(user_ids), len(codes)), dtype=np.int64)
+    for j, code in enumerate(codes):
+        column = store.column(code)
+        if column is not None:
+            units[:, j] = np.frombuffer(column, dtype=np.int64)[rows]
+
+    scale = np.array([10.0 ** get_currency(code).scale for code in codes])
+    price = np.array([prices.get(code, 0.0) for code in codes])
+    weights = np.array([[targets[user_id].get(code, 0.0) for code in codes]
+                        for user_id in user_ids])
+
+    values = units / scale * price
+    delta = weights * values.sum(axis=1)[:, None] - values
+    delta[:, codes.index(TRADE_BASE)] = 0.0
+    delta[(np.abs(delta) < min_trade_usd) | (price == 0)] = 0.0
+    trade = np.trunc(delta / np.where(price > 0, price, 1.0) * scale)
+    trade = np.maximum(trade.astype(np.int64), -units)
+
+    plan = dict()
+    base = codes.index(TRADE_BASE)
+    for i in np.flatnonzero(np.any(trade != 0, axis=1)):
+        cash = int(units[i, base])
+        sells, buys = [], []
+        for j in np.flatnonzero(trade[i]):
+            code, amount = codes[j], int(trade[i, j])
+            if amount < 0:
+                proceeds = convert_units(-amount, code, TRADE_BASE, prices[code],
+                                         ROUND_CREDIT)
+                sells.append((code, amount, proceeds))
+                cash += proceeds
+            else:
+                buys.append((code, amount))
+
+        # Покупки не должны превышать USD после продаж
+        costs = [convert_units(amount, code, TRADE_BASE, prices[code], ROUND_DEBIT)
+                 for code, amount in buys]
+        while sum(costs) > cash:
+            factor = cash / sum(costs)
+            buys = [(code, int(amount * factor)) for code, amount in buys]
+            costs = [convert_units(amount, code, TRADE_BASE, prices[code],
+                                   ROUND_DEBIT) for code, amount in buys]
+
+        trades = sells + [(code, amount, -cost) for (code, amount), cost
+                          in zip(buys, costs)
+                          if amount > 0 and cost / 10 ** get_currency(TRADE_BASE)
+                          .scale >= min_trade_usd]
+        if trades:
+            plan[user_ids[i]] = trades
+    return plan
+
+
+def rebalance_portfolios(weights: dict[str, float],
+                         usernames: Optional[list[str]] = None,
+                         min_trade_usd: float = DEFAULT_MIN_TRADE_USD,
+                         apply: bool = False) -> dict[str, Any]:
+    """
+    Привести портфели пользователей (всех или перечисленных) к целевому
+    распределению.
+
+    Без apply - только отчёт о сделках. С apply все шарды блокируются
+    на время операции, план пересчитывается по текущим балансам, сделки
+    проводятся по правилам buy/sell (execute_sell, затем execute_buy), и
+    portfolios.json каждого шарда записывается один раз.
+
+    :param weights: Целевое распределение {валюта: доля}
+    :type weights: dict[str, float]
+    :param usernames: Пользователи (по умолчанию - все)
+    :type usernames: Optional[list[str]]
+    :param min_trade_usd: Минимальный размер сделки, USD
+    :type min_trade_usd: float
+    :param apply: Провести сделки
+    :type apply: bool
+    :return: users (число портфелей), trades [(имя, валюта, Δ, ΔUSD)]
+    :rtype: dict[str, Any]
+    """
+
+    prices = _prices()
+    shard_map = get_shard_map()
+    root = config.get('data_path', 'data/')
+    wanted = set(usernames) if usernames is not None else None
+    report = {'users': 0, 'trades': []}
+    logger = logging.getLogger('base')
+
+    with ExitStack() as stack:
+        if apply:
+            # Блокировки берутся в одном порядке, как у движка заявок
+            stack.enter_context(data_lock(root))
+            for path in sorted(shard_map.paths()):
+                stack.enter_context(data_lock(path))
+
+        shards = []
+        for data_path in shard_map.paths():
+            names = {user['user_id']: user['username']
+                     for user in load_users(data_path)
+                     if wanted is None or user['username'] in wanted}
+            if names:
+                shards.append((data_path, names))
+        if wanted is not None:
+            unknown = wanted - {name for _, names in shards
+                                for name in names.values()}
+            if unknown:
+                raise ValueError('Пользователи не найдены: ' +
+                                 ', '.join(sorted(unknown)))
+
+        for data_path, names in shards:
+            repository = Repository(data_path)
+            plan = plan_trades(repository.store,
+                               {user_id: weights for user_id in names},
+                               prices, min_trade_usd)
+            report['users'] += sum(user_id in repository.store for user_id in names)
+
+            for user_id, trades in plan.items():
+                report['trades'] += [(names[user_id], code, amount, usd)
+                                     for code, amount, usd in trades]
+                if not apply:
+                    continue
+                portfolio = repository.get_portfolio(user_id)
+                for code, amount, _ in trades:
+                    if amount < 0:
+                        execute_sell(portfolio, code, -amount, prices[code])
+                    else:
+                        execute_buy(portfolio, code, amount, prices[code])
+                logger.info(f"REBALANCE user='{names[user_id]}' "
+                            f"trades={len(trades)}")
+            if apply:
+                repository.commit()
+    return report
@@ -0,0 +1,376 @@
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Optional
+
+from valutatrade_hub.core.sharding import get_shard_map
+from valutatrade_hub.core.utils import data_lock
+from valutatrade_hub.infra.settings import config
+from valutatrade_hub.parser_service.snapshot import write_snapshot
+from valutatrade_hub.parser_service.storage import CURRENCY_REGISTRY, RatesStorage
+
+# Размер страницы файлов, которые дописываются на месте (журналы):
+# в новую копию попадают только изменившиеся страницы
+BACKUP_PAGE_SIZE = 64 * 1024
+
+# Манифест копии: файлы, их размеры и контрольные суммы
+BACKUP_MANIFEST = 'manifest.json'
+
+# Хранилище страниц (общее для всех копий, имя файла - sha256 страницы)
+BACKUP_PAGES_DIR = 'pages'
+
+# Файлы, которые дописываются на месте (остальные заменяются целиком
+# через os.replace, и на них можно ссылаться жёсткой ссылкой)
+APPEND_ONLY_FILES = ('*.log', '*.journal')
+
+# Не копируются: блокировки, недописанные временные файлы и бинарный
+# снимок курсов (пересобирается из rates.json при следующем сохранении)
+SKIPPED_FILES = ('.lock', '*.tmp', '*.restore', 'rates.bin')
+
+
+def _matches(name: str, patterns: tuple[str, ...]) -> bool:
+    """
+    Проверить имя файла по шаблонам.
+
+    :param name: Имя файла
+    :type name: str
+    :param patterns: Шаблоны fnmatch
+    :type patterns: tuple[str, ...]
+    :return: Флаг совпадения
+    :rtype: bool
+    """
+
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def _sha256_file(path: str) -> str:
+    """
+    Контрольная сумма файла.
+
+    :param path: Путь к файлу
+    :type path: str
+    :return: sha256 (hex)
+    :rtype: str
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for block in iter(lambda: fp.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _backup_root() -> str:
+    """
+    Каталог резервных копий.
+
+    :return: Путь
+    :rtype: str
+    """
+
+    return config.get('backup_path', 'backups/')
+
+
+def _scan(root: str, exclude: str) -> list[str]:
+    """
+    Файлы каталога данных, входящие в копию.
+
+    :param root: Каталог данных
+    :type root: str
+    :param exclude: Каталог, который не нужно обходить (сами копии)
+    :type exclude: str
+    :return: Пути относительно root
+    :rtype: list[str]
+    """
+
+    exclude = os.path.abspath(exclude)
+    files = []
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = sorted(name for name in subdirs
+                            if os.path.abspath(os.path.join(directory, name))
+                            != exclude)
+        for name in sorted(names):
+            if not _matches(name, SKIPPED_FILES):
+                files.append(os.path.relpath(os.path.join(directory, name), root))
+    return files
+
+
+def list_snapshots(backup_root: Optional[str] = None) -> list[dict[str, Any]]:
+    """
+    Манифесты готовых копий (от старых к новым).
+
+    :param backup_root: Каталог копий (по умолчанию - backup_path из конфига)
+    :type backup_root: Optional[str]
+    :return: Манифесты
+    :rtype: list[dict[str, Any]]
+    """
+
+    backup_root = backup_root or _backup_root()
+    if not os.path.isdir(backup_root):
+        return []
+
+    manifests = []
+    for name in sorted(os.listdir(backup_root)):
+        try:
+            with open(os.path.join(backup_root, name, BACKUP_MANIFEST), 'r') as fp:
+                manifests.append(json.load(fp))
+        except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+            continue
+    return manifests
+
+
+def _store_page(page: bytes, backup_root: str) -> tuple[str, int]:
+    """
+    Положить страницу в хранилище страниц (если такой ещё нет).
+
+    :param page: Содержимое страницы
+    :type page: bytes
+    :param backup_root: Каталог копий
+    :type backup_root: str
+    :return: sha256 страницы и число записанных байт
+    :rtype: tuple[str, int]
+    """
+
+    checksum = hashlib.sha256(page).hexdigest()
+    path = os.path.join(backup_root, BACKUP_PAGES_DIR, checksum[:2], checksum)
+    if os.path.exists(path):
+        return checksum, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'wb') as fp:
+        fp.write(page)
+    os.replace(tmp_file, path)
+    return checksum, len(page)
+
+
+def create_snapshot(backup_root: Optional[str] = None) -> dict[str, Any]:
+    """
+    Сделать согласованную копию каталога данных, не останавливая торговлю.
+
+    Под блокировками данных (корень и все шарды) выполняется только
+    O(файлов) работы: файлы, которые заменяются целиком через os.replace,
+    получают жёсткую ссылку (их содержимое больше не меняется), а у
+    дописываемых журналов читается только хвост после последней полной
+    страницы прошлой копии. Контрольные суммы считаются уже после снятия
+    блокировок, причём у файла с тем же inode, размером и mtime сумма
+    берётся из прошлого манифеста. Поэтому окно копирования и размер
+    новой копии зависят от объёма изменений, а не от объёма данных.
+    Если каталог копий на другой файловой системе, файлы копируются.
+
+    :param backup_root: Каталог копий (по умолчанию - backup_path из конфига)
+    :type backup_root: Optional[str]
+    :return: Манифест копии
+    :rtype: dict[str, Any]
+    """
+
+    backup_root = backup_root or _backup_root()
+    root = config.get('data_path', 'data/')
+    previous = list_snapshots(backup_root)
+    previous_files = previous[-1]['files'] if previous else dict()
+
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    work_dir = os.path.join(backup_root, f'{name}.partial')
+    files_dir = os.path.join(work_dir, 'files')
+    os.makedirs(files_dir)
+
+    files: dict[str, dict[str, Any]] = dict()
+    tails: dict[str, bytes] = dict()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        stack.enter_context(data_lock(root))
+        for path in sorted(set(get_shard_map().paths()) - {os.path.normpath(root)}):
+            stack.enter_context(data_lock(path))
+        locked = time.perf_counter()
+
+        for relpath in _scan(root, backup_root):
+            source = os.path.join(root, relpath)
+            if _matches(os.path.basename(relpath), APPEND_ONLY_FILES):
+                stat = os.stat(source)
+                prev = previous_files.get(relpath)
+                pages, start = [], 0
+                with open(source, 'rb') as fp:
+                    if (prev is not None and prev['mode'] == 'pages' and
+                            prev['ino'] == stat.st_ino and
+                            prev['size'] <= stat.st_size):
+                        full = prev['size'] // BACKUP_PAGE_SIZE
+                        # Журналы сворачиваются (файл очищается или
+                        # создаётся заново), поэтому первая страница
+                        # сверяется с прошлой копией
+                        if full and hashlib.sha256(fp.read(BACKUP_PAGE_SIZE))\
+                                .hexdigest() != prev['pages'][0]:
+                            full = 0
+                        pages, start = prev['pages'][:full], full * BACKUP_PAGE_SIZE
+                    fp.seek(start)
+                    tail = fp.read(stat.st_size - start)
+                # Последняя строка могла быть дописана не полностью
+                tail = tail[:tail.rfind(b'\n') + 1]
+                tails[relpath] = tail
+                files[relpath] = {'mode': 'pages', 'size': start + len(tail),
+                                  'ino': stat.st_ino, 'pages': pages}
+                continue
+
+            target = os.path.join(files_dir, relpath)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            stat = os.stat(target)
+            files[relpath] = {'mode': 'link', 'size': stat.st_size,
+                              'ino': stat.st_ino, 'mtime_ns': stat.st_mtime_ns}
+        window = time.perf_counter() - locked
+
+    new_bytes = 0
+    for relpath, entry in files.items():
+        prev = previous_files.get(relpath)
+        if entry['mode'] == 'pages':
+            tail = tails[relpath]
+            for offset in range(0, len(tail), BACKUP_PAGE_SIZE):
+                checksum, written = _store_page(
+                    tail[offset:offset + BACKUP_PAGE_SIZE], backup_root)
+                entry['pages'].append(checksum)
+                new_bytes += written
+            entry['sha256'] = hashlib.sha256(
+                ''.join(entry['pages']).encode('ascii')).hexdigest()
+        elif (prev is not None and prev['mode'] == 'link' and
+              all(prev[key] == entry[key] for key in ('ino', 'size', 'mtime_ns'))):
+            entry['sha256'] = prev['sha256']
+        else:
+            entry['sha256'] = _sha256_file(os.path.join(files_dir, relpath))
+            new_bytes += entry['size']
+
+    manifest = {'name': name,
+                'created_at': datetime.now().isoformat(),
+                'lock_ms': round(window * 1000, 3),
+                'total_ms': round((time.perf_counter() - started) * 1000, 3),
+                'size': sum(entry['size'] for entry in files.values()),
+                'new_bytes': new_bytes,
+                'files': files}
+    with open(os.path.join(work_dir, BACKUP_MANIFEST), 'w') as fp:
+        json.dump(manifest, fp, indent=4)
+    # Копия появляется в списке только целиком
+    os.rename(work_dir, os.path.join(backup_root, name))
+    return manifest
+
+
+def _materialize(relpath: str,
+                 entry: dict[str, Any],
+                 snapshot_dir: str,
+                 backup_root: str,
+                 target: str) -> None:
+    """
+    Записать файл копии во временный файл рядом с целевым, проверив
+    контрольные суммы.
+
+    :param relpath: Путь файла относительно каталога данных
+    :type relpath: str
+    :param entry: Запись манифеста
+    :type entry: dict[str, Any]
+    :param snapshot_dir: Каталог копии
+    :type snapshot_dir: str
+    :param backup_root: Каталог копий
+    :type backup_root: str
+    :param target: Временный файл
+    :type target: str
+    """
+
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    with open(target, 'wb') as out:
+        if entry['mode'] == 'link':
+            digest = hashlib.sha256()
+            with open(os.path.join(snapshot_dir, 'files', relpath), 'rb') as fp:
+                for block in iter(lambda: fp.read(1024 * 1024), b''):
+                    digest.update(block)
+                    out.write(block)
+            if digest.hexdigest() != entry['sha256']:
+                raise ValueError(f"Контрольная сумма файла '{relpath}' "
+                                 'не совпадает с манифестом!')
+            return None
+
+        for checksum in entry['pages']:
+            with open(os.path.join(backup_root, BACKUP_PAGES_DIR,
+                                   checksum[:2], checksum), 'rb') as fp:
+                page = fp.read()
+            if hashlib.sha256(page).hexdigest() != checksum:
+                raise ValueError(f"Повреждена страница файла '{relpath}'!")
+            out.write(page)
+
+
+def restore_snapshot(name: str,
+                     only: Optional[list[str]] = None,
+                     backup_root: Optional[str] = None) -> dict[str, Any]:
+    """
+    Восстановить каталог данных (или отдельные файлы) из копии.
+
+    Файлы собираются и проверяются параллельно во временные файлы рядом
+    с целевыми, без блокировок; под блокировками данных остаются только
+    переименования os.replace. При полном восстановлении файлы, которых
+    нет в копии, удаляются.
+
+    :param name: Имя копии
+    :type name: str
+    :param only: Восстановить только эти файлы (пути относительно каталога данных)
+    :type only: Optional[list[str]]
+    :param backup_root: Каталог копий (по умолчанию - backup_path из конфига)
+    :type backup_root: Optional[str]
+    :return: Число восстановленных файлов, их размер и число удалённых файлов
+    :rtype: dict[str, Any]
+    """
+
+    backup_root = backup_root or _backup_root()
+    root = config.get('data_path', 'data/')
+    snapshot_dir = os.path.join(backup_root, name)
+    try:
+        with open(os.path.join(snapshot_dir, BACKUP_MANIFEST), 'r') as fp:
+            files = json.load(fp)['files']
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        raise ValueError(f"Резервная копия '{name}' не найдена!")
+
+    if only is not None:
+        unknown = [relpath for relpath in only if relpath not in files]
+        if unknown:
+            raise ValueError(f"В копии '{name}' нет файлов: {', '.join(unknown)}")
+        files = {relpath: files[relpath] for relpath in only}
+
+    staged = {relpath: os.path.join(root, f'{relpath}.restore') for relpath in files}
+    try:
+        with ThreadPoolExecutor(config.get('backup_workers')) as pool:
+            jobs = [pool.submit(_materialize, relpath, entry, snapshot_dir,
+                                backup_root, staged[relpath])
+                    for relpath, entry in files.items()]
+            for job in jobs:
+                job.result()
+
+        removed = 0
+        with ExitStack() as stack:
+            stack.enter_context(data_lock(root))
+            shard_paths = set(get_shard_map().paths()) - {os.path.normpath(root)}
+            for path in sorted(shard_paths):
+                stack.enter_context(data_lock(path))
+
+            if only is None:
+                for relpath in _scan(root, backup_root):
+                    if relpath not in files:
+                        os.remove(os.path.join(root, relpath))
+                        removed += 1
+            for relpath, tmp_file in staged.items():
+                os.replace(tmp_file, os.path.join(root, relpath))
+            if 'rates.json' in files:
+                # Бинарный снимок курсов соответствовал прежнему rates.json
+                storage = RatesStorage()
+                write_snapshot(storage.config.RATES_SNAPSHOT_PATH,
+                               storage.load_rates(), list(CURRENCY_REGISTRY))
+    finally:
+        for tmp_file in staged.values():
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    return {'files': len(files),
+            'size': sum(entry['size'] for entry in files.values()),
+            'removed': removed}
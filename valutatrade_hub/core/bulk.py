@@ -0,0 +1,256 @@
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Iterator
+
+from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.models import hash_password
+from valutatrade_hub.core.money import to_units, wallet_record, wallet_units
+from valutatrade_hub.core.sharding import (
+    SHARD_ID_STRIDE,
+    allocate_user_id,
+    get_shard_map,
+)
+from valutatrade_hub.core.utils import (
+    data_lock,
+    load_portfolios,
+    load_users,
+    save_portfolios,
+    save_users,
+)
+from valutatrade_hub.infra.settings import config
+
+# Строк CSV в одном пакете импорта: пакет хэшируется пулом процессов
+# и записывается в users.json/portfolios.json шарда одной записью
+IMPORT_BATCH_SIZE = 100_000
+
+# Паролей в одной задаче пула хэширования
+HASH_CHUNK_SIZE = 5_000
+
+# Стартовый баланс нового пользователя, USD (как при register)
+START_BALANCE_USD = 100
+
+# Сколько описаний отклонённых строк возвращать
+MAX_REPORTED_ERRORS = 10
+
+
+def _hash_chunk(passwords: list[str]) -> list[tuple[str, str]]:
+    """
+    Захэшировать пароли (выполняется в процессе пула).
+
+    :param passwords: Пароли
+    :type passwords: list[str]
+    :return: Пары (хэш, соль)
+    :rtype: list[tuple[str, str]]
+    """
+
+    result = []
+    for password in passwords:
+        salt = os.urandom(8).hex()
+        result.append((hash_password(password, salt), salt))
+    return result
+
+
+def _read_rows(path: str) -> Iterator[tuple[int, str, str]]:
+    """
+    Читать строки CSV с колонками username и password по одной.
+
+    :param path: Путь к CSV
+    :type path: str
+    :return: (номер строки, имя, пароль)
+    :rtype: Iterator[tuple[int, str, str]]
+    """
+
+    with open(path, 'r', newline='', encoding='utf-8') as fp:
+        reader = csv.DictReader(fp)
+        if not {'username', 'password'} <= set(reader.fieldnames or ()):
+            raise ValueError('В CSV должны быть колонки username и password!')
+        for row in reader:
+            yield (reader.line_num, (row['username'] or '').strip(),
+                   row['password'] or '')
+
+
+def _commit_batch(data_path: str,
+                  index: int,
+                  sharded: bool,
+                  rows: list[tuple[str, str, str]]) -> int:
+    """
+    Записать пакет пользователей шарда (одна запись users.json и
+    portfolios.json под блокировкой шарда).
+
+    :param data_path: Путь к данным шарда
+    :type data_path: str
+    :param index: Номер шарда
+    :type index: int
+    :param sharded: Шардов больше одного (ID выдаются счётчиком шарда)
+    :type sharded: bool
+    :param rows: (имя, хэш пароля, соль)
+    :type rows: list[tuple[str, str, str]]
+    :return: Число пользователей, уже существовавших в шарде
+    :rtype: int
+    """
+
+    registered = datetime.now().isoformat()
+    start_units = to_units(START_BALANCE_USD, 'USD')
+    with data_lock(data_path):
+        users = load_users(data_path)
+        existing = {user['username'] for user in users}
+        fresh = [row for row in rows if row[0] not in existing]
+        if not fresh:
+            return len(rows)
+
+        if sharded:
+            first = allocate_user_id(data_path, index, len(fresh))
+            stride = SHARD_ID_STRIDE
+        else:
+            first = max([user['user_id'] for user in users], default=0) + 1
+            stride = 1
+        ids = range(first, first + len(fresh) * stride, stride)
+
+        users.extend({'user_id': user_id,
+                      'username': username,
+                      'hashed_password': hashed_password,
+                      'salt': salt,
+                      'registration_date': registered}
+                     for user_id, (username, hashed_password, salt)
+                     in zip(ids, fresh))
+        save_users(users, data_path)
+        del users
+
+        portfolios = load_portfolios(data_path)
+        portfolios.extend({'user_id': user_id,
+                           'wallets': {'USD': wallet_record('USD', start_units)}}
+                          for user_id in ids)
+        save_portfolios(portfolios, data_path)
+    return len(rows) - len(fresh)
+
+
+def import_users(path: str) -> dict[str, Any]:
+    """
+    Массово зарегистрировать пользователей из CSV (username,password).
+
+    Файл читается потоком пакетами по IMPORT_BATCH_SIZE строк. Строки
+    пакета проверяются и дедуплицируются по индексу имён пакета, пароли
+    хэшируются пулом процессов, затем пакет раскладывается по шардам и
+    каждый шард записывается один раз на пакет; имена, уже занятые в шарде
+    (в том числе предыдущими пакетами), отклоняются под его блокировкой.
+    В памяти одновременно находится один пакет и файлы одного шарда.
+
+    :param path: Путь к CSV
+    :type path: str
+    :return: imported, duplicates, invalid и errors (первые описания ошибок)
+    :rtype: dict[str, Any]
+    """
+
+    shard_map = get_shard_map()
+    if shard_map.previous:
+        raise ValueError('Идёт перебалансировка шардов, повторите импорт позже!')
+    sharded = len(shard_map.shards) > 1
+    batch_size = config.get('import_batch_size', IMPORT_BATCH_SIZE)
+    result = {'imported': 0, 'duplicates': 0, 'invalid': 0, 'errors': []}
+    logger = logging.getLogger('base')
+
+    rows = _read_rows(path)
+    with ProcessPoolExecutor(config.get('import_workers')) as pool:
+        while batch := list(islice(rows, batch_size)):
+            seen: set[str] = set()
+            valid = []
+            for line, username, password in batch:
+                if not username or len(password) < 4:
+                    problem = 'пустое имя' if not username else 'короткий пароль'
+                    result['invalid'] += 1
+                elif username in seen:
+                    problem = f"имя '{username}' повторяется"
+                    result['duplicates'] += 1
+                else:
+                    seen.add(username)
+                    valid.append((username, password))
+                    continue
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append(f'строка {line}: {problem}')
+            del batch, seen
+
+            chunks = [[password for _, password in valid[start:start + HASH_CHUNK_SIZE]]
+                      for start in range(0, len(valid), HASH_CHUNK_SIZE)]
+            hashed = (pair for part in pool.map(_hash_chunk, chunks) for pair in part)
+
+            by_shard: dict[int, list[tuple[str, str, str]]] = dict()
+            for (username, _), (hashed_password, salt) in zip(valid, hashed):
+                index = shard_map.locate(username)[1]
+                by_shard.setdefault(index, []).append((username, hashed_password,
+                                                       salt))
+            for index, shard_rows in sorted(by_shard.items()):
+                taken = _commit_batch(shard_map.path(index), index, sharded,
+                                      shard_rows)
+                result['duplicates'] += taken
+                result['imported'] += len(shard_rows) - taken
+
+            logger.info(f"IMPORT file='{path}' imported={result['imported']} "
+                        f"duplicates={result['duplicates']} "
+                        f"invalid={result['invalid']}")
+    return result
+
+
+def _format_units(units: int, code: str) -> str:
+    """
+    Записать баланс в минимальных единицах десятичной строкой без потерь.
+
+    :param units: Баланс в минимальных единицах
+    :type units: int
+    :param code: Код валюты
+    :type code: str
+    :return: Баланс
+    :rtype: str
+    """
+
+    return str(Decimal(units).scaleb(-get_currency(code).scale))
+
+
+def export_portfolios(fmt: str, path: str) -> dict[str, int]:
+    """
+    Выгрузить портфели всех шардов в CSV (строка на кошелёк: user_id,
+    username, currency, balance) или JSON Lines (строка на пользователя).
+    Шарды читаются по одному, строки пишутся сразу в файл.
+
+    :param fmt: Формат: csv или jsonl
+    :type fmt: str
+    :param path: Путь к файлу выгрузки
+    :type path: str
+    :return: Число пользователей и кошельков
+    :rtype: dict[str, int]
+    """
+
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError("Формат выгрузки должен быть 'csv' или 'jsonl'!")
+
+    counts = {'users': 0, 'wallets': 0}
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as fp:
+        writer = csv.writer(fp)
+        if fmt == 'csv':
+            writer.writerow(['user_id', 'username', 'currency', 'balance'])
+        for data_path in get_shard_map().paths():
+            names = {user['user_id']: user['username']
+                     for user in load_users(data_path)}
+            for record in load_portfolios(data_path):
+                user_id = record['user_id']
+                wallets = {code: _format_units(wallet_units(wallet), code)
+                           for code, wallet in record['wallets'].items()}
+                if fmt == 'csv':
+                    writer.writerows([user_id, names.get(user_id, ''), code, balance]
+                                     for code, balance in wallets.items())
+                else:
+                    fp.write(json.dumps({'user_id': user_id,
+                                         'username': names.get(user_id, ''),
+                                         'wallets': wallets},
+                                        ensure_ascii=False) + '\n')
+                counts['users'] += 1
+                counts['wallets'] += len(wallets)
+            del names
+    os.replace(tmp_file, path)
+    return counts
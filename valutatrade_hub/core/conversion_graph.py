@@ -0,0 +1,328 @@
+import logging
+import math
+from typing import Any, Optional
+
+from valutatrade_hub.infra.settings import config
+from valutatrade_hub.parser_service.storage import RatesStorage, add_rates_listener
+
+# Допуск релаксации: погрешность суммы логарифмов по циклу вида
+# X→USD→X и подобным не должна считаться арбитражем
+RELAX_EPSILON = 1e-12
+
+# Максимальное число шагов маршрута конвертации по умолчанию
+DEFAULT_MAX_HOPS = 4
+
+
+class ConversionGraph:
+    """
+    Граф конвертации валют: вершины - коды валют, рёбра - котировки.
+
+    Каждая котировка пары X_Y от провайдера даёт ребро X→Y с курсом r и
+    обратное ребро Y→X с курсом 1/r; вес ребра -log(курс). Лучший маршрут
+    (максимальное произведение курсов) - кратчайший путь по весам,
+    арбитраж (произведение курсов по циклу больше 1) - цикл отрицательного
+    веса. Оба ищутся алгоритмом Беллмана-Форда с ранним выходом: проход
+    по рёбрам - O(E), проходов обычно столько, сколько шагов в самом
+    длинном кратчайшем пути.
+    """
+
+    def __init__(self) -> None:
+        """
+        Создать пустой граф.
+        """
+
+        self.codes: list[str] = []
+        self.index: dict[str, int] = dict()
+        # Рёбра - параллельные списки (откуда, куда, вес, номер котировки)
+        self.src: list[int] = []
+        self.dst: list[int] = []
+        self.weight: list[float] = []
+        self.edge_quote: list[int] = []
+        # Котировки: (пара, источник, курс пары)
+        self.quotes: list[tuple[str, str, float]] = []
+
+
+    @classmethod
+    def from_rates(cls, rates: dict[str, Any]) -> 'ConversionGraph':
+        """
+        Построить граф по кэшу курсов (все пары всех провайдеров).
+
+        :param rates: Кэш курсов (как в rates.json)
+        :type rates: dict[str, Any]
+        :return: Граф
+        :rtype: ConversionGraph
+        """
+
+        graph = cls()
+        for pair, record in rates.get('pairs', {}).items():
+            graph.add_quote(pair, record.get('rate'),
+                            record.get('source', 'Unknown'))
+        return graph
+
+
+    def _node(self, code: str) -> int:
+        """
+        Номер вершины валюты (вершина создаётся при первом обращении).
+
+        :param code: Код валюты
+        :type code: str
+        :return: Номер вершины
+        :rtype: int
+        """
+
+        node = self.index.get(code)
+        if node is None:
+            node = self.index[code] = len(self.codes)
+            self.codes.append(code)
+        return node
+
+
+    def add_quote(self, pair: str, rate: Any, source: str) -> None:
+        """
+        Добавить котировку пары (прямое и обратное ребро). Котировки разных
+        провайдеров по одной паре добавляются как параллельные рёбра.
+
+        :param pair: Пара вида FROM_TO
+        :type pair: str
+        :param rate: Курс пары
+        :type rate: Any
+        :param source: Провайдер
+        :type source: str
+        """
+
+        from_code, _, to_code = pair.partition('_')
+        if not from_code or not to_code or from_code == to_code:
+            return None
+        try:
+            rate = float(rate)
+        except (TypeError, ValueError):
+            return None
+        if not rate > 0 or math.isinf(rate):
+            return None
+
+        quote = len(self.quotes)
+        self.quotes.append((pair, source, rate))
+        u, v = self._node(from_code), self._node(to_code)
+        weight = -math.log(rate)
+        self.src += (u, v)
+        self.dst += (v, u)
+        self.weight += (weight, -weight)
+        self.edge_quote += (quote, quote)
+
+
+    def _hop(self, edge: int) -> dict[str, Any]:
+        """
+        Описание шага маршрута по ребру.
+
+        :param edge: Номер ребра
+        :type edge: int
+        :return: from, to, rate, pair, source
+        :rtype: dict[str, Any]
+        """
+
+        pair, source, _ = self.quotes[self.edge_quote[edge]]
+        return {'from': self.codes[self.src[edge]],
+                'to': self.codes[self.dst[edge]],
+                'rate': math.exp(-self.weight[edge]),
+                'pair': pair,
+                'source': source}
+
+
+    def best_route(self,
+                   from_code: str,
+                   to_code: str,
+                   max_hops: int = DEFAULT_MAX_HOPS) -> Optional[dict[str, Any]]:
+        """
+        Найти маршрут конвертации с наилучшим итоговым курсом.
+
+        Беллман-Форд с ограничением числа шагов: после k-го прохода
+        известны лучшие маршруты не длиннее k рёбер (проход читает
+        расстояния предыдущего). Ограничение делает ответ определённым
+        и при наличии арбитражных циклов.
+
+        :param from_code: Исходная валюта
+        :type from_code: str
+        :param to_code: Целевая валюта
+        :type to_code: str
+        :param max_hops: Максимальное число шагов
+        :type max_hops: int
+        :return: rate и hops (список шагов) или None, если маршрута нет
+        :rtype: Optional[dict[str, Any]]
+        """
+
+        start = self.index.get(from_code)
+        target = self.index.get(to_code)
+        if start is None or target is None or start == target:
+            return None
+
+        inf = math.inf
+        dist = [inf] * len(self.codes)
+        dist[start] = 0.0
+        # parents[k][v] - ребро, которым v достигнута на k-м проходе
+        parents: list[list[int]] = []
+        src, dst, weight = self.src, self.dst, self.weight
+        for _ in range(max_hops):
+            new_dist = dist[:]
+            parent = [-1] * len(self.codes)
+            changed = False
+            for edge in range(len(src)):
+                base = dist[src[edge]]
+                if base == inf:
+                    continue
+                candidate = base + weight[edge]
+                if candidate < new_dist[dst[edge]] - RELAX_EPSILON:
+                    new_dist[dst[edge]] = candidate
+                    parent[dst[edge]] = edge
+                    changed = True
+            parents.append(parent)
+            dist = new_dist
+            if not changed:
+                break
+
+        if dist[target] == inf:
+            return None
+
+        # Восстановление: на проходе k вершина либо улучшена ребром,
+        # либо сохранила расстояние с предыдущего прохода
+        hops = []
+        node = target
+        for parent in reversed(parents):
+            edge = parent[node]
+            if edge != -1:
+                hops.append(self._hop(edge))
+                node = self.src[edge]
+            if node == start:
+                break
+        hops.reverse()
+        return {'rate': math.exp(-dist[target]), 'hops': hops}
+
+
+    def find_arbitrage(self) -> list[dict[str, Any]]:
+        """
+        Найти арбитражные циклы (отрицательные циклы графа).
+
+        Беллман-Форд из фиктивного источника (все расстояния 0). После
+        каждого прохода граф предков проверяется на циклы за O(V): цикл
+        в графе предков всегда отрицательный, поэтому арбитраж находится,
+        не дожидаясь V проходов. Без арбитража проходы заканчиваются,
+        как только релаксации прекращаются.
+
+        :return: Циклы: profit_pct и hops (список шагов)
+        :rtype: list[dict[str, Any]]
+        """
+
+        n_nodes = len(self.codes)
+        dist = [0.0] * n_nodes
+        parent = [-1] * n_nodes
+        src, dst, weight = self.src, self.dst, self.weight
+        for _ in range(n_nodes):
+            changed = False
+            for edge in range(len(src)):
+                candidate = dist[src[edge]] + weight[edge]
+                if candidate < dist[dst[edge]] - RELAX_EPSILON:
+                    dist[dst[edge]] = candidate
+                    parent[dst[edge]] = edge
+                    changed = True
+            if not changed:
+                return []
+            cycles = self._parent_cycles(parent)
+            if cycles:
+                return cycles
+        return self._parent_cycles(parent)
+
+
+    def _parent_cycles(self, parent: list[int]) -> list[dict[str, Any]]:
+        """
+        Найти циклы в графе предков.
+
+        :param parent: Ребро-предок каждой вершины (-1 - нет)
+        :type parent: list[int]
+        :return: Циклы: profit_pct и hops
+        :rtype: list[dict[str, Any]]
+        """
+
+        cycles = []
+        # 0 - не посещена, иначе номер обхода, в котором посещена
+        seen = [0] * len(self.codes)
+        for start in range(len(self.codes)):
+            if seen[start]:
+                continue
+            walk = start + 1
+            node = start
+            while node != -1 and not seen[node]:
+                seen[node] = walk
+                edge = parent[node]
+                node = self.src[edge] if edge != -1 else -1
+            if node == -1 or seen[node] != walk:
+                continue
+
+            # node лежит на новом цикле: обойти его по предкам
+            edges = []
+            current = node
+            while True:
+                edge = parent[current]
+                edges.append(edge)
+                current = self.src[edge]
+                if current == node:
+                    break
+            edges.reverse()
+            total = sum(self.weight[edge] for edge in edges)
+            cycles.append({'profit_pct': math.expm1(-total) * 100,
+                           'hops': [self._hop(edge) for edge in edges]})
+        return cycles
+
+
+def format_route(hops: list[dict[str, Any]]) -> str:
+    """
+    Записать маршрут строкой вида 'EUR → USD → SOL'.
+
+    :param hops: Шаги маршрута
+    :type hops: list[dict[str, Any]]
+    :return: Маршрут
+    :rtype: str
+    """
+
+    return ' → '.join([hops[0]['from']] + [hop['to'] for hop in hops])
+
+
+def check_arbitrage(rates: Optional[dict[str, Any]] = None) -> list[dict[str, Any]]:
+    """
+    Найти арбитражные циклы в кэше курсов и записать их в журнал.
+
+    :param rates: Кэш курсов (по умолчанию - rates.json)
+    :type rates: Optional[dict[str, Any]]
+    :return: Циклы с прибылью не ниже порога arbitrage_min_profit_pct
+    :rtype: list[dict[str, Any]]
+    """
+
+    if rates is None:
+        rates = RatesStorage().load_rates()
+    threshold = config.get('arbitrage_min_profit_pct', 0.01)
+    cycles = [cycle for cycle in ConversionGraph.from_rates(rates).find_arbitrage()
+              if cycle['profit_pct'] >= threshold]
+
+    logger = logging.getLogger('base')
+    for cycle in cycles:
+        sources = ','.join(sorted({hop['source'] for hop in cycle['hops']}))
+        logger.warning(f"ARBITRAGE cycle='{format_route(cycle['hops'])}' "
+                       f"profit={cycle['profit_pct']:.4f}% sources='{sources}'")
+    return cycles
+
+
+def _on_rates_update(changes: dict[str, tuple[Optional[float], float]]) -> None:
+    """
+    Обработчик изменений курсов из хранилища.
+
+    :param changes: Изменения курсов
+    :type changes: dict[str, tuple[Optional[float], float]]
+    """
+
+    check_arbitrage()
+
+
+def install() -> None:
+    """
+    Подключить поиск арбитража к обновлениям кэша курсов.
+    """
+
+    add_rates_listener(_on_rates_update)
@@ -1,6 +1,59 @@
+import functools
+import json
+import os
 from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional
 
 from valutatrade_hub.core.exceptions import CurrencyNotFoundError
+from valutatrade_hub.parser_service.config import ParserConfig
+
+# Метаданные валют из файла реестра (currencies.json): версия файла
+# (mtime_ns, размер), флаг проверки версии и {код: метаданные}. Версия
+# сверяется один раз на команду, выводящую метаданные, или обновление
+# метаданных (reload_currency_metadata), а не при каждом обращении к свойствам.
+_metadata: dict[str, Any] = {'version': None, 'checked': False, 'currencies': {}}
+
+
+def reload_currency_metadata() -> None:
+    """
+    Сверить версию файла реестра валют и перечитать метаданные, если
+    файл изменился (например, его обновил MetadataRefresher).
+    """
+
+    path = ParserConfig().CURRENCIES_FILE_PATH
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        version = None
+
+    if version != _metadata['version'] or not _metadata['checked']:
+        currencies = dict()
+        if version is not None:
+            try:
+                with open(path, 'r') as fp:
+                    currencies = json.load(fp).get('currencies', {})
+            except json.JSONDecodeError:
+                pass
+        _metadata.update(version=version, currencies=currencies)
+    _metadata['checked'] = True
+
+
+def get_currency_metadata(code: str) -> dict[str, Any]:
+    """
+    Метаданные валюты (name, market_cap, circulating_supply, total_supply,
+    max_supply, updated_at) из памяти; файл реестра валют читается при
+    первом обращении, дальше - только через reload_currency_metadata.
+
+    :param code: Код валюты
+    :type code: str
+    :return: Метаданные (пустой словарь, если их нет)
+    :rtype: dict[str, Any]
+    """
+
+    if not _metadata['checked']:
+        reload_currency_metadata()
+    return _metadata['currencies'].get(code, {})
 
 
 class Currency(ABC):
@@ -8,7 +61,7 @@ class Currency(ABC):
     Абстрактный класс для валюты.
     """
 
-    def __init__(self, code: str, name: str) -> None:
+    def __init__(self, code: str, name: str, scale: int) -> None:
         """
         Создать валюту.
         
@@ -16,6 +69,8 @@ class Currency(ABC):
         :type code: str
         :param name: Человекочитаемое имя (например, “US Dollar”, “Bitcoin”)
         :type name: str
+        :param scale: Число знаков после запятой (минимальная единица 10^-scale)
+        :type scale: int
         """
 
         if not code.isupper():
@@ -28,9 +83,13 @@ class Currency(ABC):
         
         if not name:
             raise ValueError('Название валюты не может быть пустым!')
+
+        if not isinstance(scale, int) or scale < 0 or scale > 18:
+            raise ValueError('Точность валюты должна быть целым числом от 0 до 18!')
         
         self._code = code
         self._name = name
+        self._scale = scale
 
 
     @property
@@ -55,6 +114,18 @@ class Currency(ABC):
         """
 
         return self._name
+
+
+    @property
+    def scale(self) -> int:
+        """
+        Геттер.
+        
+        :return: Число знаков после запятой
+        :rtype: int
+        """
+
+        return self._scale
     
 
     @abstractmethod
@@ -77,7 +148,8 @@ class FiatCurrency(Currency):
     def __init__(self,
                  code: str,
                  name: str,
-                 issuing_country: str) -> None:
+                 issuing_country: str,
+                 scale: int = 2) -> None:
         """
         Создать фиатную валюту.
         
@@ -87,9 +159,11 @@ class FiatCurrency(Currency):
         :type name: str
         :param issuing_country: Страна/зона эмиссии
         :type issuing_country: str
+        :param scale: Число знаков после запятой
+        :type scale: int
         """
 
-        super().__init__(code, name)
+        super().__init__(code, name, scale)
         self._issuing_country = issuing_country
 
 
@@ -121,13 +195,17 @@ class FiatCurrency(Currency):
 class CryptoCurrency(Currency):
     """
     Криптовалюта.
+
+    Название, капитализация и эмиссия берутся из метаданных реестра
+    валют (обновляются из CoinGecko); значения конструктора - запасные.
     """
 
     def __init__(self,
                  code: str,
                  name: str,
                  algorithm: str,
-                 market_cap: float) -> None:
+                 market_cap: Optional[float] = None,
+                 scale: int = 8) -> None:
         """
         Создать криптовалюту.
         
@@ -137,12 +215,14 @@ class CryptoCurrency(Currency):
         :type name: str
         :param algorithm: Алгоритм шифрования
         :type algorithm: str
-        :param market_cap: Капитализация криптовалюты
-        :type market_cap: float
+        :param market_cap: Капитализация криптовалюты (если нет метаданных)
+        :type market_cap: Optional[float]
+        :param scale: Число знаков после запятой
+        :type scale: int
         """
 
-        super().__init__(code, name)
-        if not isinstance(market_cap, (int, float)):
+        super().__init__(code, name, scale)
+        if market_cap is not None and not isinstance(market_cap, (int, float)):
             raise ValueError('Капитализация криптовалюты должна быть ' \
             'вещественным числом')
         self._algorithm = algorithm
@@ -162,15 +242,39 @@ class CryptoCurrency(Currency):
     
 
     @property
-    def market_cap(self) -> float:
+    def name(self) -> str:
+        """
+        Геттер.
+        
+        :return: Название валюты
+        :rtype: str
+        """
+
+        return get_currency_metadata(self._code).get('name') or self._name
+
+
+    @property
+    def market_cap(self) -> Optional[float]:
         """
         Геттер.
         
-        :return: Капитализация
-        :rtype: float
+        :return: Капитализация (или None, если неизвестна)
+        :rtype: Optional[float]
         """
 
-        return self._market_cap
+        return get_currency_metadata(self._code).get('market_cap', self._market_cap)
+
+
+    @property
+    def circulating_supply(self) -> Optional[float]:
+        """
+        Геттер.
+        
+        :return: Монет в обращении (или None, если неизвестно)
+        :rtype: Optional[float]
+        """
+
+        return get_currency_metadata(self._code).get('circulating_supply')
     
 
     def get_display_info(self) -> str:
@@ -181,12 +285,32 @@ class CryptoCurrency(Currency):
         :rtype: str
         """
         
-        info = f"[CRYPTO] {self._code} — {self._name} "
-        info += f"(Algo: {self._algorithm}, MCAP: {self._market_cap:.2e})"
+        market_cap = self.market_cap
+        supply = self.circulating_supply
+        info = f"[CRYPTO] {self._code} — {self.name} "
+        info += f"(Algo: {self._algorithm}, MCAP: "
+        info += f"{market_cap:.2e}" if market_cap is not None else "n/a"
+        if supply is not None:
+            info += f", Supply: {supply:.4g}"
+        info += ")"
         return info
     
     
 
+# Реестр поддерживаемых валют. Порядок ключей стабилен: по нему
+# валюты нумеруются в бинарных/колоночных представлениях данных.
+CURRENCY_REGISTRY: dict[str, Callable[[], Currency]] = {
+    'USD': lambda: FiatCurrency('USD', 'Us Dollar', 'United States'),
+    'EUR': lambda: FiatCurrency('EUR', 'Euro', 'Eurozone'),
+    'GBP': lambda: FiatCurrency('GBP', 'British Pound', 'United Kingdom'),
+    'RUB': lambda: FiatCurrency('RUB', 'Russian Ruble', 'Russia'),
+    'BTC': lambda: CryptoCurrency('BTC', 'Bitcoin', 'SHA-256'),
+    'ETH': lambda: CryptoCurrency('ETH', 'Ethereum', 'Ethash'),
+    'SOL': lambda: CryptoCurrency('SOL', 'Solana', 'SHA-256'),
+}
+
+
+@functools.lru_cache(maxsize=None)
 def get_currency(code: str) -> Currency:
     """
     Фабрика для получения валюты по коду.
@@ -197,19 +321,7 @@ def get_currency(code: str) -> Currency:
     :rtype: Currency
     """
 
-    if code == 'USD':
-        return FiatCurrency('USD', 'Us Dollar', 'United States')
-    elif code == 'EUR':
-        return FiatCurrency('EUR', 'Euro', 'Eurozone')
-    elif code == 'GBP':
-        return FiatCurrency('GBP', 'British Pound', 'United Kingdom')
-    elif code == 'RUB':
-        return FiatCurrency('RUB', 'Russian Ruble', 'Russia')
-    elif code == 'BTC':
-        return CryptoCurrency('BTC', 'Bitcoin', 'SHA-256', 1159299359325)
-    elif code == 'ETH':
-        return CryptoCurrency('ETH', 'Ethereum', 'Ethash', 208687511047)
-    elif code == 'SOL':
-        return CryptoCurrency('SOL', 'Solana', 'SHA-256', 48253689284)
-    else:
-        raise CurrencyNotFoundError(code)
\ No newline at end of file
+    factory = CURRENCY_REGISTRY.get(code)
+    if factory is None:
+        raise CurrencyNotFoundError(code)
+    return factory()
@@ -0,0 +1,122 @@
+from typing import Any, Optional
+
+from valutatrade_hub.core.sharding import get_shard_map
+from valutatrade_hub.core.utils import load_users, records_version
+from valutatrade_hub.core.valuation import (
+    FileVersion,
+    ValuationCache,
+    get_valuation_cache,
+)
+
+
+class Leaderboard:
+    """
+    Рейтинг пользователей по стоимости портфеля в базовой валюте.
+
+    Места берутся из рейтинга кэша оценки: он обновляется при сделках
+    (изменение итога одного пользователя) и при изменении курсов
+    (только держатели изменившейся валюты), поэтому запрос первых N мест
+    или места пользователя не требует переоценки и сортировки портфелей.
+    Шарды загружаются в кэш при первом запросе; имена пользователей
+    перечитываются, только если изменился users.json шарда (или его журнал).
+    """
+
+    def __init__(self, cache: ValuationCache) -> None:
+        """
+        Создать рейтинг поверх кэша оценки.
+
+        :param cache: Кэш оценки
+        :type cache: ValuationCache
+        """
+
+        self.cache = cache
+        self.ranking = cache.enable_ranking()
+        # Шард → версия users.json и {ID: имя}
+        self._names: dict[str, tuple[FileVersion, dict[int, str]]] = dict()
+
+
+    def refresh(self) -> None:
+        """
+        Сверить кэш с курсами и портфелями всех шардов (без изменений
+        в файлах - только проверка версий).
+        """
+
+        self.cache.refresh_rates()
+        for data_path in get_shard_map().paths():
+            self.cache.load_shard(data_path)
+
+
+    def _name(self, user_id: int) -> str:
+        """
+        Имя пользователя по ID.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :return: Имя (или ID, если пользователь не найден)
+        :rtype: str
+        """
+
+        data_path = self.cache.shards.get(user_id)
+        if data_path is None:
+            return str(user_id)
+        version = records_version(data_path, 'users.json')
+        cached = self._names.get(data_path)
+        if cached is None or cached[0] != version:
+            cached = self._names[data_path] = (
+                version, {user['user_id']: user['username']
+                          for user in load_users(data_path)})
+        return cached[1].get(user_id, str(user_id))
+
+
+    def top(self, count: int) -> list[tuple[int, str, float]]:
+        """
+        Первые места рейтинга.
+
+        :param count: Число мест
+        :type count: int
+        :return: (место, имя, стоимость)
+        :rtype: list[tuple[int, str, float]]
+        """
+
+        return [(place, self._name(user_id), total) for place, (user_id, total)
+                in enumerate(self.ranking.top(count), start=1)]
+
+
+    def position(self, user_id: int) -> Optional[dict[str, Any]]:
+        """
+        Место пользователя в рейтинге.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :return: place, total и size (число участников) или None
+        :rtype: Optional[dict[str, Any]]
+        """
+
+        place = self.ranking.rank(user_id)
+        if place is None:
+            return None
+        return {'place': place,
+                'total': self.ranking.score(user_id),
+                'size': len(self.ranking)}
+
+
+# Рейтинги (базовая валюта → рейтинг), общие для процесса
+_leaderboards: dict[str, Leaderboard] = dict()
+
+
+def get_leaderboard(base: str = 'USD') -> Leaderboard:
+    """
+    Рейтинг пользователей в базовой валюте (с актуальными курсами и
+    портфелями).
+
+    :param base: Код базовой валюты
+    :type base: str
+    :return: Рейтинг
+    :rtype: Leaderboard
+    """
+
+    leaderboard = _leaderboards.get(base)
+    if leaderboard is None:
+        leaderboard = _leaderboards[base] = Leaderboard(get_valuation_cache(base))
+    leaderboard.refresh()
+    return leaderboard
@@ -1,18 +1,37 @@
 import hashlib
 import os
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 
 from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.money import from_units, to_units
 from valutatrade_hub.infra.settings import config
 from valutatrade_hub.parser_service.storage import RatesStorage
 
 
+def hash_password(password: str, salt: str) -> str:
+    """
+    Хэш пароля с солью.
+    
+    :param password: Пароль
+    :type password: str
+    :param salt: Соль
+    :type salt: str
+    :return: Хэш (hex)
+    :rtype: str
+    """
+
+    return hashlib.sha256((password + salt).encode('utf-8')).hexdigest()
+
+
 class User:
     """
     Пользователь системы.
     """
 
+    __slots__ = ('_user_id', '_username', '_hashed_password', '_salt',
+                 '_registration_date', '_dirty')
+
     def __init__(self,
                  user_id: int,
                  username: str,
@@ -39,6 +58,43 @@ class User:
         self._hashed_password = hashed_password
         self._salt = salt
         self._registration_date = registration_date
+        # Изменён после загрузки (или ещё не сохранён) - см. core.repository
+        self._dirty = True
+
+
+    @classmethod
+    def from_record(cls, record: dict[str, Any]) -> 'User':
+        """
+        Восстановить пользователя из записи users.json.
+        
+        :param record: Запись пользователя
+        :type record: dict[str, Any]
+        :return: Пользователь (без отметки об изменении)
+        :rtype: User
+        """
+
+        user = cls(record['user_id'],
+                   record['username'],
+                   record['hashed_password'],
+                   record['salt'],
+                   datetime.fromisoformat(record['registration_date']))
+        user._dirty = False
+        return user
+
+
+    def to_record(self) -> dict[str, Any]:
+        """
+        Запись пользователя для users.json.
+        
+        :return: Запись пользователя
+        :rtype: dict[str, Any]
+        """
+
+        return {'user_id': self._user_id,
+                'username': self._username,
+                'hashed_password': self._hashed_password,
+                'salt': self._salt,
+                'registration_date': self._registration_date.isoformat()}
 
 
     def get_user_info(self) -> str:
@@ -70,10 +126,10 @@ class User:
             raise ValueError('Пароль не должен быть короче 4 символов!')
         
         new_salt = os.urandom(8).hex()
-        new_hashed_password = (new_password + new_salt).encode('utf-8')
 
-        self._hashed_password = hashlib.sha256(new_hashed_password).hexdigest()
+        self._hashed_password = hash_password(new_password, new_salt)
         self._salt = new_salt
+        self._dirty = True
 
 
     def verify_password(self, password: str) -> bool:
@@ -86,8 +142,7 @@ class User:
         :rtype: bool
         """
 
-        verified = hashlib.sha256((password + self._salt).encode('utf-8'))\
-            .hexdigest() == self._hashed_password
+        verified = hash_password(password, self._salt) == self._hashed_password
         return verified
     
 
@@ -131,6 +186,7 @@ class User:
             raise ValueError('Имя пользователя не может быть пустым!')
         
         self._username = new_name
+        self._dirty = True
 
 
     @property
@@ -143,16 +199,40 @@ class User:
         """
 
         return self._registration_date
+
+
+    @property
+    def dirty(self) -> bool:
+        """
+        Геттер.
+        
+        :return: Флаг несохранённых изменений
+        :rtype: bool
+        """
+
+        return self._dirty
+
+
+    def mark_clean(self) -> None:
+        """
+        Отметить пользователя сохранённым.
+        """
+
+        self._dirty = False
     
 
 class Wallet:
     """
     Кошелёк пользователя для одной конкретной валюты.
+    Баланс хранится целым числом минимальных единиц валюты (см. core.money).
     """
 
+    __slots__ = ('currency_code', '_units', '_dirty')
+
     def __init__(self,
                  currency_code: str,
-                 balance: float = 0.0) -> None:
+                 balance: float = 0.0,
+                 units: Optional[int] = None) -> None:
         """
         Создать кошелёк.
         
@@ -160,10 +240,15 @@ class Wallet:
         :type currency_code: str
         :param balance: Баланс в данной валюте
         :type balance: float
+        :param units: Баланс в минимальных единицах (приоритетнее balance)
+        :type units: Optional[int]
         """
 
         self.currency_code = currency_code
-        self._balance = balance
+        if units is None:
+            units = to_units(balance, currency_code)
+        self._units = int(units)
+        self._dirty = True
 
 
     def deposit(self, amount: float) -> None:
@@ -180,7 +265,22 @@ class Wallet:
         if amount <= 0:
             raise ValueError('Сумма пополнения баланса должна быть больше нуля!')
         
-        self._balance += amount
+        self.deposit_units(to_units(amount, self.currency_code))
+
+
+    def deposit_units(self, units: int) -> None:
+        """
+        Пополнить баланс на целое число минимальных единиц.
+        
+        :param units: Сумма пополнения в минимальных единицах
+        :type units: int
+        """
+
+        if units <= 0:
+            raise ValueError('Сумма пополнения баланса должна быть больше нуля!')
+        
+        self._units += units
+        self._dirty = True
 
 
     def get_balance_info(self) -> str:
@@ -191,7 +291,7 @@ class Wallet:
         :rtype: str
         """
 
-        info = f"Текущий баланс: {self._balance:.2f} {self.currency_code}"
+        info = f"Текущий баланс: {self.balance:.2f} {self.currency_code}"
         return info
         
 
@@ -204,7 +304,7 @@ class Wallet:
         :rtype: float
         """
 
-        return self._balance
+        return from_units(self._units, self.currency_code)
     
 
     @balance.setter
@@ -222,7 +322,40 @@ class Wallet:
         if new_balance < 0:
             raise ValueError('Баланс не может быть отрицательным!')
         
-        self._balance = new_balance
+        self._units = to_units(new_balance, self.currency_code)
+        self._dirty = True
+
+
+    @property
+    def units(self) -> int:
+        """
+        Геттер.
+        
+        :return: Текущий баланс в минимальных единицах
+        :rtype: int
+        """
+
+        return self._units
+
+
+    @property
+    def dirty(self) -> bool:
+        """
+        Геттер.
+        
+        :return: Флаг несохранённых изменений
+        :rtype: bool
+        """
+
+        return self._dirty
+
+
+    def mark_clean(self) -> None:
+        """
+        Отметить кошелёк сохранённым.
+        """
+
+        self._dirty = False
 
 
     def withdraw(self, amount: float) -> None:
@@ -239,10 +372,25 @@ class Wallet:
         if amount <= 0:
             raise ValueError('Сумма снятия баланса должна быть больше нуля!')
         
-        if amount > self._balance:
+        self.withdraw_units(to_units(amount, self.currency_code))
+
+
+    def withdraw_units(self, units: int) -> None:
+        """
+        Снять с баланса целое число минимальных единиц.
+        
+        :param units: Сумма снятия в минимальных единицах
+        :type units: int
+        """
+
+        if units <= 0:
+            raise ValueError('Сумма снятия баланса должна быть больше нуля!')
+        
+        if units > self._units:
             raise ValueError('На балансе недостаточно средств!')
         
-        self._balance -= amount
+        self._units -= units
+        self._dirty = True
 
     
 class Portfolio:
@@ -250,6 +398,8 @@ class Portfolio:
     Портфель для управления всеми кошельками одного пользователя.
     """
 
+    __slots__ = ('_user_id', '_wallets')
+
     def __init__(self,
                  user_id: int,
                  wallets: dict[str, Wallet]) -> None:
@@ -279,22 +429,41 @@ class Portfolio:
         else:
             print(f'Кошелёк с валютой {currency_code} уже существует в портфеле'
                   f'пользователя {self._user_id}!')
+
+
+    def ensure_wallet(self, currency_code: str) -> Wallet:
+        """
+        Получить кошелёк, создав пустой при его отсутствии.
+        
+        :param currency_code: Код валюты
+        :type currency_code: str
+        :return: Кошелёк
+        :rtype: Wallet
+        """
+
+        wallet = self._wallets.get(currency_code)
+        if wallet is None:
+            wallet = self._wallets[currency_code] = Wallet(currency_code)
+        return wallet
     
     
-    def get_total_value(self, base_currency: str = 'USD') -> Optional[float]:
+    def get_total_value(self,
+                        base_currency: str = 'USD',
+                        rates: Optional[dict] = None) -> Optional[float]:
         """
         Возвращает общую стоимость всех валют пользователя
         в указанной базовой валюте.
 
         :param base_currency: Код базовой валюты
         :type base_currency: str
+        :param rates: Кэш курсов (по умолчанию читается rates.json)
+        :type rates: Optional[dict]
         :return: Общая стоимость
         :rtype: float
         """
 
-        storage = RatesStorage()
-    
-        rates = storage.load_rates()
+        if rates is None:
+            rates = RatesStorage().load_rates()
         pairs = rates.get('pairs', {})
         total = 0
 
@@ -309,13 +478,15 @@ class Portfolio:
             print("Курсы валют устарели! "\
                   "Обновите курсы с помощью команды update-rates.")
             return None
-            
-        for rate_key, rate_value in pairs.items():
-            from_currency, to_currency = rate_key.split('_')
-            if (to_currency == base_valuta.code and
-                from_currency in self._wallets.keys()):
-                total += rate_value.get('rate', 0) * \
-                         self._wallets[from_currency].balance
+
+        # Проход по кошелькам (их единицы), а не по всем парам кэша
+        for code, wallet in self._wallets.items():
+            if code == base_valuta.code:
+                total += wallet.balance
+                continue
+            rate = pairs.get(f'{code}_{base_valuta.code}', {}).get('rate')
+            if rate:
+                total += rate * wallet.balance
         
         return total
 
@@ -354,5 +525,17 @@ class Portfolio:
         """
 
         return self._wallets.get(currency_code)
+
+
+    @property
+    def dirty_wallets(self) -> list[Wallet]:
+        """
+        Геттер.
+        
+        :return: Кошельки с несохранёнными изменениями
+        :rtype: list[Wallet]
+        """
+
+        return [wallet for wallet in self._wallets.values() if wallet.dirty]
     
 
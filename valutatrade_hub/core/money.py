@@ -0,0 +1,113 @@
+from decimal import (
+    ROUND_CEILING,
+    ROUND_FLOOR,
+    ROUND_HALF_EVEN,
+    Decimal,
+)
+
+from valutatrade_hub.core.currencies import get_currency
+
+# Правила округления при переводе сумм в минимальные единицы:
+# - ввод пользователя и загрузка старых данных - банковское округление;
+# - списание (стоимость покупки) - вверх, в пользу платформы;
+# - зачисление (выручка от продажи) - вниз, в пользу платформы.
+ROUND_INPUT = ROUND_HALF_EVEN
+ROUND_DEBIT = ROUND_CEILING
+ROUND_CREDIT = ROUND_FLOOR
+
+
+def to_units(amount: float | int | str | Decimal,
+             code: str,
+             rounding: str = ROUND_INPUT) -> int:
+    """
+    Перевести сумму в целое число минимальных единиц валюты.
+
+    :param amount: Сумма в валюте
+    :type amount: float | int | str | Decimal
+    :param code: Код валюты
+    :type code: str
+    :param rounding: Правило округления (константа decimal)
+    :type rounding: str
+    :return: Количество минимальных единиц
+    :rtype: int
+    """
+
+    scale = get_currency(code).scale
+    # repr(float) даёт кратчайшее точное представление, без двоичного шума
+    value = Decimal(repr(amount)) if isinstance(amount, float) else Decimal(amount)
+    return int(value.scaleb(scale).to_integral_value(rounding=rounding))
+
+
+def from_units(units: int, code: str) -> float:
+    """
+    Перевести минимальные единицы в сумму (для отображения и расчётов курса).
+
+    :param units: Количество минимальных единиц
+    :type units: int
+    :param code: Код валюты
+    :type code: str
+    :return: Сумма в валюте
+    :rtype: float
+    """
+
+    return units / 10 ** get_currency(code).scale
+
+
+def convert_units(units: int,
+                  from_code: str,
+                  to_code: str,
+                  rate: float,
+                  rounding: str = ROUND_INPUT) -> int:
+    """
+    Пересчитать минимальные единицы одной валюты в другую по курсу.
+
+    :param units: Количество минимальных единиц исходной валюты
+    :type units: int
+    :param from_code: Исходная валюта
+    :type from_code: str
+    :param to_code: Целевая валюта
+    :type to_code: str
+    :param rate: Курс from_code → to_code
+    :type rate: float
+    :param rounding: Правило округления (константа decimal)
+    :type rounding: str
+    :return: Количество минимальных единиц целевой валюты
+    :rtype: int
+    """
+
+    shift = get_currency(to_code).scale - get_currency(from_code).scale
+    value = Decimal(units) * Decimal(repr(float(rate)))
+    return int(value.scaleb(shift).to_integral_value(rounding=rounding))
+
+
+def wallet_units(record: dict) -> int:
+    """
+    Получить баланс записи кошелька в минимальных единицах.
+    Поддерживает старый формат с вещественным полем 'balance'.
+
+    :param record: Запись кошелька из portfolios.json
+    :type record: dict
+    :return: Баланс в минимальных единицах
+    :rtype: int
+    """
+
+    if 'units' in record:
+        return int(record['units'])
+    return to_units(record.get('balance', 0), record['currency_code'])
+
+
+def wallet_record(code: str, units: int) -> dict:
+    """
+    Сформировать запись кошелька для portfolios.json.
+
+    :param code: Код валюты
+    :type code: str
+    :param units: Баланс в минимальных единицах
+    :type units: int
+    :return: Запись кошелька
+    :rtype: dict
+    """
+
+    return {'currency_code': code,
+            'units': int(units),
+            'scale': get_currency(code).scale}
@@ -0,0 +1,534 @@
+import heapq
+import json
+import logging
+import os
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Optional
+
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.models import Portfolio
+from valutatrade_hub.core.money import (
+    ROUND_CREDIT,
+    ROUND_DEBIT,
+    convert_units,
+    from_units,
+)
+from valutatrade_hub.core.repository import Repository
+from valutatrade_hub.core.sharding import user_data_path
+from valutatrade_hub.core.trading import TRADE_BASE, execute_buy, execute_sell
+from valutatrade_hub.core.utils import data_lock
+from valutatrade_hub.infra.settings import config
+from valutatrade_hub.parser_service.storage import RatesStorage, add_rates_listener
+
+# Условия срабатывания отложенных заявок (rate - новый курс валюты к USD):
+#   buy  limit - rate <= price,   sell limit - rate >= price,
+#   buy  stop  - rate >= price,   sell stop  - rate <= price.
+ORDER_SIDES = ('buy', 'sell')
+ORDER_TYPES = ('limit', 'stop')
+
+# Запас резерва стоп-заявки на покупку, % к цене (ключ конфига
+# stop_slippage_pct): она исполняется по курсу не ниже цены срабатывания
+STOP_SLIPPAGE_PCT = 1.0
+
+
+def is_triggered(side: str, order_type: str, price: float, rate: float) -> bool:
+    """
+    Проверить, сработала бы заявка при данном курсе.
+
+    :param side: Направление (buy, sell)
+    :type side: str
+    :param order_type: Тип (limit, stop)
+    :type order_type: str
+    :param price: Цена срабатывания
+    :type price: float
+    :param rate: Курс валюты к USD
+    :type rate: float
+    :return: Флаг срабатывания
+    :rtype: bool
+    """
+
+    if (side, order_type) in (('buy', 'limit'), ('sell', 'stop')):
+        return rate <= price
+    return rate >= price
+
+
+def _current_rate(pair: str) -> Optional[float]:
+    """
+    Текущий курс пары из кэша курсов (без проверки срока годности).
+
+    :param pair: Пара
+    :type pair: str
+    :return: Курс (или None, если его нет)
+    :rtype: Optional[float]
+    """
+
+    storage = RatesStorage()
+    snapshot = storage.open_snapshot()
+    if snapshot is not None:
+        record, _ = snapshot.lookup(pair)
+    else:
+        record = storage.load_rates().get('pairs', {}).get(pair)
+    return record.get('rate') if record else None
+
+
+class _PairBook:
+    """
+    Книга заявок одной пары: кучи по цене срабатывания.
+
+    Заявки, срабатывающие при price >= rate (buy limit, sell stop), лежат
+    в max-куче, срабатывающие при price <= rate (sell limit, buy stop) -
+    в min-куче. На обновление курса извлекаются только сработавшие заявки.
+    Отменённые заявки удаляются из куч лениво.
+    """
+
+    __slots__ = ('at_or_above', 'at_or_below')
+
+    def __init__(self) -> None:
+        """
+        Создать пустую книгу.
+        """
+
+        self.at_or_above: list[tuple[float, int]] = []
+        self.at_or_below: list[tuple[float, int]] = []
+
+
+    def push(self, order: dict[str, Any]) -> None:
+        """
+        Поместить заявку в книгу.
+
+        :param order: Заявка
+        :type order: dict[str, Any]
+        """
+
+        if (order['side'], order['type']) in (('buy', 'limit'), ('sell', 'stop')):
+            heapq.heappush(self.at_or_above, (-order['price'], order['id']))
+        else:
+            heapq.heappush(self.at_or_below, (order['price'], order['id']))
+
+
+    def pop_triggered(self, rate: float) -> list[int]:
+        """
+        Извлечь заявки, сработавшие при данном курсе.
+
+        :param rate: Новый курс
+        :type rate: float
+        :return: ID сработавших заявок (включая уже отменённые)
+        :rtype: list[int]
+        """
+
+        triggered = []
+        while self.at_or_above and -self.at_or_above[0][0] >= rate:
+            triggered.append(heapq.heappop(self.at_or_above)[1])
+        while self.at_or_below and self.at_or_below[0][0] <= rate:
+            triggered.append(heapq.heappop(self.at_or_below)[1])
+        return triggered
+
+
+class OrdersEngine:
+    """
+    Отложенные лимитные и стоп-заявки с резервированием средств,
+    исполняемые пакетно при обновлении курсов.
+    """
+
+    def __init__(self, data_path: str) -> None:
+        """
+        Создать движок заявок.
+
+        :param data_path: Путь к данным
+        :type data_path: str
+        """
+
+        self.data_path = data_path
+        self.orders_path = os.path.join(data_path, 'orders.json')
+        self.log_path = os.path.join(data_path, 'orders.log')
+
+        self._orders: dict[int, dict[str, Any]] = dict()
+        self._books: dict[str, _PairBook] = dict()
+        self._next_id = 1
+        self._version: Optional[tuple[int, int, int]] = None
+        self._loaded = False
+
+
+    def _file_version(self) -> Optional[tuple[int, int, int]]:
+        """
+        Версия orders.json: (inode, mtime_ns, размер). Файл заменяется
+        атомарно, поэтому каждая запись даёт новый inode.
+
+        :return: Версия (или None, если файла нет)
+        :rtype: Optional[tuple[int, int, int]]
+        """
+
+        try:
+            stat = os.stat(self.orders_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+    def _ensure_loaded(self) -> None:
+        """
+        Загрузить открытые заявки, если файл изменился с прошлой загрузки.
+        Вызывается под блокировкой каталога заявок: иначе два процесса
+        могут исполнить или отменить одну и ту же заявку.
+        """
+
+        version = self._file_version()
+        if self._loaded and version == self._version:
+            return None
+
+        data = {'next_id': 1, 'orders': []}
+        if version is not None:
+            with open(self.orders_path, 'r') as fp:
+                data = json.load(fp)
+
+        self._orders = dict()
+        self._books = dict()
+        self._next_id = data.get('next_id', 1)
+        for order in data.get('orders', []):
+            self._orders[order['id']] = order
+            self._books.setdefault(order['pair'], _PairBook()).push(order)
+        self._version = version
+        self._loaded = True
+
+
+    def _save(self, closed: Optional[list[dict[str, Any]]] = None) -> None:
+        """
+        Сохранить открытые заявки и дописать закрытые в журнал.
+
+        :param closed: Исполненные, отклонённые или отменённые заявки
+        :type closed: Optional[list[dict[str, Any]]]
+        """
+
+        os.makedirs(self.data_path, exist_ok=True)
+        if closed:
+            with open(self.log_path, 'a') as fp:
+                for order in closed:
+                    fp.write(json.dumps(order, ensure_ascii=False) + '\n')
+
+        data = {'next_id': self._next_id,
+                'orders': list(self._orders.values())}
+        tmp_file = f"{self.orders_path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump(data, fp, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.orders_path)
+        self._version = self._file_version()
+
+
+    def place_order(self,
+                    user_id: int,
+                    username: str,
+                    side: str,
+                    order_type: str,
+                    currency: str,
+                    amount_units: int,
+                    price: float) -> dict[str, Any]:
+        """
+        Выставить заявку и зарезервировать под неё средства.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :param username: Имя пользователя
+        :type username: str
+        :param side: Направление (buy, sell)
+        :type side: str
+        :param order_type: Тип (limit, stop)
+        :type order_type: str
+        :param currency: Код валюты
+        :type currency: str
+        :param amount_units: Количество валюты в минимальных единицах
+        :type amount_units: int
+        :param price: Цена срабатывания (курс currency → USD)
+        :type price: float
+        :return: Заявка
+        :rtype: dict[str, Any]
+        """
+
+        if side not in ORDER_SIDES:
+            raise ValueError(f"Неизвестное направление заявки '{side}'!")
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"Неизвестный тип заявки '{order_type}'!")
+        if price <= 0:
+            raise ValueError('Цена заявки должна быть положительным числом!')
+
+        # Заявка, условие которой уже выполнено, исполнилась бы при
+        # следующем обновлении без предупреждения: для этого есть buy/sell
+        rate = _current_rate(f'{currency}_{TRADE_BASE}')
+        if rate and is_triggered(side, order_type, price, rate):
+            raise ValueError(f"Заявка сработала бы сразу: текущий курс "
+                             f"{currency}→{TRADE_BASE} {rate:.8f}. "
+                             "Используйте buy/sell или измените цену!")
+
+        shard_path = user_data_path(username)
+        with data_lock(self.data_path), data_lock(shard_path):
+            # next_id и книги - по текущему файлу, уже под блокировкой
+            self._ensure_loaded()
+            repository = Repository(shard_path)
+            portfolio = repository.get_portfolio(user_id)
+
+            if side == 'buy':
+                # Стоп на покупку исполняется по курсу выше цены: резерв с
+                # запасом, а исполнение не выходит за резерв (см. _fill_units)
+                reserve_price = price
+                if order_type == 'stop':
+                    reserve_price *= 1 + config.get('stop_slippage_pct',
+                                                    STOP_SLIPPAGE_PCT) / 100
+                reserve_code = TRADE_BASE
+                reserved = convert_units(amount_units, currency, TRADE_BASE,
+                                         reserve_price, ROUND_DEBIT)
+            else:
+                reserve_code = currency
+                reserved = amount_units
+
+            wallet = portfolio.get_wallet(reserve_code)
+            available = wallet.units if wallet is not None else 0
+            if reserved > available:
+                raise InsufficientFundsError(from_units(available, reserve_code),
+                                             from_units(reserved, reserve_code),
+                                             reserve_code)
+            if reserved:
+                wallet.withdraw_units(reserved)
+
+            order = {'id': self._next_id,
+                     'user_id': user_id,
+                     'username': username,
+                     'pair': f'{currency}_{TRADE_BASE}',
+                     'currency': currency,
+                     'side': side,
+                     'type': order_type,
+                     'amount_units': amount_units,
+                     'price': price,
+                     'reserved_code': reserve_code,
+                     'reserved_units': reserved,
+                     'status': 'open',
+                     'created_at': datetime.now().isoformat()}
+            self._next_id += 1
+            self._orders[order['id']] = order
+            self._books.setdefault(order['pair'], _PairBook()).push(order)
+
+            repository.commit()
+            self._save()
+        return order
+
+
+    def cancel_order(self, username: str, order_id: int) -> Optional[dict]:
+        """
+        Отменить заявку пользователя и вернуть резерв на баланс.
+
+        :param username: Имя пользователя
+        :type username: str
+        :param order_id: ID заявки
+        :type order_id: int
+        :return: Отменённая заявка (или None, если не найдена)
+        :rtype: dict | None
+        """
+
+        shard_path = user_data_path(username)
+        with data_lock(self.data_path), data_lock(shard_path):
+            # Заявка могла быть исполнена или отменена другим процессом
+            self._ensure_loaded()
+            order = self._orders.get(order_id)
+            if order is None or order['username'] != username:
+                return None
+
+            repository = Repository(shard_path)
+            self._release(repository.get_portfolio(order['user_id']), order)
+            repository.commit()
+
+            del self._orders[order_id]
+            order.update(status='cancelled', closed_at=datetime.now().isoformat())
+            self._save([order])
+        return order
+
+
+    def list_orders(self, username: str) -> list[dict[str, Any]]:
+        """
+        Получить открытые заявки пользователя.
+
+        :param username: Имя пользователя
+        :type username: str
+        :return: Список заявок
+        :rtype: list[dict[str, Any]]
+        """
+
+        self._ensure_loaded()
+        return [order for order in self._orders.values()
+                if order['username'] == username]
+
+
+    @staticmethod
+    def _release(portfolio: Portfolio, order: dict[str, Any]) -> None:
+        """
+        Вернуть резерв заявки на баланс.
+
+        :param portfolio: Портфель владельца заявки
+        :type portfolio: Portfolio
+        :param order: Заявка
+        :type order: dict[str, Any]
+        """
+
+        wallet = portfolio.ensure_wallet(order['reserved_code'])
+        if order['reserved_units']:
+            wallet.deposit_units(order['reserved_units'])
+
+
+    @staticmethod
+    def _fill_units(order: dict[str, Any], rate: float) -> int:
+        """
+        Количество валюты к исполнению: для покупки - не больше, чем
+        покрывает резерв заявки по курсу исполнения (остальные средства
+        пользователя, в том числе резервы других заявок, не затрагиваются).
+
+        :param order: Заявка
+        :type order: dict[str, Any]
+        :param rate: Курс исполнения
+        :type rate: float
+        :return: Количество в минимальных единицах
+        :rtype: int
+        """
+
+        units = order['amount_units']
+        if order['side'] != 'buy':
+            return units
+        reserved = order['reserved_units']
+        if convert_units(units, order['currency'], TRADE_BASE,
+                         rate, ROUND_DEBIT) <= reserved:
+            return units
+        units = convert_units(reserved, TRADE_BASE, order['currency'],
+                              1 / rate, ROUND_CREDIT)
+        while units > 0 and convert_units(units, order['currency'], TRADE_BASE,
+                                          rate, ROUND_DEBIT) > reserved:
+            units -= 1
+        return units
+
+
+    def on_rates_update(self,
+                        changes: dict[str, tuple[Optional[float], float]]) -> list:
+        """
+        Исполнить сработавшие заявки одним пакетом.
+
+        :param changes: {пара: (старый курс или None, новый курс)}
+        :type changes: dict[str, tuple[Optional[float], float]]
+        :return: Закрытые заявки
+        :rtype: list[dict[str, Any]]
+        """
+
+        with ExitStack() as stack:
+            # Каталог заявок, затем шарды владельцев - всегда в одном порядке.
+            # Заявки перечитываются и извлекаются из книг только под
+            # блокировкой каталога, поэтому сработавшую заявку исполняет
+            # ровно один процесс.
+            stack.enter_context(data_lock(self.data_path))
+            self._ensure_loaded()
+            triggered = []
+            for pair, (_, new_rate) in changes.items():
+                book = self._books.get(pair)
+                if book is None:
+                    continue
+                for order_id in book.pop_triggered(new_rate):
+                    order = self._orders.get(order_id)
+                    if order is not None:
+                        triggered.append((order, new_rate))
+            if not triggered:
+                return []
+
+            # Книги уже изменены: пока файл не записан, состояние в памяти
+            # считается незагруженным (при ошибке оно перечитается)
+            self._loaded = False
+            shard_paths = {order['username']: user_data_path(order['username'])
+                           for order, _ in triggered}
+            repositories = dict()
+            for shard_path in sorted(set(shard_paths.values())):
+                stack.enter_context(data_lock(shard_path))
+                repositories[shard_path] = Repository(shard_path)
+
+            closed = []
+            for order, rate in sorted(triggered, key=lambda item: item[0]['id']):
+                # Резерв возвращается, и заявка проходит те же проверки,
+                # что и обычная покупка/продажа по текущему курсу.
+                repository = repositories[shard_paths[order['username']]]
+                portfolio = repository.get_portfolio(order['user_id'])
+                self._release(portfolio, order)
+                execute = execute_buy if order['side'] == 'buy' else execute_sell
+                units = self._fill_units(order, rate)
+                try:
+                    if units <= 0:
+                        raise ValueError('Резерва заявки не хватает на покупку '
+                                         'по текущему курсу!')
+                    execute(portfolio, order['currency'], units, rate)
+                except (InsufficientFundsError, ValueError) as e:
+                    order.update(status='rejected', reason=str(e))
+                else:
+                    order.update(status='filled', fill_rate=rate,
+                                 filled_units=units)
+                order['closed_at'] = datetime.now().isoformat()
+                del self._orders[order['id']]
+                closed.append(order)
+
+            for repository in repositories.values():
+                repository.commit()
+            self._save(closed)
+            self._loaded = True
+        self._log(closed)
+        return closed
+
+
+    @staticmethod
+    def _log(closed: list[dict[str, Any]]) -> None:
+        """
+        Записать исполнение заявок в журнал действий.
+
+        :param closed: Закрытые заявки
+        :type closed: list[dict[str, Any]]
+        """
+
+        logger = logging.getLogger('base')
+        for order in closed:
+            amount = from_units(order.get('filled_units', order['amount_units']),
+                                order['currency'])
+            info = f"ORDER id={order['id']} user='{order['username']}' "\
+                   f"side='{order['side']}' type='{order['type']}' "\
+                   f"currency='{order['currency']}' amount={amount:.4f} "\
+                   f"price={order['price']:.2f} "
+            if order['status'] == 'filled':
+                logger.info(info + f"rate={order['fill_rate']:.2f} result=OK")
+            else:
+                logger.error(info + f"msg='{order.get('reason', '')}' "
+                             "result=ERROR")
+
+
+_engines: dict[str, OrdersEngine] = dict()
+
+
+def get_orders_engine() -> OrdersEngine:
+    """
+    Получить движок заявок для текущего каталога данных.
+
+    :return: Движок заявок
+    :rtype: OrdersEngine
+    """
+
+    data_path = config.get('data_path', 'data/')
+    engine = _engines.get(data_path)
+    if engine is None:
+        engine = _engines[data_path] = OrdersEngine(data_path)
+    return engine
+
+
+def _on_rates_update(changes: dict[str, tuple[Optional[float], float]]) -> None:
+    """
+    Обработчик изменений курсов из хранилища.
+
+    :param changes: Изменения курсов
+    :type changes: dict[str, tuple[Optional[float], float]]
+    """
+
+    get_orders_engine().on_rates_update(changes)
+
+
+def install() -> None:
+    """
+    Подключить исполнение заявок к обновлениям кэша курсов.
+    """
+
+    add_rates_listener(_on_rates_update)
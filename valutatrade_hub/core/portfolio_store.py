@@ -0,0 +1,234 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterator, Optional
+
+from valutatrade_hub.core.currencies import CURRENCY_REGISTRY
+from valutatrade_hub.core.money import wallet_units
+from valutatrade_hub.core.utils import load_portfolios
+
+
+class PortfolioStore:
+    """
+    Колоночное хранилище портфелей в памяти.
+
+    Каждому пользователю соответствует строка, индексом служит
+    отсортированная колонка user_id (поиск строки - бинарный), каждой
+    валюте - непрерывная колонка int64 с балансом в минимальных единицах
+    и байтовая колонка-признак наличия кошелька. Хранилище служит для
+    чтения: оценка, риск и перебалансировка всех портфелей (core.risk,
+    core.allocation, core.valuation) читают колонки без копирования и
+    без создания объектов на каждый кошелёк. Сделки идут через кошельки
+    Repository и дописываются в журнал portfolios.json по пользователю;
+    если хранилище уже построено, Repository.commit меняет в нём только
+    ячейки изменённых кошельков.
+    """
+
+    def __init__(self) -> None:
+        """
+        Создать пустое хранилище.
+        """
+
+        self._user_ids = array('q')
+        self._columns: dict[str, array] = dict()
+        self._present: dict[str, bytearray] = dict()
+
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> 'PortfolioStore':
+        """
+        Построить хранилище из записей формата portfolios.json.
+
+        :param records: Список портфелей
+        :type records: list[dict]
+        :return: Хранилище
+        :rtype: PortfolioStore
+        """
+
+        store = cls()
+        for record in sorted(records, key=lambda record: record['user_id']):
+            store.add_user(record['user_id'],
+                           {code: wallet_units(wallet)
+                            for code, wallet in record['wallets'].items()})
+        return store
+
+
+    @classmethod
+    def load(cls, data_path: str) -> 'PortfolioStore':
+        """
+        Загрузить хранилище из portfolios.json.
+
+        :param data_path: Путь к данным
+        :type data_path: str
+        :return: Хранилище
+        :rtype: PortfolioStore
+        """
+
+        return cls.from_records(load_portfolios(data_path))
+
+
+    def __len__(self) -> int:
+        """
+        Число портфелей в хранилище.
+
+        :return: Число строк
+        :rtype: int
+        """
+
+        return len(self._user_ids)
+
+
+    def __contains__(self, user_id: int) -> bool:
+        """
+        Проверить наличие портфеля пользователя.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :return: Флаг наличия портфеля
+        :rtype: bool
+        """
+
+        row = bisect_left(self._user_ids, user_id)
+        return row < len(self._user_ids) and self._user_ids[row] == user_id
+
+
+    @property
+    def user_ids(self) -> array:
+        """
+        Геттер.
+
+        :return: Колонка ID пользователей (порядок строк)
+        :rtype: array
+        """
+
+        return self._user_ids
+
+
+    @property
+    def currencies(self) -> list[str]:
+        """
+        Геттер.
+
+        :return: Коды валют, для которых есть колонки (в порядке реестра)
+        :rtype: list[str]
+        """
+
+        order = list(CURRENCY_REGISTRY)
+        return sorted(self._columns,
+                      key=lambda code: (order.index(code)
+                                        if code in order else len(order), code))
+
+
+    def column(self, code: str) -> Optional[array]:
+        """
+        Получить колонку балансов валюты (без копирования).
+
+        :param code: Код валюты
+        :type code: str
+        :return: Колонка int64 (или None, если кошельков в валюте нет)
+        :rtype: array | None
+        """
+
+        return self._columns.get(code)
+
+
+    def row(self, user_id: int) -> int:
+        """
+        Получить номер строки пользователя.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :return: Номер строки
+        :rtype: int
+        """
+
+        row = bisect_left(self._user_ids, user_id)
+        if row == len(self._user_ids) or self._user_ids[row] != user_id:
+            raise KeyError(f'Портфель пользователя {user_id} не найден!')
+        return row
+
+
+    def add_user(self, user_id: int, wallets: dict[str, int]) -> None:
+        """
+        Добавить портфель пользователя.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :param wallets: Балансы кошельков в минимальных единицах
+        :type wallets: dict[str, int]
+        """
+
+        if user_id in self:
+            raise ValueError(f'Портфель пользователя {user_id} уже существует!')
+
+        # Новые ID обычно больше всех существующих - это дозапись в конец
+        row = bisect_left(self._user_ids, user_id)
+        self._user_ids.insert(row, user_id)
+        for column in self._columns.values():
+            column.insert(row, 0)
+        for present in self._present.values():
+            present.insert(row, 0)
+
+        for code, units in wallets.items():
+            self.set_units(user_id, code, units)
+
+
+    def _ensure_column(self, code: str) -> None:
+        """
+        Создать колонку валюты, если её ещё нет.
+
+        :param code: Код валюты
+        :type code: str
+        """
+
+        if code not in self._columns:
+            self._columns[code] = array('q', bytes(8 * len(self._user_ids)))
+            self._present[code] = bytearray(len(self._user_ids))
+
+
+    def set_units(self, user_id: int, code: str, units: int) -> None:
+        """
+        Установить баланс кошелька (кошелёк создаётся при необходимости).
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :param code: Код валюты
+        :type code: str
+        :param units: Баланс в минимальных единицах
+        :type units: int
+        """
+
+        if units < 0:
+            raise ValueError('Баланс не может быть отрицательным!')
+
+        row = self.row(user_id)
+        self._ensure_column(code)
+        self._columns[code][row] = units
+        self._present[code][row] = 1
+
+
+    def _iter_wallets(self, row: int) -> Iterator[tuple[str, int]]:
+        """
+        Перечислить кошельки строки в порядке реестра валют.
+
+        :param row: Номер строки
+        :type row: int
+        :return: Пары (код валюты, баланс в минимальных единицах)
+        :rtype: Iterator[tuple[str, int]]
+        """
+
+        for code in self.currencies:
+            if self._present[code][row]:
+                yield code, self._columns[code][row]
+
+
+    def wallets(self, user_id: int) -> dict[str, int]:
+        """
+        Получить все кошельки пользователя.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :return: Балансы кошельков в минимальных единицах
+        :rtype: dict[str, int]
+        """
+
+        return dict(self._iter_wallets(self.row(user_id)))
@@ -0,0 +1,267 @@
+import math
+import random
+from typing import Any, Iterator, Optional
+
+# Максимальная высота башни списка с пропусками (хватает на ~16 млн ключей)
+MAX_LEVEL = 24
+
+
+class _Node:
+    """
+    Узел списка с пропусками: ключ, ссылки на следующие узлы по уровням
+    и ширина каждой ссылки (сколько узлов первого уровня она перепрыгивает).
+    """
+
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key: Any, level: int) -> None:
+        """
+        Создать узел.
+
+        :param key: Ключ
+        :type key: Any
+        :param level: Высота башни
+        :type level: int
+        """
+
+        self.key = key
+        self.next: list[Optional[_Node]] = [None] * level
+        self.width = [1] * level
+
+
+class RankIndex:
+    """
+    Порядковая статистика по счёту: индексируемый список с пропусками.
+
+    Ключ участника - (-счёт, ID), поэтому участники упорядочены по
+    убыванию счёта, а равные счета - по ID. Ширины ссылок позволяют за
+    O(log n) найти место участника и участника на заданном месте;
+    изменение счёта - удаление старого ключа и вставка нового, тоже
+    O(log n).
+    """
+
+    __slots__ = ('_head', '_scores')
+
+    def __init__(self) -> None:
+        """
+        Создать пустой индекс.
+        """
+
+        self._head = _Node(None, MAX_LEVEL)
+        self._scores: dict[int, float] = dict()
+
+
+    def __len__(self) -> int:
+        """
+        Число участников.
+
+        :return: Число участников
+        :rtype: int
+        """
+
+        return len(self._scores)
+
+
+    def __contains__(self, member: int) -> bool:
+        """
+        Проверить, есть ли участник в индексе.
+
+        :param member: ID участника
+        :type member: int
+        :return: Флаг наличия
+        :rtype: bool
+        """
+
+        return member in self._scores
+
+
+    def _chain(self, key: tuple[float, int]) -> tuple[list[_Node], list[int]]:
+        """
+        Найти на каждом уровне последний узел с ключом меньше заданного.
+
+        :param key: Ключ
+        :type key: tuple[float, int]
+        :return: Узлы по уровням и их позиции (голова - позиция 0)
+        :rtype: tuple[list[_Node], list[int]]
+        """
+
+        chain = [self._head] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node, position = self._head, 0
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+
+    def _insert(self, key: tuple[float, int]) -> None:
+        """
+        Вставить ключ.
+
+        :param key: Ключ
+        :type key: tuple[float, int]
+        """
+
+        chain, positions = self._chain(key)
+        level = 1
+        while level < MAX_LEVEL and random.random() < 0.5:
+            level += 1
+
+        node = _Node(key, level)
+        position = positions[0] + 1
+        for i in range(level):
+            prev = chain[i]
+            node.next[i] = prev.next[i]
+            prev.next[i] = node
+            # Ширина ссылки до хвоста не используется и может быть любой
+            node.width[i] = prev.width[i] - (position - positions[i]) + 1
+            prev.width[i] = position - positions[i]
+        for i in range(level, MAX_LEVEL):
+            chain[i].width[i] += 1
+
+
+    def _remove(self, key: tuple[float, int]) -> None:
+        """
+        Удалить ключ.
+
+        :param key: Ключ
+        :type key: tuple[float, int]
+        """
+
+        chain, _ = self._chain(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(len(node.next)):
+            prev = chain[i]
+            prev.width[i] += node.width[i] - 1
+            prev.next[i] = node.next[i]
+        for i in range(len(node.next), MAX_LEVEL):
+            chain[i].width[i] -= 1
+
+
+    def update(self, member: int, score: float) -> None:
+        """
+        Установить счёт участника (добавив его, если его ещё нет).
+
+        :param member: ID участника
+        :type member: int
+        :param score: Счёт
+        :type score: float
+        """
+
+        old = self._scores.get(member)
+        if old == score:
+            return None
+        if old is not None:
+            self._remove((-old, member))
+        self._insert((-score, member))
+        self._scores[member] = score
+
+
+    def discard(self, member: int) -> None:
+        """
+        Удалить участника, если он есть.
+
+        :param member: ID участника
+        :type member: int
+        """
+
+        old = self._scores.pop(member, None)
+        if old is not None:
+            self._remove((-old, member))
+
+
+    def rank(self, member: int) -> Optional[int]:
+        """
+        Место участника (с 1).
+
+        :param member: ID участника
+        :type member: int
+        :return: Место (или None, если участника нет)
+        :rtype: Optional[int]
+        """
+
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        _, positions = self._chain((-score, member))
+        return positions[0] + 1
+
+
+    def score(self, member: int) -> Optional[float]:
+        """
+        Счёт участника.
+
+        :param member: ID участника
+        :type member: int
+        :return: Счёт (или None, если участника нет)
+        :rtype: Optional[float]
+        """
+
+        return self._scores.get(member)
+
+
+    def top(self, count: int, start: int = 0) -> Iterator[tuple[int, float]]:
+        """
+        Участники по убыванию счёта, начиная с места start + 1:
+        O(log n) на поиск первого и O(1) на каждого следующего.
+
+        :param count: Число участников
+        :type count: int
+        :param start: Сколько первых мест пропустить
+        :type start: int
+        :return: (ID участника, счёт)
+        :rtype: Iterator[tuple[int, float]]
+        """
+
+        node, remaining = self._head, start
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        node = node.next[0]
+        while node is not None and count > 0:
+            score, member = node.key
+            yield member, -score
+            node = node.next[0]
+            count -= 1
+
+
+    def between(self,
+                low: float,
+                high: float,
+                include_low: bool = True,
+                include_high: bool = True) -> list[int]:
+        """
+        Участники со счётом в интервале от low до high (по убыванию
+        счёта): O(log n) на поиск первого и O(1) на каждого следующего.
+
+        :param low: Нижняя граница счёта
+        :type low: float
+        :param high: Верхняя граница счёта
+        :type high: float
+        :param include_low: Включать нижнюю границу
+        :type include_low: bool
+        :param include_high: Включать верхнюю границу
+        :type include_high: bool
+        :return: ID участников
+        :rtype: list[int]
+        """
+
+        # Ключ -счёт: первый подходящий узел идёт сразу за последним
+        # узлом с ключом меньше (-high, ±inf)
+        start = (-high, -math.inf) if include_high else (-high, math.inf)
+        chain, _ = self._chain(start)
+        node = chain[0].next[0]
+        members = []
+        while node is not None:
+            score, member = -node.key[0], node.key[1]
+            if score < low or (score == low and not include_low):
+                break
+            members.append(member)
+            node = node.next[0]
+        return members
@@ -0,0 +1,474 @@
+import heapq
+import json
+import logging
+import os
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Optional
+
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.money import ROUND_CREDIT, convert_units, from_units
+from valutatrade_hub.core.repository import Repository
+from valutatrade_hub.core.sharding import user_data_path
+from valutatrade_hub.core.trading import TRADE_BASE, execute_buy, execute_sell
+from valutatrade_hub.core.utils import data_lock
+from valutatrade_hub.infra.settings import config
+from valutatrade_hub.parser_service.storage import RatesStorage, add_rates_listener
+
+# Единицы периода регулярной заявки: '12h', '1d', '1w' и т. п.
+INTERVAL_UNITS = {'m': 60, 'h': 3600, 'd': 24 * 3600, 'w': 7 * 24 * 3600}
+
+# Минимальный период регулярной заявки, секунды
+MIN_INTERVAL_SECONDS = 60
+
+
+def parse_interval(spec: str) -> int:
+    """
+    Разобрать период вида '1d', '12h', '30m', '1w'.
+
+    :param spec: Период
+    :type spec: str
+    :return: Период в секундах
+    :rtype: int
+    """
+
+    unit = INTERVAL_UNITS.get(spec[-1:].lower())
+    try:
+        count = int(spec[:-1])
+    except ValueError:
+        count = 0
+    if unit is None or count <= 0:
+        raise ValueError(f"Некорректный период '{spec}' (примеры: 30m, 12h, 1d, 1w)!")
+    seconds = count * unit
+    if seconds < MIN_INTERVAL_SECONDS:
+        raise ValueError('Период регулярной заявки не может быть меньше минуты!')
+    return seconds
+
+
+def format_interval(seconds: int) -> str:
+    """
+    Записать период в виде '1d', '12h', '30m', '1w' (наибольшей единицей,
+    в которой он выражается целым числом).
+
+    :param seconds: Период в секундах
+    :type seconds: int
+    :return: Период
+    :rtype: str
+    """
+
+    for unit, size in sorted(INTERVAL_UNITS.items(), key=lambda item: -item[1]):
+        if seconds % size == 0:
+            return f'{seconds // size}{unit}'
+    return f'{seconds}s'
+
+
+class RecurringScheduler:
+    """
+    Регулярные заявки (покупка/продажа валюты на фиксированную сумму USD
+    с заданным периодом).
+
+    Заявки лежат в куче по времени следующего запуска: очередной проход
+    извлекает только наступившие заявки, поэтому его стоимость зависит
+    от их числа, а не от числа всех подписок. Наступившие заявки
+    оцениваются по одному снимку курсов, исполняются по правилам buy/sell
+    одним пакетом (по одной записи portfolios.json на шард) и
+    переназначаются на следующий период. Если проходов не было несколько
+    периодов, заявка исполняется один раз, а пропущенные запуски
+    записываются в журнал. Переназначенные и удалённые заявки удаляются
+    из кучи лениво.
+    """
+
+    def __init__(self, data_path: str) -> None:
+        """
+        Создать планировщик.
+
+        :param data_path: Путь к данным
+        :type data_path: str
+        """
+
+        self.data_path = data_path
+        self.orders_path = os.path.join(data_path, 'recurring.json')
+        self.log_path = os.path.join(data_path, 'recurring.log')
+
+        self._orders: dict[int, dict[str, Any]] = dict()
+        self._heap: list[tuple[float, int]] = []
+        self._next_id = 1
+        self._version: Optional[tuple[int, int, int]] = None
+        self._loaded = False
+
+
+    def _file_version(self) -> Optional[tuple[int, int, int]]:
+        """
+        Версия recurring.json: (inode, mtime_ns, размер). Файл заменяется
+        атомарно, поэтому каждая запись даёт новый inode.
+
+        :return: Версия (или None, если файла нет)
+        :rtype: Optional[tuple[int, int, int]]
+        """
+
+        try:
+            stat = os.stat(self.orders_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+    def _ensure_loaded(self) -> None:
+        """
+        Загрузить регулярные заявки, если файл изменился с прошлой загрузки.
+        """
+
+        version = self._file_version()
+        if self._loaded and version == self._version:
+            return None
+
+        data = {'next_id': 1, 'orders': []}
+        if version is not None:
+            with open(self.orders_path, 'r') as fp:
+                data = json.load(fp)
+
+        self._orders = {order['id']: order for order in data.get('orders', [])}
+        self._heap = [(order['next_run'], order['id'])
+                      for order in self._orders.values()]
+        heapq.heapify(self._heap)
+        self._next_id = data.get('next_id', 1)
+        self._version = version
+        self._loaded = True
+
+
+    def _save(self, events: Optional[list[dict[str, Any]]] = None) -> None:
+        """
+        Сохранить регулярные заявки и дописать события запусков в журнал.
+
+        :param events: Исполнения и пропуски
+        :type events: Optional[list[dict[str, Any]]]
+        """
+
+        os.makedirs(self.data_path, exist_ok=True)
+        if events:
+            with open(self.log_path, 'a') as fp:
+                for event in events:
+                    fp.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+        data = {'next_id': self._next_id,
+                'orders': list(self._orders.values())}
+        tmp_file = f"{self.orders_path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump(data, fp, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.orders_path)
+        self._version = self._file_version()
+
+
+    def add(self,
+            user_id: int,
+            username: str,
+            side: str,
+            currency: str,
+            usd_units: int,
+            interval: int,
+            start: Optional[float] = None) -> dict[str, Any]:
+        """
+        Создать регулярную заявку.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :param username: Имя пользователя
+        :type username: str
+        :param side: Направление (buy, sell)
+        :type side: str
+        :param currency: Код валюты
+        :type currency: str
+        :param usd_units: Сумма одного запуска в минимальных единицах USD
+        :type usd_units: int
+        :param interval: Период, секунды
+        :type interval: int
+        :param start: Время первого запуска (эпоха; по умолчанию - сейчас)
+        :type start: Optional[float]
+        :return: Регулярная заявка
+        :rtype: dict[str, Any]
+        """
+
+        if side not in ('buy', 'sell'):
+            raise ValueError(f"Неизвестное направление заявки '{side}'!")
+        if currency == TRADE_BASE:
+            raise ValueError('Операции проводятся за USD: укажите другую валюту!')
+        if usd_units <= 0:
+            raise ValueError('Сумма регулярной заявки должна быть положительной!')
+
+        with data_lock(self.data_path):
+            self._ensure_loaded()
+            # До записи файла состояние в памяти считается незагруженным
+            self._loaded = False
+            order = {'id': self._next_id,
+                     'user_id': user_id,
+                     'username': username,
+                     'side': side,
+                     'currency': currency,
+                     'usd_units': usd_units,
+                     'interval': interval,
+                     'next_run': time.time() if start is None else start,
+                     'runs': 0,
+                     'skips': 0,
+                     'created_at': datetime.now().isoformat()}
+            self._next_id += 1
+            self._orders[order['id']] = order
+            heapq.heappush(self._heap, (order['next_run'], order['id']))
+            self._save()
+            self._loaded = True
+        return order
+
+
+    def remove(self, username: str, order_id: int) -> Optional[dict[str, Any]]:
+        """
+        Удалить регулярную заявку пользователя.
+
+        :param username: Имя пользователя
+        :type username: str
+        :param order_id: ID заявки
+        :type order_id: int
+        :return: Удалённая заявка (или None, если не найдена)
+        :rtype: dict | None
+        """
+
+        with data_lock(self.data_path):
+            self._ensure_loaded()
+            order = self._orders.get(order_id)
+            if order is None or order['username'] != username:
+                return None
+            self._loaded = False
+            del self._orders[order_id]
+            self._save()
+            self._loaded = True
+        return order
+
+
+    def list_orders(self, username: str) -> list[dict[str, Any]]:
+        """
+        Получить регулярные заявки пользователя.
+
+        :param username: Имя пользователя
+        :type username: str
+        :return: Список заявок
+        :rtype: list[dict[str, Any]]
+        """
+
+        self._ensure_loaded()
+        return [order for order in self._orders.values()
+                if order['username'] == username]
+
+
+    def _pop_due(self, now: float) -> list[dict[str, Any]]:
+        """
+        Извлечь из кучи наступившие заявки.
+
+        :param now: Текущее время (эпоха)
+        :type now: float
+        :return: Наступившие заявки
+        :rtype: list[dict[str, Any]]
+        """
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_run, order_id = heapq.heappop(self._heap)
+            order = self._orders.get(order_id)
+            # Запись устарела: заявка удалена или уже переназначена
+            if order is not None and order['next_run'] == next_run:
+                due.append(order)
+        return due
+
+
+    def run_due(self, now: Optional[float] = None) -> list[dict[str, Any]]:
+        """
+        Исполнить наступившие регулярные заявки одним пакетом.
+
+        :param now: Текущее время (эпоха; по умолчанию - сейчас)
+        :type now: Optional[float]
+        :return: События запусков (status: filled или skipped, reason)
+        :rtype: list[dict[str, Any]]
+        """
+
+        now = time.time() if now is None else now
+        self._ensure_loaded()
+        if not self._heap or self._heap[0][0] > now:
+            return []
+
+        with ExitStack() as stack:
+            stack.enter_context(data_lock(self.data_path))
+            self._ensure_loaded()
+            due = self._pop_due(now)
+            if not due:
+                return []
+
+            # Куча и заявки уже изменены: пока файл не записан, состояние в
+            # памяти считается незагруженным (при ошибке исполнения или
+            # записи оно перечитается, и заявки не потеряются)
+            self._loaded = False
+            # Один снимок курсов на весь пакет, заявки сгруппированы по валюте
+            rates = RatesStorage().load_rates()
+            pairs = rates.get('pairs', {})
+            by_currency: dict[str, list[dict[str, Any]]] = dict()
+            for order in due:
+                by_currency.setdefault(order['currency'], []).append(order)
+
+            shard_paths = {order['username']: user_data_path(order['username'])
+                           for order in due}
+            repositories = dict()
+            for shard_path in sorted(set(shard_paths.values())):
+                stack.enter_context(data_lock(shard_path))
+                repositories[shard_path] = Repository(shard_path)
+
+            stale = self._is_stale(rates.get('last_refresh'), now)
+            events = []
+            for currency, orders in sorted(by_currency.items()):
+                rate = pairs.get(f'{currency}_{TRADE_BASE}', {}).get('rate')
+                for order in sorted(orders, key=lambda order: order['id']):
+                    event = {'id': order['id'],
+                             'username': order['username'],
+                             'side': order['side'],
+                             'currency': currency,
+                             'usd_units': order['usd_units'],
+                             'scheduled_at': order['next_run'],
+                             'at': datetime.now().isoformat()}
+                    missed = int((now - order['next_run']) // order['interval'])
+                    if missed:
+                        event['missed'] = missed
+
+                    if stale:
+                        reason = 'курсы валют устарели'
+                    elif not rate:
+                        reason = f'курс {currency}→{TRADE_BASE} недоступен'
+                    else:
+                        repository = repositories[shard_paths[order['username']]]
+                        reason = self._execute(repository, order, rate, event)
+
+                    if reason is None:
+                        event['status'] = 'filled'
+                        order['runs'] += 1
+                        order['last_run'] = event['at']
+                    else:
+                        event.update(status='skipped', reason=reason)
+                        order['skips'] += 1
+                    order['skips'] += missed
+                    order['next_run'] += (missed + 1) * order['interval']
+                    heapq.heappush(self._heap, (order['next_run'], order['id']))
+                    events.append(event)
+
+            for repository in repositories.values():
+                repository.commit()
+            self._save(events)
+            self._loaded = True
+        self._log(events)
+        return events
+
+
+    @staticmethod
+    def _is_stale(last_refresh: Optional[str], now: float) -> bool:
+        """
+        Проверить, устарели ли курсы к моменту запуска.
+
+        :param last_refresh: Время обновления кэша курсов
+        :type last_refresh: Optional[str]
+        :param now: Текущее время (эпоха)
+        :type now: float
+        :return: Флаг устаревания
+        :rtype: bool
+        """
+
+        refreshed = datetime.fromisoformat((last_refresh or '2000-01-01T00:00:00Z')
+                                           .replace('Z', '')).timestamp()
+        return refreshed < now - config.get('rates_ttl_seconds', 300)
+
+
+    @staticmethod
+    def _execute(repository: Repository,
+                 order: dict[str, Any],
+                 rate: float,
+                 event: dict[str, Any]) -> Optional[str]:
+        """
+        Исполнить один запуск заявки по правилам buy/sell.
+
+        :param repository: Репозиторий шарда владельца
+        :type repository: Repository
+        :param order: Регулярная заявка
+        :type order: dict[str, Any]
+        :param rate: Курс валюты к USD
+        :type rate: float
+        :param event: Событие запуска (дополняется количеством и курсом)
+        :type event: dict[str, Any]
+        :return: Причина пропуска (или None, если исполнена)
+        :rtype: Optional[str]
+        """
+
+        currency = order['currency']
+        amount_units = convert_units(order['usd_units'], TRADE_BASE, currency,
+                                     1 / rate, ROUND_CREDIT)
+        if amount_units == 0:
+            return 'сумма меньше минимальной единицы валюты'
+
+        portfolio = repository.get_portfolio(order['user_id'])
+        execute = execute_buy if order['side'] == 'buy' else execute_sell
+        try:
+            execute(portfolio, currency, amount_units, rate)
+        except (InsufficientFundsError, ValueError) as e:
+            return str(e)
+        event.update(amount_units=amount_units, rate=rate)
+        return None
+
+
+    @staticmethod
+    def _log(events: list[dict[str, Any]]) -> None:
+        """
+        Записать запуски регулярных заявок в журнал действий.
+
+        :param events: События запусков
+        :type events: list[dict[str, Any]]
+        """
+
+        logger = logging.getLogger('base')
+        for event in events:
+            info = f"DCA id={event['id']} user='{event['username']}' "\
+                   f"side='{event['side']}' currency='{event['currency']}' "\
+                   f"usd={from_units(event['usd_units'], TRADE_BASE):.2f} "\
+                   f"missed={event.get('missed', 0)} "
+            if event['status'] == 'filled':
+                logger.info(info + f"rate={event['rate']:.2f} result=OK")
+            else:
+                logger.warning(info + f"msg='{event['reason']}' result=SKIP")
+
+
+_schedulers: dict[str, RecurringScheduler] = dict()
+
+
+def get_recurring_scheduler() -> RecurringScheduler:
+    """
+    Получить планировщик регулярных заявок для текущего каталога данных.
+
+    :return: Планировщик
+    :rtype: RecurringScheduler
+    """
+
+    data_path = config.get('data_path', 'data/')
+    scheduler = _schedulers.get(data_path)
+    if scheduler is None:
+        scheduler = _schedulers[data_path] = RecurringScheduler(data_path)
+    return scheduler
+
+
+def _on_rates_update(changes: dict[str, tuple[Optional[float], float]]) -> None:
+    """
+    Обработчик обновления курсов: свежие курсы - повод проверить расписание.
+
+    :param changes: Изменения курсов
+    :type changes: dict[str, tuple[Optional[float], float]]
+    """
+
+    get_recurring_scheduler().run_due()
+
+
+def install() -> None:
+    """
+    Подключить запуск регулярных заявок к обновлениям кэша курсов.
+    """
+
+    add_rates_listener(_on_rates_update)
@@ -0,0 +1,230 @@
+from datetime import datetime
+from typing import Optional
+
+from valutatrade_hub.core.models import Portfolio, User, Wallet
+from valutatrade_hub.core.money import wallet_record, wallet_units
+from valutatrade_hub.core.portfolio_store import PortfolioStore
+from valutatrade_hub.core.utils import (
+    append_portfolios,
+    append_users,
+    load_portfolios,
+    load_users,
+    records_version,
+)
+from valutatrade_hub.core.valuation import record_commit
+
+
+class Repository:
+    """
+    Доступ к пользователям и портфелям одного запроса (единица работы).
+
+    Файлы читаются лениво, при первом обращении к пользователю или
+    портфелю, а объекты User/Portfolio/Wallet создаются только для тех
+    пользователей, к которым обращается запрос (колоночное хранилище
+    всех портфелей шарда строится, только если его запросили явно).
+    commit() дописывает в журналы users.json/portfolios.json только
+    изменённые записи - пользователей и портфели с изменёнными
+    кошельками (изменения передаются и кэшу оценки core.valuation).
+    Для чтения-изменения-записи репозиторий используется под
+    core.utils.data_lock.
+    """
+
+    __slots__ = ('data_path', '_records', '_index', '_users', '_wallets',
+                 '_store', '_portfolios')
+
+    def __init__(self, data_path: str) -> None:
+        """
+        Создать репозиторий.
+
+        :param data_path: Путь к данным
+        :type data_path: str
+        """
+
+        self.data_path = data_path
+        self._records: Optional[list[dict]] = None
+        self._index: dict[str, int] = dict()
+        self._users: dict[str, User] = dict()
+        # ID пользователя → записи кошельков из portfolios.json
+        self._wallets: Optional[dict[int, dict[str, dict]]] = None
+        self._store: Optional[PortfolioStore] = None
+        self._portfolios: dict[int, Portfolio] = dict()
+
+
+    def _user_records(self) -> list[dict]:
+        """
+        Записи users.json (читаются один раз за запрос).
+
+        :return: Записи пользователей
+        :rtype: list[dict]
+        """
+
+        if self._records is None:
+            self._records = load_users(self.data_path)
+            self._index = {record['username']: i
+                           for i, record in enumerate(self._records)}
+        return self._records
+
+
+    def get_user(self, username: str) -> Optional[User]:
+        """
+        Найти пользователя по имени.
+
+        :param username: Имя пользователя
+        :type username: str
+        :return: Пользователь (или None, если не найден)
+        :rtype: User | None
+        """
+
+        user = self._users.get(username)
+        if user is not None:
+            return user
+
+        records = self._user_records()
+        position = self._index.get(username)
+        if position is None:
+            return None
+        user = self._users[username] = User.from_record(records[position])
+        return user
+
+
+    def find_user(self, username: str) -> User:
+        """
+        Найти пользователя по имени (ошибка, если его нет).
+
+        :param username: Имя пользователя
+        :type username: str
+        :return: Пользователь
+        :rtype: User
+        """
+
+        user = self.get_user(username)
+        if user is None:
+            raise ValueError(f"Пользователь '{username}' не найден!")
+        return user
+
+
+    def add_user(self,
+                 username: str,
+                 password: str,
+                 user_id: Optional[int] = None) -> User:
+        """
+        Создать пользователя.
+
+        :param username: Имя пользователя
+        :type username: str
+        :param password: Пароль
+        :type password: str
+        :param user_id: ID (по умолчанию - следующий свободный в каталоге)
+        :type user_id: Optional[int]
+        :return: Новый пользователь
+        :rtype: User
+        """
+
+        if user_id is None:
+            records = self._user_records()
+            user_id = max([record['user_id'] for record in records],
+                          default=0) + 1
+            user_id = max([user_id] + [user.user_id + 1
+                                       for user in self._users.values()])
+
+        user = User(user_id, username, '', '', datetime.now())
+        user.change_password(password)
+        self._users[username] = user
+        return user
+
+
+    def _portfolio_records(self) -> dict[int, dict[str, dict]]:
+        """
+        Записи кошельков из portfolios.json (читаются один раз за запрос).
+
+        :return: {ID пользователя: {валюта: запись кошелька}}
+        :rtype: dict[int, dict[str, dict]]
+        """
+
+        if self._wallets is None:
+            self._wallets = {record['user_id']: record['wallets']
+                             for record in load_portfolios(self.data_path)}
+        return self._wallets
+
+
+    @property
+    def store(self) -> PortfolioStore:
+        """
+        Геттер.
+
+        :return: Колоночное хранилище портфелей (строится при первом обращении)
+        :rtype: PortfolioStore
+        """
+
+        if self._store is None:
+            self._store = PortfolioStore.from_records(
+                [{'user_id': user_id, 'wallets': wallets}
+                 for user_id, wallets in self._portfolio_records().items()])
+        return self._store
+
+
+    def get_portfolio(self, user_id: int) -> Portfolio:
+        """
+        Получить портфель пользователя (кошельки создаются только для него).
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :return: Портфель
+        :rtype: Portfolio
+        """
+
+        portfolio = self._portfolios.get(user_id)
+        if portfolio is not None:
+            return portfolio
+
+        wallets = dict()
+        for code, record in self._portfolio_records().get(user_id, {}).items():
+            wallet = wallets[code] = Wallet(code, units=wallet_units(record))
+            wallet.mark_clean()
+        portfolio = self._portfolios[user_id] = Portfolio(user_id, wallets)
+        return portfolio
+
+
+    def commit(self) -> None:
+        """
+        Записать изменённых пользователей и кошельки.
+        """
+
+        changed = [user for user in self._users.values() if user.dirty]
+        if changed:
+            append_users([user.to_record() for user in changed], self.data_path)
+            # Перечитываются при следующем обращении (вместе с журналом)
+            self._records = None
+            for user in changed:
+                user.mark_clean()
+
+        dirty = {user_id: portfolio
+                 for user_id, portfolio in self._portfolios.items()
+                 if portfolio.dirty_wallets}
+        if not dirty:
+            return None
+
+        before = records_version(self.data_path, 'portfolios.json')
+        records = [{'user_id': user_id,
+                    'wallets': {code: wallet_record(code, wallet.units)
+                                for code, wallet in portfolio.wallets.items()}}
+                   for user_id, portfolio in dirty.items()]
+        append_portfolios(records, self.data_path)
+        wallets = self._portfolio_records()
+        for record in records:
+            wallets[record['user_id']] = record['wallets']
+        if self._store is not None:
+            for user_id, portfolio in dirty.items():
+                if user_id not in self._store:
+                    self._store.add_user(user_id, dict())
+                for wallet in portfolio.dirty_wallets:
+                    self._store.set_units(user_id, wallet.currency_code,
+                                          wallet.units)
+        # Кэш оценки обновляет только вклады изменённых кошельков
+        record_commit(self.data_path, before,
+                      {user_id: {wallet.currency_code: wallet.units
+                                 for wallet in portfolio.dirty_wallets}
+                       for user_id, portfolio in dirty.items()})
+        for portfolio in dirty.values():
+            for wallet in portfolio.dirty_wallets:
+                wallet.mark_clean()
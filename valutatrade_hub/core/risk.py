@@ -0,0 +1,245 @@
+import math
+from statistics import NormalDist
+from typing import Any, Optional
+
+from valutatrade_hub.core.currencies import get_currency
+from valutatrade_hub.core.portfolio_store import PortfolioStore
+from valutatrade_hub.parser_service.snapshot import iso_to_epoch
+
+# Уровни доверия для VaR/ES
+RISK_CONFIDENCE = (0.95, 0.99)
+
+# Сколько строк (пользователей) обрабатывается за один матричный проход:
+# матрица сценарных P&L имеет размер строки × число сценариев
+RISK_CHUNK_ROWS = 4096
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+def _numpy():
+    """
+    Импортировать NumPy (только для команд риск-аналитики, чтобы не
+    увеличивать время старта CLI).
+
+    :return: Модуль numpy
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError('Для риск-аналитики нужен пакет numpy: '
+                         'выполните poetry install.')
+    return numpy
+
+
+class RiskEngine:
+    """
+    Риск-аналитика портфелей по истории курсов к USD.
+
+    История каждой валюты приводится к общей сетке с шагом sample_seconds
+    (последний известный курс на момент узла сетки), по ней считаются
+    логарифмические доходности, волатильность (полная и скользящая),
+    корреляции и ковариации. Риск всех портфелей считается сразу:
+    матрица экспозиций (пользователи × валюты) умножается на матрицу
+    сценариев (исторический VaR/ES) и на ковариационную матрицу
+    (параметрический VaR/ES). Горизонт риска равен шагу сетки.
+    """
+
+    def __init__(self,
+                 history: list[dict[str, Any]],
+                 rates: dict[str, Any],
+                 codes: list[str],
+                 sample_seconds: int = 3600,
+                 window: int = 24,
+                 base: str = 'USD') -> None:
+        """
+        Подготовить доходности и статистики.
+
+        :param history: Записи истории курсов (как в exchange_rates.json)
+        :type history: list[dict[str, Any]]
+        :param rates: Текущий кэш курсов (rates.json)
+        :type rates: dict[str, Any]
+        :param codes: Коды валют (колонки матрицы экспозиций)
+        :type codes: list[str]
+        :param sample_seconds: Шаг сетки доходностей, секунды
+        :type sample_seconds: int
+        :param window: Окно скользящей волатильности, шагов сетки
+        :type window: int
+        :param base: Валюта оценки
+        :type base: str
+        """
+
+        np = _numpy()
+        self.codes = list(codes)
+        self.base = base
+        self.sample_seconds = sample_seconds
+        self.window = window
+
+        series: dict[str, list[tuple[float, float]]] = {code: [] for code in codes}
+        for record in history:
+            code = record.get('from_currency')
+            if code in series and record.get('to_currency') == base:
+                stamp = iso_to_epoch(record.get('timestamp'))
+                if stamp == stamp and record.get('rate'):
+                    series[code].append((stamp, float(record['rate'])))
+
+        pairs = rates.get('pairs', {})
+        self.prices = np.ones(len(codes))
+        for k, code in enumerate(codes):
+            if code == base:
+                continue
+            direct = pairs.get(f'{code}_{base}', {}).get('rate')
+            inverse = pairs.get(f'{base}_{code}', {}).get('rate')
+            if direct:
+                self.prices[k] = direct
+            elif inverse:
+                self.prices[k] = 1 / inverse
+            elif series[code]:
+                self.prices[k] = max(series[code])[1]
+            else:
+                raise ValueError(f"Курс {code}_{base} не найден в кеше.")
+
+        starts = [min(points)[0] for points in series.values() if points]
+        ends = [max(points)[0] for points in series.values() if points]
+        if not starts:
+            raise ValueError('История курсов пуста: выполните update-rates '
+                             'или backfill.')
+        grid = np.arange(max(starts), max(ends) + sample_seconds, sample_seconds)
+        if len(grid) < 3:
+            raise ValueError('Недостаточно истории курсов для оценки риска: '
+                             'загрузите её командой backfill.')
+
+        # Цены на узлах сетки (последняя известная точка), log-доходности
+        levels = np.ones((len(grid), len(codes)))
+        for k, code in enumerate(codes):
+            if not series[code]:
+                continue
+            points = np.array(sorted(series[code]))
+            index = np.searchsorted(points[:, 0], grid, side='right') - 1
+            levels[:, k] = points[np.maximum(index, 0), 1]
+        self.times = grid
+        self.returns = np.diff(np.log(levels), axis=0)
+
+        n_samples = len(self.returns)
+        annualize = math.sqrt(SECONDS_PER_YEAR / sample_seconds)
+        self.mean = self.returns.mean(axis=0)
+        self.covariance = np.atleast_2d(np.cov(self.returns, rowvar=False))
+        self.volatility = np.sqrt(np.diag(self.covariance)) * annualize
+
+        std = np.sqrt(np.diag(self.covariance))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = self.covariance / np.outer(std, std)
+        correlation[~np.isfinite(correlation)] = 0.0
+        np.fill_diagonal(correlation, 1.0)
+        self.correlation = correlation
+
+        # Скользящая волатильность через накопленные суммы r и r^2: O(T·K)
+        width = min(window, n_samples)
+        zero = np.zeros((1, len(codes)))
+        sums = np.vstack([zero, np.cumsum(self.returns, axis=0)])
+        squares = np.vstack([zero, np.cumsum(self.returns ** 2, axis=0)])
+        window_sum = sums[width:] - sums[:-width]
+        window_squares = squares[width:] - squares[:-width]
+        variance = (window_squares - window_sum ** 2 / width) / max(width - 1, 1)
+        self.rolling_volatility = np.sqrt(np.maximum(variance, 0.0)) * annualize
+
+
+    def exposures(self, store: PortfolioStore) -> Any:
+        """
+        Построить матрицу экспозиций (пользователи × валюты) в валюте оценки.
+
+        :param store: Хранилище портфелей
+        :type store: PortfolioStore
+        :return: Матрица стоимостей позиций (строки - в порядке store.user_ids)
+        :rtype: numpy.ndarray
+        """
+
+        np = _numpy()
+        matrix = np.zeros((len(store), len(self.codes)))
+        for k, code in enumerate(self.codes):
+            column = store.column(code)
+            if column is None or not len(column):
+                continue
+            # Колонка array('q') читается без копирования
+            units = np.frombuffer(column, dtype=np.int64)
+            scale = 10 ** get_currency(code).scale
+            matrix[:, k] = units * (self.prices[k] / scale)
+        return matrix
+
+
+    def portfolio_risk(self, exposures: Any) -> dict[str, Any]:
+        """
+        Посчитать стоимость, VaR и ES для всех портфелей сразу.
+
+        :param exposures: Матрица экспозиций (пользователи × валюты)
+        :type exposures: numpy.ndarray
+        :return: Массивы по строкам: value и для каждого уровня доверия
+                 hist_var/hist_es/param_var/param_es (ключ вида 'hist_var_95')
+        :rtype: dict[str, numpy.ndarray]
+        """
+
+        np = _numpy()
+        n_rows = len(exposures)
+        n_samples = len(self.returns)
+        scenarios = np.expm1(self.returns).T  # валюты × сценарии
+        result: dict[str, Any] = {'value': exposures.sum(axis=1)}
+
+        # Параметрический риск: sigma_u^2 = e_u Σ e_u^T для всех строк сразу
+        sigma = np.sqrt(np.maximum(
+            ((exposures @ self.covariance) * exposures).sum(axis=1), 0.0))
+        drift = exposures @ self.mean
+
+        for level in RISK_CONFIDENCE:
+            suffix = f'{round(level * 100)}'
+            z = NormalDist().inv_cdf(level)
+            density = math.exp(-z * z / 2) / math.sqrt(2 * math.pi)
+            result[f'param_var_{suffix}'] = np.maximum(z * sigma - drift, 0.0)
+            result[f'param_es_{suffix}'] = np.maximum(
+                sigma * density / (1 - level) - drift, 0.0)
+            result[f'hist_var_{suffix}'] = np.zeros(n_rows)
+            result[f'hist_es_{suffix}'] = np.zeros(n_rows)
+
+        # Исторический риск: P&L каждого портфеля в каждом сценарии,
+        # по блокам строк, чтобы ограничить память
+        for start in range(0, n_rows, RISK_CHUNK_ROWS):
+            block = exposures[start:start + RISK_CHUNK_ROWS]
+            worst = block @ scenarios
+            for level in sorted(RISK_CONFIDENCE):
+                suffix = f'{round(level * 100)}'
+                tail = max(1, math.ceil((1 - level) * n_samples))
+                # Частичная сортировка: tail худших сценариев слева, на позиции
+                # tail - 1 - квантиль. Хвост следующего (более высокого) уровня
+                # ищется уже только среди этих сценариев.
+                worst = np.partition(worst, tail - 1, axis=1)[:, :tail]
+                result[f'hist_var_{suffix}'][start:start + len(block)] = \
+                    np.maximum(-worst[:, tail - 1], 0.0)
+                result[f'hist_es_{suffix}'][start:start + len(block)] = \
+                    np.maximum(-worst.mean(axis=1), 0.0)
+        return result
+
+
+def build_engine(codes: list[str],
+                 sample_seconds: Optional[int] = None,
+                 window: Optional[int] = None) -> RiskEngine:
+    """
+    Создать риск-движок по текущей истории и кэшу курсов.
+
+    :param codes: Коды валют (колонки матрицы экспозиций)
+    :type codes: list[str]
+    :param sample_seconds: Шаг сетки, секунды (по умолчанию - из настроек)
+    :type sample_seconds: Optional[int]
+    :param window: Окно скользящей волатильности (по умолчанию - из настроек)
+    :type window: Optional[int]
+    :return: Риск-движок
+    :rtype: RiskEngine
+    """
+
+    from valutatrade_hub.infra.settings import config
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    storage = RatesStorage()
+    return RiskEngine(storage.load_exchange_rates(),
+                      storage.load_rates(),
+                      codes,
+                      sample_seconds or config.get('risk_sample_seconds', 3600),
+                      window or config.get('risk_window', 24))
@@ -0,0 +1,469 @@
+import hashlib
+import json
+import os
+from bisect import bisect_right
+from contextlib import ExitStack
+from typing import Any, Optional
+
+from valutatrade_hub.core.utils import (
+    data_lock,
+    load_portfolios,
+    load_users,
+    records_version,
+    save_portfolios,
+    save_users,
+)
+from valutatrade_hub.infra.settings import config
+
+# Карта шардов лежит в корне каталога данных. Без неё данные - один
+# шард '.'.
+SHARD_MAP_FILE = 'shards.json'
+
+# Шард 0 называется '.' (так его точки на кольце не зависят от версии).
+# Пока шард один, его файлы лежат в корне данных; перебалансировка на
+# несколько шардов переносит их в свой каталог: блокировка корня - общая
+# для движков заявок и оповещений и не должна останавливать сделки
+# пользователей шарда
+ROOT_SHARD = '.'
+ROOT_SHARD_DIR = 'shard-0'
+
+# Файлы пользователей шарда (переносятся из корня в каталог шарда 0)
+SHARD_FILES = ('users.json', 'users.journal', 'portfolios.json',
+               'portfolios.journal')
+
+# ID пользователя = порядковый номер в шарде * SHARD_ID_STRIDE + номер
+# шарда: шарды выдают ID независимо, без общего счётчика
+SHARD_ID_STRIDE = 1024
+
+# Счётчик порядковых номеров ID в каталоге шарда
+SHARD_SEQ_FILE = 'user_seq.json'
+
+# Точек на кольце на один шард: сглаживает распределение пользователей
+DEFAULT_VNODES = 64
+
+
+def _hash(key: str) -> int:
+    """
+    Позиция ключа на кольце.
+
+    :param key: Ключ
+    :type key: str
+    :return: 64-битный хэш
+    :rtype: int
+    """
+
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'),
+                                          digest_size=8).digest(), 'big')
+
+
+class _Ring:
+    """
+    Кольцо согласованного хэширования по списку шардов.
+    """
+
+    __slots__ = ('points', 'owners')
+
+    def __init__(self, shards: list[str], vnodes: int) -> None:
+        """
+        Построить кольцо.
+
+        :param shards: Имена шардов (номер шарда - позиция в списке)
+        :type shards: list[str]
+        :param vnodes: Точек на шард
+        :type vnodes: int
+        """
+
+        ring = sorted((_hash(f'{name}#{i}'), index)
+                      for index, name in enumerate(shards)
+                      for i in range(vnodes))
+        self.points = [point for point, _ in ring]
+        self.owners = [index for _, index in ring]
+
+
+    def lookup(self, key: str) -> int:
+        """
+        Номер шарда ключа: первая точка кольца по часовой стрелке.
+
+        :param key: Ключ (имя пользователя)
+        :type key: str
+        :return: Номер шарда
+        :rtype: int
+        """
+
+        i = bisect_right(self.points, _hash(key))
+        return self.owners[i % len(self.owners)]
+
+
+class ShardMap:
+    """
+    Карта шардов пользовательских данных.
+
+    Пользователь попадает в шард по хэшу имени на кольце согласованного
+    хэширования: вход и регистрация сразу открывают нужный каталог, не
+    просматривая остальные, а при добавлении шарда переезжает только
+    около 1/N пользователей. Во время перебалансировки карта хранит и
+    прежний список шардов (previous): пользователь, ещё не перенесённый
+    на новое место, ищется в своём прежнем шарде. home - каталог шарда 0
+    относительно корня ('.', пока его не перенесла перебалансировка).
+    """
+
+    def __init__(self,
+                 root: str,
+                 shards: list[str],
+                 previous: Optional[list[str]] = None,
+                 vnodes: int = DEFAULT_VNODES,
+                 home: str = ROOT_SHARD) -> None:
+        """
+        Создать карту.
+
+        :param root: Корневой каталог данных
+        :type root: str
+        :param shards: Имена каталогов шардов относительно корня
+        :type shards: list[str]
+        :param previous: Шарды до начала перебалансировки
+        :type previous: Optional[list[str]]
+        :param vnodes: Точек на шард
+        :type vnodes: int
+        :param home: Каталог шарда 0 относительно корня
+        :type home: str
+        """
+
+        self.root = root
+        self.home = home
+        self.shards = list(shards)
+        self.previous = list(previous) if previous else None
+        self.vnodes = vnodes
+        self._ring = _Ring(self.shards, vnodes)
+        self._previous_ring = _Ring(self.previous, vnodes) if self.previous else None
+
+
+    @classmethod
+    def load(cls, root: str) -> 'ShardMap':
+        """
+        Загрузить карту (один шард, если карты нет).
+
+        :param root: Корневой каталог данных
+        :type root: str
+        :return: Карта шардов
+        :rtype: ShardMap
+        """
+
+        try:
+            with open(os.path.join(root, SHARD_MAP_FILE), 'r') as fp:
+                data = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(root, [ROOT_SHARD])
+        home = data.get('home')
+        if home is None:
+            # Карта без home: шард 0 в корне, если его ещё не перенесли
+            moved = os.path.exists(os.path.join(root, ROOT_SHARD_DIR, 'users.json')) \
+                and not os.path.exists(os.path.join(root, 'users.json'))
+            home = ROOT_SHARD_DIR if moved else ROOT_SHARD
+        return cls(root, data['shards'], data.get('previous'),
+                   data.get('vnodes', DEFAULT_VNODES), home)
+
+
+    def save(self) -> None:
+        """
+        Атомарно сохранить карту.
+        """
+
+        path = os.path.join(self.root, SHARD_MAP_FILE)
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump({'shards': self.shards,
+                       'previous': self.previous,
+                       'vnodes': self.vnodes,
+                       'home': self.home}, fp, indent=4)
+        os.replace(tmp_file, path)
+
+
+    def path(self, index: int) -> str:
+        """
+        Каталог шарда.
+
+        :param index: Номер шарда
+        :type index: int
+        :return: Путь к каталогу
+        :rtype: str
+        """
+
+        return _shard_dir(self.root, self.shards[index], self.home)
+
+
+    def paths(self) -> list[str]:
+        """
+        Каталоги всех шардов.
+
+        :return: Пути к каталогам
+        :rtype: list[str]
+        """
+
+        return [self.path(index) for index in range(len(self.shards))]
+
+
+    def locate(self, username: str) -> tuple[str, int]:
+        """
+        Найти шард пользователя.
+
+        :param username: Имя пользователя
+        :type username: str
+        :return: Каталог и номер шарда
+        :rtype: tuple[str, int]
+        """
+
+        index = self._ring.lookup(username)
+        if self._previous_ring is not None:
+            # Перебалансировка идёт: пользователь мог ещё не переехать
+            old = self.shards.index(self.previous[self._previous_ring
+                                                  .lookup(username)])
+            if old != index and username in _usernames(self.path(old)):
+                index = old
+        return self.path(index), index
+
+
+def _shard_dir(root: str, name: str, home: str) -> str:
+    """
+    Каталог шарда по имени.
+
+    :param root: Корневой каталог данных
+    :type root: str
+    :param name: Имя шарда
+    :type name: str
+    :param home: Каталог шарда 0 относительно корня
+    :type home: str
+    :return: Путь к каталогу
+    :rtype: str
+    """
+
+    return os.path.normpath(os.path.join(
+        root, home if name == ROOT_SHARD else name))
+
+
+# Имена пользователей шарда (каталог → (версия users.json, имена)): во
+# время перебалансировки каждый вход ищет пользователя в прежнем шарде
+_names: dict[str, tuple[Optional[tuple[int, ...]], frozenset[str]]] = dict()
+
+
+def _usernames(data_path: str) -> frozenset[str]:
+    """
+    Имена пользователей шарда (users.json разбирается заново, только
+    если он изменился).
+
+    :param data_path: Путь к данным шарда
+    :type data_path: str
+    :return: Имена
+    :rtype: frozenset[str]
+    """
+
+    version = records_version(data_path, 'users.json')
+    cached = _names.get(data_path)
+    if cached is None or cached[0] != version:
+        cached = _names[data_path] = (version, frozenset(
+            user['username'] for user in load_users(data_path)))
+    return cached[1]
+
+
+def _migrate_root_shard(root: str) -> None:
+    """
+    Перенести файлы шарда 0 из корня данных в его каталог (вызывается
+    перебалансировкой под блокировкой корня). Записи объединяются: если в
+    каталоге шарда уже есть пользователь с тем же ID, остаётся его запись.
+
+    :param root: Корневой каталог данных
+    :type root: str
+    """
+
+    target = _shard_dir(root, ROOT_SHARD, ROOT_SHARD_DIR)
+    os.makedirs(target, exist_ok=True)
+    with data_lock(root), data_lock(target):
+        for load, save in ((load_users, save_users),
+                           (load_portfolios, save_portfolios)):
+            records = load(target)
+            known = {record['user_id'] for record in records}
+            moving = [record for record in load(root)
+                      if record['user_id'] not in known]
+            if moving:
+                save(records + moving, target)
+        seq = os.path.join(root, SHARD_SEQ_FILE)
+        if os.path.exists(seq) and \
+           not os.path.exists(os.path.join(target, SHARD_SEQ_FILE)):
+            os.replace(seq, os.path.join(target, SHARD_SEQ_FILE))
+        # Файлы корня удаляются только после записи в каталог шарда
+        for name in SHARD_FILES + (SHARD_SEQ_FILE,):
+            try:
+                os.remove(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+
+
+# Карта в памяти (корень → ((mtime, размер) файла карты, карта))
+_maps: dict[str, tuple[Optional[tuple[int, int]], ShardMap]] = dict()
+
+
+def get_shard_map() -> ShardMap:
+    """
+    Карта шардов текущего каталога данных (перечитывается при изменении).
+
+    :return: Карта шардов
+    :rtype: ShardMap
+    """
+
+    root = config.get('data_path', 'data/')
+    try:
+        stat = os.stat(os.path.join(root, SHARD_MAP_FILE))
+        version = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        version = None
+    cached = _maps.get(root)
+    if cached is None or cached[0] != version:
+        cached = _maps[root] = (version, ShardMap.load(root))
+    return cached[1]
+
+
+def user_data_path(username: str) -> str:
+    """
+    Каталог данных, где хранится пользователь.
+
+    :param username: Имя пользователя
+    :type username: str
+    :return: Путь к данным шарда
+    :rtype: str
+    """
+
+    return get_shard_map().locate(username)[0]
+
+
+def allocate_user_id(data_path: str, index: int, count: int = 1) -> int:
+    """
+    Выдать новый ID пользователя в шарде (вызывать под data_lock шарда).
+    При count > 1 резервируется count ID подряд: first, first + SHARD_ID_STRIDE,
+    first + 2 * SHARD_ID_STRIDE, ...
+
+    :param data_path: Путь к данным шарда
+    :type data_path: str
+    :param index: Номер шарда
+    :type index: int
+    :param count: Число ID
+    :type count: int
+    :return: (Первый) ID, содержащий номер шарда
+    :rtype: int
+    """
+
+    path = os.path.join(data_path, SHARD_SEQ_FILE)
+    try:
+        with open(path, 'r') as fp:
+            seq = json.load(fp)['next']
+    except (FileNotFoundError, json.JSONDecodeError):
+        seq = max([user['user_id'] // SHARD_ID_STRIDE
+                   for user in load_users(data_path)], default=0) + 1
+
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w') as fp:
+        json.dump({'next': seq + count}, fp)
+    os.replace(tmp_file, path)
+    return seq * SHARD_ID_STRIDE + index
+
+
+def _move_users(source: str, target: str, usernames: set[str]) -> int:
+    """
+    Перенести пользователей и их портфели между шардами (под блокировками
+    обоих шардов, сначала запись в новый шард, затем удаление из старого).
+
+    :param source: Каталог исходного шарда
+    :type source: str
+    :param target: Каталог целевого шарда
+    :type target: str
+    :param usernames: Имена переносимых пользователей
+    :type usernames: set[str]
+    :return: Число перенесённых пользователей
+    :rtype: int
+    """
+
+    with ExitStack() as stack:
+        # Блокировки берутся в одном порядке, чтобы не было взаимоблокировок
+        for path in sorted((source, target)):
+            stack.enter_context(data_lock(path))
+
+        users = load_users(source)
+        moving = [user for user in users if user['username'] in usernames]
+        if not moving:
+            return 0
+        ids = {user['user_id'] for user in moving}
+        portfolios = load_portfolios(source)
+
+        save_users(load_users(target) + moving, target)
+        save_portfolios(load_portfolios(target) +
+                        [record for record in portfolios
+                         if record['user_id'] in ids], target)
+        save_users([user for user in users if user['user_id'] not in ids], source)
+        save_portfolios([record for record in portfolios
+                         if record['user_id'] not in ids], source)
+        return len(moving)
+
+
+def rebalance(count: int) -> dict[str, Any]:
+    """
+    Довести число шардов до count и перенести пользователей по новому кольцу.
+
+    Сервис продолжает работать: пока идёт перенос, карта содержит прежний
+    список шардов, и ещё не перенесённые пользователи находятся по нему.
+    Пользователи переносятся пакетами (пара шардов за раз).
+
+    :param count: Новое число шардов
+    :type count: int
+    :return: Число перенесённых пользователей и распределение по шардам
+    :rtype: dict[str, Any]
+    """
+
+    root = config.get('data_path', 'data/')
+    with data_lock(root):
+        shard_map = ShardMap.load(root)
+        if count < len(shard_map.shards):
+            raise ValueError('Число шардов можно только увеличить '
+                             f'(сейчас {len(shard_map.shards)})!')
+
+        home = shard_map.home
+        if count > 1 and home == ROOT_SHARD:
+            # Шард 0 переезжает из корня в свой каталог один раз, при
+            # переходе на несколько шардов
+            _migrate_root_shard(root)
+            home = ROOT_SHARD_DIR
+
+        # Шарды без счётчика (новые и шард 0) начинают нумерацию
+        # ID выше всех существующих, чтобы ID не повторились после переноса
+        start_seq = max([user['user_id'] // SHARD_ID_STRIDE
+                         for name in shard_map.shards
+                         for user in load_users(_shard_dir(root, name, home))],
+                        default=0) + 1
+        previous = shard_map.previous or shard_map.shards
+        shards = shard_map.shards + [f'shard-{index}' for index
+                                     in range(len(shard_map.shards), count)]
+        for name in shards:
+            path = _shard_dir(root, name, home)
+            os.makedirs(path, exist_ok=True)
+            if not os.path.exists(os.path.join(path, SHARD_SEQ_FILE)):
+                with open(os.path.join(path, SHARD_SEQ_FILE), 'w') as fp:
+                    json.dump({'next': start_seq}, fp)
+        shard_map = ShardMap(root, shards, previous, shard_map.vnodes, home)
+        shard_map.save()
+
+    moved = 0
+    ring = _Ring(shard_map.shards, shard_map.vnodes)
+    for source_index, source in enumerate(shard_map.paths()):
+        targets: dict[int, set[str]] = dict()
+        for user in load_users(source):
+            index = ring.lookup(user['username'])
+            if index != source_index:
+                targets.setdefault(index, set()).add(user['username'])
+        for index, usernames in targets.items():
+            moved += _move_users(source, shard_map.path(index), usernames)
+
+    with data_lock(root):
+        shard_map = ShardMap(root, shard_map.shards, None, shard_map.vnodes,
+                             shard_map.home)
+        shard_map.save()
+
+    return {'moved': moved,
+            'users': {name: len(load_users(path))
+                      for name, path in zip(shard_map.shards, shard_map.paths())}}
@@ -0,0 +1,115 @@
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.models import Portfolio
+from valutatrade_hub.core.money import (
+    ROUND_CREDIT,
+    ROUND_DEBIT,
+    convert_units,
+    from_units,
+    to_units,
+)
+
+# Валюта, за которую покупается и продаётся всё остальное
+TRADE_BASE = 'USD'
+
+
+def trade_units(currency: str, amount: float) -> int:
+    """
+    Проверить параметры сделки и перевести количество в минимальные единицы.
+
+    :param currency: Код валюты
+    :type currency: str
+    :param amount: Количество валюты
+    :type amount: float
+    :return: Количество в минимальных единицах
+    :rtype: int
+    """
+
+    if amount <= 0:
+        raise ValueError('Количество валюты должно быть положительным числом!')
+
+    if currency == TRADE_BASE:
+        raise ValueError('Операции проводятся за USD: укажите другую валюту!')
+
+    amount_units = to_units(amount, currency)
+    if amount_units == 0:
+        raise ValueError('Количество валюты меньше минимальной единицы '
+                         f'{from_units(1, currency):.8f} {currency}!')
+    return amount_units
+
+
+def execute_buy(portfolio: Portfolio,
+                currency: str,
+                amount_units: int,
+                rate: float) -> dict[str, int]:
+    """
+    Провести покупку валюты за USD в портфеле пользователя.
+
+    :param portfolio: Портфель
+    :type portfolio: Portfolio
+    :param currency: Код валюты
+    :type currency: str
+    :param amount_units: Количество валюты в минимальных единицах
+    :type amount_units: int
+    :param rate: Курс currency → USD
+    :type rate: float
+    :return: Баланс валюты до/после и стоимость в минимальных единицах
+    :rtype: dict[str, int]
+    """
+
+    cost_units = convert_units(amount_units, currency, TRADE_BASE,
+                               rate, ROUND_DEBIT)
+
+    base_wallet = portfolio.get_wallet(TRADE_BASE)
+    base_units = base_wallet.units if base_wallet is not None else 0
+    if cost_units > base_units:
+        raise InsufficientFundsError(from_units(base_units, TRADE_BASE),
+                                     from_units(cost_units, TRADE_BASE),
+                                     TRADE_BASE)
+
+    wallet = portfolio.ensure_wallet(currency)
+    prev_units = wallet.units
+    wallet.deposit_units(amount_units)
+    if cost_units:
+        base_wallet.withdraw_units(cost_units)
+
+    return {'before': prev_units,
+            'now': prev_units + amount_units,
+            'base_delta': -cost_units}
+
+
+def execute_sell(portfolio: Portfolio,
+                 currency: str,
+                 amount_units: int,
+                 rate: float) -> dict[str, int]:
+    """
+    Провести продажу валюты за USD в портфеле пользователя.
+
+    :param portfolio: Портфель
+    :type portfolio: Portfolio
+    :param currency: Код валюты
+    :type currency: str
+    :param amount_units: Количество валюты в минимальных единицах
+    :type amount_units: int
+    :param rate: Курс currency → USD
+    :type rate: float
+    :return: Баланс валюты до/после и выручка в минимальных единицах
+    :rtype: dict[str, int]
+    """
+
+    wallet = portfolio.get_wallet(currency)
+    prev_units = wallet.units if wallet is not None else 0
+    if amount_units > prev_units:
+        raise InsufficientFundsError(from_units(prev_units, currency),
+                                     from_units(amount_units, currency),
+                                     currency)
+
+    proceeds_units = convert_units(amount_units, currency, TRADE_BASE,
+                                   rate, ROUND_CREDIT)
+    wallet.withdraw_units(amount_units)
+    base_wallet = portfolio.ensure_wallet(TRADE_BASE)
+    if proceeds_units:
+        base_wallet.deposit_units(proceeds_units)
+
+    return {'before': prev_units,
+            'now': prev_units - amount_units,
+            'base_delta': proceeds_units}
@@ -1,22 +1,42 @@
-import hashlib
+import heapq
 import os
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from valutatrade_hub.core.currencies import get_currency
-from valutatrade_hub.core.exceptions import (
-    InsufficientFundsError,
+from valutatrade_hub.core.currencies import (
+    CURRENCY_REGISTRY,
+    get_currency,
+    reload_currency_metadata,
 )
 from valutatrade_hub.core.utils import (
+    data_lock,
     load_portfolios,
     load_users,
-    save_portfolios,
-    save_users,
 )
 from valutatrade_hub.decorators import log_action
 from valutatrade_hub.infra.settings import config
-from valutatrade_hub.parser_service.storage import RatesStorage
-from valutatrade_hub.parser_service.updater import RatesUpdater
+from valutatrade_hub.parser_service.storage import RatesStorage, build_rates_index
+
+# Модули ядра (репозиторий, шарды, движки заявок и оповещений, кэши)
+# импортируются внутри команд: старт CLI не платит за их загрузку
+if TYPE_CHECKING:
+    from valutatrade_hub.core.models import User
+
+
+def _find_user(username: str) -> 'User':
+    """
+    Найти пользователя по имени.
+    
+    :param username: Имя пользователя
+    :type username: str
+    :return: Пользователь
+    :rtype: User
+    """
+
+    from valutatrade_hub.core.repository import Repository
+    from valutatrade_hub.core.sharding import user_data_path
+
+    return Repository(user_data_path(username)).find_user(username)
 
 
 def register(username: str, password: str) -> None:
@@ -29,34 +49,30 @@ def register(username: str, password: str) -> None:
     :type password: str
     """
 
-    users = load_users(config.get('data_path', 'data/'))
-    for user in users:
-        if user['username'] == username:
+    from valutatrade_hub.core.money import to_units
+    from valutatrade_hub.core.repository import Repository
+    from valutatrade_hub.core.sharding import allocate_user_id, get_shard_map
+
+    # Шард определяется по имени: проверка занятости имени и запись
+    # затрагивают только его каталог
+    shard_map = get_shard_map()
+    data_path, shard = shard_map.locate(username)
+    with data_lock(data_path):
+        repository = Repository(data_path)
+        if repository.get_user(username) is not None:
             print(f"Имя пользователя '{username}' уже занято!")
             return None
-        
-    if len(password) < 4:
-        raise ValueError('Пароль должен быть не короче 4 символов!')
-    
-    user_id = max([user['user_id'] for user in users], default=0) + 1
-    
-    salt = os.urandom(8).hex()
-    hashed_password = (password + salt).encode('utf-8')
-    hashed_password = hashlib.sha256(hashed_password).hexdigest()
-    
-    users.append({'user_id': user_id,
-                  'username': username,
-                  'hashed_password': hashed_password,
-                  'salt': salt,
-                  'registration_date': datetime.now().isoformat()})
-    
-    save_users(users, config.get('data_path', 'data/'))
-    
-    portfolios = load_portfolios(config.get('data_path', 'data/'))
-    portfolios.append({'user_id': user_id,
-                       'wallets': dict(USD=dict(currency_code='USD',
-                                                balance=100))})
-    save_portfolios(portfolios, config.get('data_path', 'data/'))
+
+        if len(password) < 4:
+            raise ValueError('Пароль должен быть не короче 4 символов!')
+
+        user_id = None
+        if len(shard_map.shards) > 1:
+            user_id = allocate_user_id(data_path, shard)
+        user_id = repository.add_user(username, password, user_id).user_id
+        portfolio = repository.get_portfolio(user_id)
+        portfolio.ensure_wallet('USD').deposit_units(to_units(100, 'USD'))
+        repository.commit()
     
     hidden_password = '*'*len(password)
     
@@ -76,20 +92,18 @@ def login(username: str, password: str) -> Optional[str]:
     :rtype: int | None
     """
 
-    users = load_users(config.get('data_path', 'data/'))
-    for user in users:
-        if user['username'] == username:
-            verified = hashlib.sha256((password + user['salt']).encode('utf-8'))\
-                .hexdigest() == user['hashed_password']
+    from valutatrade_hub.core.repository import Repository
+    from valutatrade_hub.core.sharding import user_data_path
 
-            if verified:
-                print(f'Добро пожаловать, {username}!')
-                return username
-            else:
-                print("Неверный пароль!")
-                return None
+    user = Repository(user_data_path(username)).get_user(username)
+    if user is None:
+        print(f"Пользователь '{username}' не найден!")
+        return None
 
-    print(f"Пользователь '{username}' не найден!")
+    if user.verify_password(password):
+        print(f'Добро пожаловать, {username}!')
+        return username
+    print("Неверный пароль!")
     return None
 
 
@@ -103,44 +117,100 @@ def show_portfolio(logged_name: Optional[str], base_currency: str = 'USD') -> No
     :type base_currency: str
     """
 
+    from valutatrade_hub.core.repository import Repository
+    from valutatrade_hub.core.sharding import user_data_path
+    from valutatrade_hub.core.valuation import get_valuation_cache
+
     if logged_name is None:
         print('Сначала выполните login!')
         return None
     
-    users = load_users(config.get('data_path', 'data/'))
+    data_path = user_data_path(logged_name)
+    user = Repository(data_path).find_user(logged_name)
+    base_valuta = get_currency(base_currency)
 
-    for user in users:
-        if user['username'] == logged_name:
-            user_id = user['user_id']
-            break
+    # Стоимость берётся из кэша оценки: он пересчитывается при сделках
+    # и изменениях курсов, а не при каждом показе портфеля
+    cache = get_valuation_cache(base_valuta.code)
+    valuation = cache.portfolio(data_path, user.user_id)
+    if not valuation['balances']:
+        print('Портфель пуст!')
+        return None
 
-    porfolios = load_portfolios(config.get('data_path', 'data/'))
-    for portfolio in porfolios:
-        if portfolio['user_id'] == user_id:
-            if not portfolio['wallets']:
-                print('Портфель пуст!')
-                return None
-            wallets = portfolio['wallets']
-            break
+    if (datetime.fromisoformat((cache.last_refresh or '2000-01-01T00:00:00Z')\
+                               .replace('Z', '')) <
+        (datetime.now() - timedelta(seconds=config.get('rates_ttl_seconds', 300)))):
+        print('Курсы валют устарели! Обновите курсы с помощью команды update-rates.')
+        return None
 
-    storage = RatesStorage()
-    
-    rates = storage.load_rates()
-    total = 0
+    total = valuation['total']
     info = f"Портфель пользователя '{logged_name}' (база: {base_currency}):\n"
-    for cur in wallets.keys():
-        exchange_rate = get_rate(cur, base_currency, rates)
-        if exchange_rate is None:
+    for cur, balance in valuation['balances'].items():
+        if cur not in cache.rates:
+            print(f"Курс {cur}→{base_currency} недоступен. "
+                  "Повторите попытку позже.")
             return None
-        base_balance = exchange_rate*wallets[cur]['balance']
-        info += f"- {cur}: {wallets[cur]['balance']:20.8f}  →  "
-        info += f"{base_balance:20.8f} {base_currency}\n"
-        total += base_balance
+        info += f"- {cur}: {balance:20.8f}  →  "
+        info += f"{valuation['values'][cur]:20.8f} {base_currency}\n"
     info += "---------------------------------\n"
     info += f"ИТОГО: {total:.8f} {base_currency}"
     print(info)
 
 
+def show_leaderboard(logged_name: Optional[str],
+                     top: int = 10,
+                     base_currency: str = 'USD') -> None:
+    """
+    Показать первые места рейтинга пользователей по стоимости портфеля
+    (и место текущего пользователя).
+
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    :param top: Число мест
+    :type top: int
+    :param base_currency: Базовая валюта
+    :type base_currency: str
+    """
+
+    if top <= 0:
+        raise ValueError('Число мест должно быть положительным!')
+    base_valuta = get_currency(base_currency)
+
+    from valutatrade_hub.core.leaderboard import get_leaderboard
+
+    leaderboard = get_leaderboard(base_valuta.code)
+    last_refresh = leaderboard.cache.last_refresh or '2000-01-01T00:00:00Z'
+    if (datetime.fromisoformat(last_refresh.replace('Z', '')) <
+            datetime.now() - timedelta(seconds=config.get('rates_ttl_seconds', 300))):
+        print('Курсы валют устарели! Обновите курсы с помощью команды update-rates.')
+        return None
+
+    missing = sorted(code for code, holders in leaderboard.cache.holders.items()
+                     if holders and code not in leaderboard.cache.rates)
+    if missing:
+        print(f"Курс {missing[0]}→{base_valuta.code} недоступен. "
+              "Повторите попытку позже.")
+        return None
+
+    places = leaderboard.top(top)
+    if not places:
+        print('Рейтинг пуст!')
+        return None
+    info = f"Рейтинг портфелей (база: {base_valuta.code}):\n"
+    for place, username, total in places:
+        info += f"{place:>4}. {username:<20} {total:20.8f} {base_valuta.code}\n"
+
+    if logged_name is not None:
+        user = _find_user(logged_name)
+        position = leaderboard.position(user.user_id)
+        if position is None:
+            info += f"Портфель '{logged_name}' пуст и не участвует в рейтинге."
+        else:
+            info += f"Ваше место: {position['place']} из {position['size']} "\
+                    f"({position['total']:.8f} {base_valuta.code})"
+    print(info.rstrip('\n'))
+
+
 @log_action("BUY", True)
 def buy(logged_name: Optional[str],
         currency: str,
@@ -156,6 +226,11 @@ def buy(logged_name: Optional[str],
     :type amount: float
     """
 
+    from valutatrade_hub.core.money import from_units
+    from valutatrade_hub.core.repository import Repository
+    from valutatrade_hub.core.sharding import user_data_path
+    from valutatrade_hub.core.trading import execute_buy, trade_units
+
     if logged_name is None:
         print('Сначала выполните login!')
         return None
@@ -164,41 +239,18 @@ def buy(logged_name: Optional[str],
     if exchange_rate is None:
         return None
     
-    if amount <= 0:
-        raise ValueError('Количество валюты должно быть положительным числом!')
-    
-    users = load_users(config.get('data_path', 'data/'))
-
-    for user in users:
-        if user['username'] == logged_name:
-            user_obj = user
-            break
-
-    porfolios = load_portfolios(config.get('data_path', 'data/'))
-    for portfolio in porfolios:
-        if portfolio['user_id'] == user_obj['user_id']:
-            portfolio_obj = portfolio
-            break
-    
-    if exchange_rate*amount > portfolio_obj['wallets']['USD']['balance']:
-        raise InsufficientFundsError(portfolio_obj['wallets']['USD']['balance'],
-                                     exchange_rate*amount,
-                                     'USD')
-
-    if currency not in portfolio_obj['wallets'].keys():
-        prev_balance = 0
-        portfolio_obj['wallets'][currency] = dict(currency_code=currency,
-                                                  balance=amount)
-    else:
-        prev_balance = portfolio_obj['wallets'][currency]['balance']
-        portfolio_obj['wallets'][currency]['balance'] += amount
-
-    
-    portfolio_obj['wallets']['USD']['balance'] -= exchange_rate*amount
-
-    save_portfolios(porfolios, config.get('data_path', 'data/'))
-    transaction = {'before': prev_balance,
-                   'now': portfolio_obj['wallets'][currency]['balance'],
+    amount_units = trade_units(currency, amount)
+    data_path = user_data_path(logged_name)
+    # Чтение, изменение и запись портфелей - под одной блокировкой,
+    # иначе параллельная сделка другого пользователя затрёт эту
+    with data_lock(data_path):
+        repository = Repository(data_path)
+        user = repository.find_user(logged_name)
+        result = execute_buy(repository.get_portfolio(user.user_id), currency,
+                             amount_units, exchange_rate)
+        repository.commit()
+    transaction = {'before': from_units(result['before'], currency),
+                   'now': from_units(result['now'], currency),
                    'rate': exchange_rate}
     return transaction
 
@@ -218,6 +270,11 @@ def sell(logged_name: Optional[str],
     :type amount: float
     """
 
+    from valutatrade_hub.core.money import from_units
+    from valutatrade_hub.core.repository import Repository
+    from valutatrade_hub.core.sharding import user_data_path
+    from valutatrade_hub.core.trading import execute_sell, trade_units
+
     if logged_name is None:
         print('Сначала выполните login!')
         return None
@@ -226,41 +283,262 @@ def sell(logged_name: Optional[str],
     if exchange_rate is None:
         return None
     
-    if amount <= 0:
-        raise ValueError('Количество валюты должно быть положительным числом!')
+    amount_units = trade_units(currency, amount)
+    data_path = user_data_path(logged_name)
+    with data_lock(data_path):
+        repository = Repository(data_path)
+        user = repository.find_user(logged_name)
+        portfolio = repository.get_portfolio(user.user_id)
+
+        if portfolio.get_wallet(currency) is None:
+            print(f"У вас нет кошелька '{currency}'. Добавьте валюту: "
+                  "она создаётся автоматически при первой покупке.")
+            return None
+
+        result = execute_sell(portfolio, currency, amount_units, exchange_rate)
+        repository.commit()
+    transaction = {'before': from_units(result['before'], currency),
+                   'now': from_units(result['now'], currency),
+                   'rate': exchange_rate}
+    return transaction
+
+
+def _describe_order(order: dict) -> str:
+    """
+    Человекочитаемое описание заявки.
     
-    users = load_users(config.get('data_path', 'data/'))
+    :param order: Заявка
+    :type order: dict
+    :return: Описание
+    :rtype: str
+    """
 
-    for user in users:
-        if user['username'] == logged_name:
-            user_obj = user
-            break
+    from valutatrade_hub.core.money import from_units
 
-    porfolios = load_portfolios(config.get('data_path', 'data/'))
-    for portfolio in porfolios:
-        if portfolio['user_id'] == user_obj['user_id']:
-            portfolio_obj = portfolio
-            break
+    action = 'покупка' if order['side'] == 'buy' else 'продажа'
+    amount = from_units(order['amount_units'], order['currency'])
+    reserved = from_units(order['reserved_units'], order['reserved_code'])
+    return f"#{order['id']} {order['type']}: {action} {amount:.8f} "\
+           f"{order['currency']} по курсу {order['price']:.8f} "\
+           f"(резерв {reserved:.8f} {order['reserved_code']})"
 
-    if currency not in portfolio_obj['wallets'].keys():
-        print(f"У вас нет кошелька '{currency}'. Добавьте валюту: "
-              "она создаётся автоматически при первой покупке.")
-        return None
+
+def place_order(logged_name: Optional[str],
+                side: str,
+                order_type: str,
+                currency: str,
+                amount: float,
+                price: float) -> None:
+    """
+    Выставить отложенную лимитную или стоп-заявку.
     
-    if amount > portfolio_obj['wallets'][currency]['balance']:
-        raise InsufficientFundsError(portfolio_obj['wallets'][currency]['balance'],
-                                     amount,
-                                     currency)
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    :param side: Направление (buy, sell)
+    :type side: str
+    :param order_type: Тип (limit, stop)
+    :type order_type: str
+    :param currency: Код валюты
+    :type currency: str
+    :param amount: Количество валюты
+    :type amount: float
+    :param price: Курс срабатывания (к USD)
+    :type price: float
+    """
+
+    from valutatrade_hub.core.orders import get_orders_engine
+    from valutatrade_hub.core.trading import trade_units
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    if not currency.isupper():
+        raise ValueError('Код валюты должен состоять из заглавных букв!')
+    get_currency(currency)
+    amount_units = trade_units(currency, amount)
+    user_id = _find_user(logged_name).user_id
+
+    order = get_orders_engine().place_order(user_id, logged_name, side,
+                                            order_type, currency,
+                                            amount_units, price)
+    print(f"Заявка выставлена: {_describe_order(order)}")
+
+
+def show_orders(logged_name: Optional[str]) -> None:
+    """
+    Отобразить открытые заявки пользователя.
     
-    prev_balance = portfolio_obj['wallets'][currency]['balance']
-    portfolio_obj['wallets'][currency]['balance'] -= amount
-    portfolio_obj['wallets']['USD']['balance'] += exchange_rate*amount
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    """
+
+    from valutatrade_hub.core.orders import get_orders_engine
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    orders = get_orders_engine().list_orders(logged_name)
+    if not orders:
+        print('Открытых заявок нет.')
+        return None
+    print('\n'.join(f"- {_describe_order(order)}" for order in orders))
+
+
+def cancel_order(logged_name: Optional[str], order_id: int) -> None:
+    """
+    Отменить заявку пользователя.
     
-    save_portfolios(porfolios, config.get('data_path', 'data/'))
-    transaction = {'before': prev_balance,
-                   'now': portfolio_obj['wallets'][currency]['balance'],
-                   'rate': exchange_rate}
-    return transaction
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    :param order_id: ID заявки
+    :type order_id: int
+    """
+
+    from valutatrade_hub.core.orders import get_orders_engine
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    order = get_orders_engine().cancel_order(logged_name, order_id)
+    if order is None:
+        print(f'Заявка #{order_id} не найдена!')
+    else:
+        print(f'Заявка #{order_id} отменена, резерв возвращён на баланс.')
+
+
+def _describe_recurring(order: dict) -> str:
+    """
+    Человекочитаемое описание регулярной заявки.
+
+    :param order: Регулярная заявка
+    :type order: dict
+    :return: Описание
+    :rtype: str
+    """
+
+    from valutatrade_hub.core.money import from_units
+    from valutatrade_hub.core.recurring import format_interval
+
+    action = 'покупка' if order['side'] == 'buy' else 'продажа'
+    usd = from_units(order['usd_units'], 'USD')
+    next_run = datetime.fromtimestamp(order['next_run']).isoformat(timespec='seconds')
+    return f"#{order['id']} {action} {order['currency']} на {usd:.2f} USD "\
+           f"каждые {format_interval(order['interval'])} "\
+           f"(следующий запуск: {next_run}, исполнено: {order['runs']}, "\
+           f"пропущено: {order['skips']})"
+
+
+def add_recurring(logged_name: Optional[str],
+                  side: str,
+                  currency: str,
+                  usd: float,
+                  every: str) -> None:
+    """
+    Создать регулярную заявку (покупка или продажа валюты на фиксированную
+    сумму USD с заданным периодом).
+
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    :param side: Направление (buy, sell)
+    :type side: str
+    :param currency: Код валюты
+    :type currency: str
+    :param usd: Сумма одного запуска, USD
+    :type usd: float
+    :param every: Период (30m, 12h, 1d, 1w)
+    :type every: str
+    """
+
+    from valutatrade_hub.core.money import to_units
+    from valutatrade_hub.core.recurring import get_recurring_scheduler, parse_interval
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    if not currency.isupper():
+        raise ValueError('Код валюты должен состоять из заглавных букв!')
+    get_currency(currency)
+    interval = parse_interval(every)
+    usd_units = to_units(usd, 'USD') if usd > 0 else 0
+    user_id = _find_user(logged_name).user_id
+
+    order = get_recurring_scheduler().add(user_id, logged_name, side, currency,
+                                          usd_units, interval)
+    print(f"Регулярная заявка создана: {_describe_recurring(order)}")
+
+
+def show_recurring(logged_name: Optional[str]) -> None:
+    """
+    Отобразить регулярные заявки пользователя.
+
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    """
+
+    from valutatrade_hub.core.recurring import get_recurring_scheduler
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    orders = get_recurring_scheduler().list_orders(logged_name)
+    if not orders:
+        print('Регулярных заявок нет.')
+        return None
+    print('\n'.join(f"- {_describe_recurring(order)}" for order in orders))
+
+
+def remove_recurring(logged_name: Optional[str], order_id: int) -> None:
+    """
+    Удалить регулярную заявку пользователя.
+
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    :param order_id: ID заявки
+    :type order_id: int
+    """
+
+    from valutatrade_hub.core.recurring import get_recurring_scheduler
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    order = get_recurring_scheduler().remove(logged_name, order_id)
+    if order is None:
+        print(f'Регулярная заявка #{order_id} не найдена!')
+    else:
+        print(f'Регулярная заявка #{order_id} удалена.')
+
+
+def run_recurring() -> None:
+    """
+    Исполнить наступившие регулярные заявки всех пользователей.
+    """
+
+    from valutatrade_hub.core.money import from_units
+    from valutatrade_hub.core.recurring import get_recurring_scheduler
+
+    events = get_recurring_scheduler().run_due()
+    if not events:
+        print('Наступивших регулярных заявок нет.')
+        return None
+
+    for event in events:
+        info = f"#{event['id']} {event['username']}: "
+        if event['status'] == 'filled':
+            amount = from_units(event['amount_units'], event['currency'])
+            info += f"{'куплено' if event['side'] == 'buy' else 'продано'} "\
+                    f"{amount:.8f} {event['currency']} по курсу {event['rate']:.8f}"
+        else:
+            info += f"пропущено ({event['reason']})"
+        if event.get('missed'):
+            info += f", пропущенных запусков: {event['missed']}"
+        print(info)
 
 
 def get_rate(from_currency: str,
@@ -291,22 +569,30 @@ def get_rate(from_currency: str,
     if from_currency == to_currency:
         return 1
 
+    from_valuta = get_currency(from_currency)
+    to_valuta = get_currency(to_currency)
+    rate_key = f'{from_valuta.code}_{to_valuta.code}'
+
     storage = RatesStorage()
 
-    if rates is None:
-        rates = storage.load_rates()
+    # Без переданного словаря курс читается из бинарного снимка (mmap),
+    # а rates.json разбирается, только если снимка ещё нет.
+    snapshot = storage.open_snapshot() if rates is None else None
+    if snapshot is not None:
+        exchange, last_refresh = snapshot.lookup(rate_key)
+    else:
+        if rates is None:
+            rates = storage.load_rates()
+        exchange = rates.get('pairs', {}).get(rate_key)
+        last_refresh = rates.get('last_refresh')
 
-    from_valuta = get_currency(from_currency)
-    to_valuta = get_currency(to_currency)
-    
-    exchange = rates.get('pairs', {}).get(f'{from_valuta.code}_{to_valuta.code}')
     if exchange is None:
         print(f"Курс {from_currency}→{to_currency} недоступен. "
               "Повторите попытку позже.")
         return None
     
     now_timestamp = datetime.now()
-    if (datetime.fromisoformat(rates.get('last_refresh', '2000-01-01T00:00:00Z')\
+    if (datetime.fromisoformat((last_refresh or '2000-01-01T00:00:00Z')\
                                .replace('Z', '')) < 
         (now_timestamp - timedelta(seconds=config.get('rates_ttl_seconds', 300)))):
         print('Курсы валют устарели! Обновите курсы с помощью команды update-rates.')
@@ -333,13 +619,560 @@ def update_rates(source: Optional[str] = None) -> None:
     :type source: Optional[str]
     """
 
+    # Сетевой стек (requests, API-клиенты) подгружается только здесь,
+    # чтобы остальные команды не платили за его импорт при старте.
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
     updater = RatesUpdater()
     updater.run_update(source)
 
 
+def update_metadata() -> None:
+    """
+    Обновить метаданные криптовалют (название, капитализация, эмиссия)
+    пакетными запросами к CoinGecko, не дожидаясь срока обновления.
+    """
+
+    from valutatrade_hub.parser_service.metadata import MetadataRefresher
+
+    n_updated = MetadataRefresher().refresh(force=True)
+    print(f"Метаданные обновлены: {n_updated} валют.")
+    show_currencies()
+
+
+def show_currencies() -> None:
+    """
+    Отобразить поддерживаемые валюты с их метаданными.
+    """
+
+    # Метаданные сверяются с файлом один раз на команду, которая их читает
+    reload_currency_metadata()
+    print('\n'.join(get_currency(code).get_display_info()
+                    for code in CURRENCY_REGISTRY))
+
+
+def compact_history() -> None:
+    """
+    Перенести устаревшую историю курсов в сжатый архив.
+    """
+
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    result = RatesStorage().compact_history()
+    print('История курсов уплотнена:')
+    for tier, count in result['tiers'].items():
+        print(f"- {tier}: {count} записей")
+    print(f"Размер истории: {result['size_before']} → {result['size_after']} байт")
+
+
+def backfill(pair: str, start: str, end: str) -> None:
+    """
+    Загрузить исторические курсы пары за период (с возобновлением).
+    
+    :param pair: Пара (например, BTC_USD)
+    :type pair: str
+    :param start: Начало периода (ГГГГ-ММ-ДД)
+    :type start: str
+    :param end: Конец периода (ГГГГ-ММ-ДД, не включая)
+    :type end: str
+    """
+
+    from valutatrade_hub.parser_service.backfill import Backfiller, parse_date
+
+    pair = _validate_pair(pair)
+    backfiller = Backfiller()
+
+    def report(done: int, total: int, points: int) -> None:
+        print(f"\rЗагружено окон: {done}/{total}, точек: {points}",
+              end='', flush=True)
+
+    try:
+        result = backfiller.run(pair, parse_date(start), parse_date(end), report)
+    except KeyboardInterrupt:
+        print('\nЗагрузка прервана, повторите команду для продолжения.')
+        return None
+
+    print(f"\nЗагрузка {pair} завершена: окон {result['windows']} "
+          f"(пропущено {result['skipped']}, загружено {result['loaded']}, "
+          f"с ошибкой {result['failed']}), точек {result['points']}.")
+    for error in result['errors']:
+        print(f"- {error}")
+    if result['failed']:
+        print('Повторите команду, чтобы догрузить окна с ошибкой.')
+
+
+def show_risk(logged_name: Optional[str]) -> None:
+    """
+    Показать волатильность, корреляции и VaR/ES портфеля пользователя.
+    
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    """
+
+    from valutatrade_hub.core.repository import Repository
+    from valutatrade_hub.core.sharding import user_data_path
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    from valutatrade_hub.core.risk import RISK_CONFIDENCE, build_engine
+
+    repository = Repository(user_data_path(logged_name))
+    user = repository.find_user(logged_name)
+    store = repository.store
+    wallets = store.wallets(user.user_id)
+    if not wallets:
+        print('Портфель пуст!')
+        return None
+
+    codes = list(wallets)
+    engine = build_engine(codes)
+    exposures = engine.exposures(store)[[store.row(user.user_id)]]
+    risk = engine.portfolio_risk(exposures)
+    hours = engine.sample_seconds / 3600
+
+    info = f"Риск портфеля '{logged_name}' (база: USD, "\
+           f"сценариев: {len(engine.returns)}, шаг {hours:g} ч):\n"
+    info += "Волатильность (годовая), полная / за последние "\
+            f"{engine.window} шагов:\n"
+    for k, code in enumerate(codes):
+        info += f"- {code}: {engine.volatility[k]:8.2%} / "\
+                f"{engine.rolling_volatility[-1, k]:8.2%}\n"
+    info += "Корреляции:\n"
+    info += '      ' + ''.join(f"{code:>8}" for code in codes) + '\n'
+    for k, code in enumerate(codes):
+        info += f"{code:>6}" + ''.join(f"{value:8.2f}"
+                                       for value in engine.correlation[k]) + '\n'
+    info += f"Стоимость: {risk['value'][0]:.2f} USD\n"
+    for level in RISK_CONFIDENCE:
+        suffix = f'{round(level * 100)}'
+        info += f"VaR {suffix}% ({hours:g} ч): историч. "\
+                f"{risk[f'hist_var_{suffix}'][0]:.2f}, параметр. "\
+                f"{risk[f'param_var_{suffix}'][0]:.2f} USD; "\
+                f"ES: {risk[f'hist_es_{suffix}'][0]:.2f} / "\
+                f"{risk[f'param_es_{suffix}'][0]:.2f} USD\n"
+    print(info.rstrip('\n'))
+
+
+def risk_report(path: Optional[str] = None) -> None:
+    """
+    Посчитать VaR/ES для всех портфелей и сохранить отчёт в CSV.
+    
+    :param path: Путь к отчёту (по умолчанию - risk_report.csv в каталоге данных)
+    :type path: Optional[str]
+    """
+
+    import csv
+    import time
+
+    from valutatrade_hub.core.portfolio_store import PortfolioStore
+    from valutatrade_hub.core.risk import RISK_CONFIDENCE, build_engine
+    from valutatrade_hub.core.sharding import get_shard_map
+
+    data_path = config.get('data_path', 'data/')
+    path = path or os.path.join(data_path, 'risk_report.csv')
+    started = time.perf_counter()
+
+    # Портфели всех шардов собираются в одно колоночное хранилище
+    paths = get_shard_map().paths()
+    store = PortfolioStore.from_records([record for shard_path in paths
+                                         for record in load_portfolios(shard_path)])
+    if not len(store):
+        print('Портфелей нет!')
+        return None
+    engine = build_engine(store.currencies)
+    risk = engine.portfolio_risk(engine.exposures(store))
+    elapsed = time.perf_counter() - started
+
+    names = {user['user_id']: user['username']
+             for shard_path in paths for user in load_users(shard_path)}
+    columns = ['value'] + [f'{kind}_{round(level * 100)}'
+                           for level in RISK_CONFIDENCE
+                           for kind in ('hist_var', 'hist_es',
+                                        'param_var', 'param_es')]
+    with open(path, 'w', newline='') as fp:
+        writer = csv.writer(fp)
+        writer.writerow(['user_id', 'username'] + columns)
+        for row, user_id in enumerate(store.user_ids):
+            writer.writerow([user_id, names.get(user_id, '')] +
+                            [f"{risk[column][row]:.2f}" for column in columns])
+
+    worst = int(risk['hist_var_99'].argmax())
+    print(f"Отчёт о риске сохранён в {path}: портфелей {len(store)}, "
+          f"валют {len(engine.codes)}, сценариев {len(engine.returns)}, "
+          f"расчёт {elapsed:.2f} с.")
+    print(f"Суммарная стоимость: {risk['value'].sum():.2f} USD, "
+          f"наибольший VaR 99%: {risk['hist_var_99'][worst]:.2f} USD "
+          f"(user_id {store.user_ids[worst]}).")
+
+
+def rebalance_shards(count: int) -> None:
+    """
+    Довести число шардов пользовательских данных до count и перенести
+    пользователей по кольцу согласованного хэширования.
+    
+    :param count: Число шардов
+    :type count: int
+    """
+
+    from valutatrade_hub.core.sharding import rebalance
+
+    if count < 1:
+        raise ValueError('Число шардов должно быть положительным!')
+
+    result = rebalance(count)
+    info = f"Шардов: {len(result['users'])}, перенесено пользователей: "\
+           f"{result['moved']}\n"
+    for name, users in result['users'].items():
+        info += f"- {name}: {users}\n"
+    print(info.rstrip('\n'))
+
+
+def rebalance_portfolios(target: str,
+                         users: Optional[str] = None,
+                         min_trade: Optional[float] = None,
+                         mode: str = 'dry-run') -> None:
+    """
+    Привести портфели к целевому распределению (отчёт или проведение сделок).
+    
+    :param target: Распределение вида 'USD=50,BTC=30,ETH=20'
+    :type target: str
+    :param users: Пользователи через запятую (по умолчанию - все)
+    :type users: Optional[str]
+    :param min_trade: Минимальный размер сделки, USD
+    :type min_trade: Optional[float]
+    :param mode: dry-run - только отчёт, apply - провести сделки
+    :type mode: str
+    """
+
+    from valutatrade_hub.core.allocation import (
+        DEFAULT_MIN_TRADE_USD,
+        parse_weights,
+    )
+    from valutatrade_hub.core.allocation import (
+        rebalance_portfolios as rebalance_all,
+    )
+    from valutatrade_hub.core.money import from_units
+
+    if mode not in ('dry-run', 'apply'):
+        raise ValueError("Параметр '--mode' должен быть dry-run или apply!")
+    if min_trade is not None and min_trade < 0:
+        raise ValueError("Параметр '--min-trade' не может быть отрицательным!")
+
+    weights = parse_weights(target)
+    usernames = [name.strip() for name in users.split(',')] if users else None
+    report = rebalance_all(weights, usernames,
+                           DEFAULT_MIN_TRADE_USD if min_trade is None else min_trade,
+                           mode == 'apply')
+
+    trades = report['trades']
+    bought = -sum(usd for *_, usd in trades if usd < 0)
+    sold = sum(usd for *_, usd in trades if usd > 0)
+    target_info = ', '.join(f'{code} {weight:.0%}' for code, weight in weights.items())
+    title = 'Ребалансировка проведена' if mode == 'apply' else 'План ребалансировки'
+    info = f"{title} ({target_info}): портфелей {report['users']}, "\
+           f"затронуто {len({trade[0] for trade in trades})}, сделок {len(trades)}, "\
+           f"покупки {from_units(bought, 'USD'):.2f} USD, "\
+           f"продажи {from_units(sold, 'USD'):.2f} USD\n"
+    for username, code, amount, usd in trades[:20]:
+        side = 'buy' if amount > 0 else 'sell'
+        info += f"- {username}: {side} {from_units(abs(amount), code):.8f} {code} "\
+                f"({from_units(abs(usd), 'USD'):.2f} USD)\n"
+    if len(trades) > 20:
+        info += f"... ещё {len(trades) - 20} сделок\n"
+    print(info.rstrip('\n'))
+
+
+def import_users(path: str) -> None:
+    """
+    Массово зарегистрировать пользователей из CSV (колонки username,password).
+    
+    :param path: Путь к CSV
+    :type path: str
+    """
+
+    from valutatrade_hub.core.bulk import import_users as import_csv
+
+    if not os.path.exists(path):
+        raise ValueError(f"Файл '{path}' не найден!")
+
+    started = datetime.now()
+    result = import_csv(path)
+    elapsed = (datetime.now() - started).total_seconds()
+    info = f"Импортировано пользователей: {result['imported']}, дубликатов: "\
+           f"{result['duplicates']}, некорректных строк: {result['invalid']} "\
+           f"({elapsed:.1f} с.)\n"
+    for error in result['errors']:
+        info += f"- {error}\n"
+    print(info.rstrip('\n'))
+
+
+def export_portfolios(fmt: str, path: Optional[str] = None) -> None:
+    """
+    Выгрузить портфели всех пользователей в CSV или JSON Lines.
+    
+    :param fmt: Формат: csv или jsonl
+    :type fmt: str
+    :param path: Путь к файлу (по умолчанию - portfolios.<формат>)
+    :type path: Optional[str]
+    """
+
+    from valutatrade_hub.core.bulk import export_portfolios as export_records
+
+    path = path or f'portfolios.{fmt}'
+    counts = export_records(fmt, path)
+    print(f"Портфели выгружены в {path}: пользователей {counts['users']}, "
+          f"кошельков {counts['wallets']}.")
+
+
+def create_backup() -> None:
+    """
+    Сделать резервную копию каталога данных (торговля не останавливается).
+    """
+
+    from valutatrade_hub.core.backup import create_snapshot
+
+    manifest = create_snapshot()
+    print(f"Резервная копия {manifest['name']} создана: файлов "
+          f"{len(manifest['files'])}, {manifest['size']} байт, новых данных "
+          f"{manifest['new_bytes']} байт, блокировка данных "
+          f"{manifest['lock_ms']:.1f} мс.")
+
+
+def show_backups() -> None:
+    """
+    Отобразить список резервных копий.
+    """
+
+    from valutatrade_hub.core.backup import list_snapshots
+
+    manifests = list_snapshots()
+    if not manifests:
+        print('Резервных копий нет.')
+        return None
+
+    info = 'Резервные копии:\n'
+    for manifest in manifests:
+        info += f"- {manifest['name']}: файлов {len(manifest['files'])}, "\
+                f"{manifest['size']} байт (новых {manifest['new_bytes']}), "\
+                f"блокировка {manifest['lock_ms']:.1f} мс\n"
+    print(info.rstrip('\n'))
+
+
+def restore_backup(name: str, files: Optional[str] = None) -> None:
+    """
+    Восстановить каталог данных или отдельные файлы из резервной копии.
+    
+    :param name: Имя копии
+    :type name: str
+    :param files: Файлы через запятую (пути относительно каталога данных)
+    :type files: Optional[str]
+    """
+
+    from valutatrade_hub.core.backup import restore_snapshot
+
+    only = [path.strip() for path in files.split(',')] if files else None
+    result = restore_snapshot(name, only)
+    print(f"Восстановлено из {name}: файлов {result['files']}, "
+          f"{result['size']} байт, удалено лишних файлов {result['removed']}.")
+
+
+def _validate_pair(pair: str) -> str:
+    """
+    Проверить код пары вида 'BTC_USD'.
+    
+    :param pair: Код пары
+    :type pair: str
+    :return: Код пары
+    :rtype: str
+    """
+
+    if not pair:
+        raise ValueError("Параметр '--pair' пуст!")
+    if not pair.isupper():
+        raise ValueError("Параметр '--pair' должен состоять из заглавных букв!")
+    from_currency, _, to_currency = pair.partition('_')
+    if not from_currency or not to_currency:
+        raise ValueError("Пара должна иметь вид <исх_валюта>_<цел_валюта>, "
+                         "например BTC_USD!")
+    get_currency(from_currency)
+    get_currency(to_currency)
+    return pair
+
+
+def _describe_alert(alert: dict) -> str:
+    """
+    Человекочитаемое описание оповещения.
+    
+    :param alert: Оповещение
+    :type alert: dict
+    :return: Описание
+    :rtype: str
+    """
+
+    if alert['kind'] == 'above':
+        condition = f"курс поднимется до {alert['threshold']:.8f}"
+    elif alert['kind'] == 'below':
+        condition = f"курс опустится до {alert['threshold']:.8f}"
+    else:
+        condition = f"курс изменится на ±{alert['percent']:g}% за "\
+                    f"{alert['window']} с (опорный {alert['anchor']:.8f})"
+    return f"#{alert['id']} {alert['pair']}: {condition}"
+
+
+def add_alert(logged_name: Optional[str],
+              pair: str,
+              kind: str,
+              value: float,
+              window: Optional[int] = None) -> None:
+    """
+    Создать ценовое оповещение.
+    
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    :param pair: Код пары (например, BTC_USD)
+    :type pair: str
+    :param kind: Вид оповещения (above, below, move)
+    :type kind: str
+    :param value: Порог курса или процент изменения
+    :type value: float
+    :param window: Окно для оповещения об изменении, секунды
+    :type window: Optional[int]
+    """
+
+    from valutatrade_hub.core.alerts import get_alerts_engine
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    _validate_pair(pair)
+    if window is not None and window <= 0:
+        raise ValueError("Параметр '--window' должен быть положительным!")
+
+    current_rate = RatesStorage().load_rates().get('pairs', {})\
+        .get(pair, {}).get('rate')
+    alert = get_alerts_engine().add_alert(logged_name, pair, kind, value,
+                                          current_rate, window)
+    print(f"Оповещение создано: {_describe_alert(alert)}")
+
+
+def show_alerts(logged_name: Optional[str]) -> None:
+    """
+    Отобразить оповещения пользователя.
+    
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    """
+
+    from valutatrade_hub.core.alerts import get_alerts_engine
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    alerts = get_alerts_engine().list_alerts(logged_name)
+    if not alerts:
+        print('Активных оповещений нет.')
+        return None
+    print('\n'.join(f"- {_describe_alert(alert)}" for alert in alerts))
+
+
+def remove_alert(logged_name: Optional[str], alert_id: int) -> None:
+    """
+    Удалить оповещение пользователя.
+    
+    :param logged_name: Имя пользователя
+    :type logged_name: Optional[str]
+    :param alert_id: ID оповещения
+    :type alert_id: int
+    """
+
+    from valutatrade_hub.core.alerts import get_alerts_engine
+
+    if logged_name is None:
+        print('Сначала выполните login!')
+        return None
+
+    if get_alerts_engine().remove_alert(logged_name, alert_id):
+        print(f'Оповещение #{alert_id} удалено.')
+    else:
+        print(f'Оповещение #{alert_id} не найдено!')
+
+
+def publish_rates(address: Optional[str] = None) -> None:
+    """
+    Режим публикатора: обновлять курсы и рассылать их подписчикам (до Ctrl+C).
+    
+    :param address: Адрес прослушивания ('host:port' или 'unix:/путь')
+    :type address: Optional[str]
+    """
+
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.fanout import run_publisher
+
+    parser_config = ParserConfig()
+    try:
+        run_publisher(address or parser_config.FANOUT_ADDRESS,
+                      parser_config.FANOUT_INTERVAL_SECONDS)
+    except KeyboardInterrupt:
+        print('Публикация курсов остановлена.')
+
+
+def subscribe_rates(address: Optional[str] = None) -> None:
+    """
+    Режим подписчика: получать курсы от публикатора в локальный кэш
+    (до Ctrl+C).
+    
+    :param address: Адрес публикатора ('host:port' или 'unix:/путь')
+    :type address: Optional[str]
+    """
+
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.fanout import RatesSubscriber
+
+    subscriber = RatesSubscriber(address or ParserConfig().FANOUT_ADDRESS)
+    try:
+        subscriber.run()
+    except KeyboardInterrupt:
+        print('Подписка на курсы остановлена.')
+
+
+def watch_rates(pairs: Optional[str] = None) -> None:
+    """
+    Выводить изменения курсов по мере обновления кэша (до Ctrl+C).
+    
+    :param pairs: Пары через запятую (по умолчанию - все)
+    :type pairs: Optional[str]
+    """
+
+    from valutatrade_hub.parser_service.watcher import watch_rates as watch
+
+    selected = None
+    if pairs is not None:
+        selected = [_validate_pair(pair) for pair in pairs.split(',')]
+
+    print('Ожидание изменений курсов (Ctrl+C - выход)...')
+    try:
+        for changed in watch(selected, initial=True):
+            for rate_key, change in changed.items():
+                new_rate = change['new']['rate']
+                info = f"- {rate_key}: {new_rate:.8f}"
+                if change['old'] is not None and change['old'].get('rate'):
+                    old_rate = change['old']['rate']
+                    percent = (new_rate - old_rate) / old_rate * 100
+                    info += f" (было {old_rate:.8f}, {percent:+.2f}%)"
+                info += f" [{change['new'].get('updated_at', '')}]"
+                print(info)
+    except KeyboardInterrupt:
+        print('Наблюдение за курсами остановлено.')
+
+
 def show_rates(currency: Optional[str] = None,
                top: Optional[int] = None,
-               base: str = 'USD') -> None:
+               base: str = 'USD',
+               sort: str = 'rate') -> None:
     """
     Отобразить текущий курс валют.
     
@@ -349,8 +1182,13 @@ def show_rates(currency: Optional[str] = None,
     :type top: Optional[int]
     :param base: Код базовый валюты
     :type base: str
+    :param sort: Порядок: rate - по курсу, change - по изменению за 24 ч
+    :type sort: str
     """
     
+    if sort not in ('rate', 'change'):
+        raise ValueError("Параметр '--sort' должен быть rate или change!")
+
     if currency is not None and len(currency) == 0:
         raise ValueError("Параметр '--currency' пуст!")
     
@@ -391,21 +1229,129 @@ def show_rates(currency: Optional[str] = None,
               "Обновите курсы с помощью команды update-rates.")
         return None
 
-    for rate_key, rate_value in pairs.items():
-        from_currency, to_currency = rate_key.split('_')
-        if to_currency == base_valuta.code:
-            result.append((from_currency, to_currency, rate_value['rate']))
-    
-    result = sorted(result, key=lambda x: x[2], reverse=True)
-
+    # Индекс пар строится при сохранении курсов (в старом кэше - здесь)
+    index = rates.get('index') or build_rates_index(pairs)
     if valuta is not None:
-        result = [rate for rate in result if rate[0] == valuta.code]
-        if not result:
-            raise ValueError(f"Курс для '{valuta.code}' не найден в кеше.")
+        if f"{valuta.code}_{base_valuta.code}" not in pairs:
+            quoted = ', '.join(index['by_from'].get(valuta.code, []))
+            raise ValueError(f"Курс для '{valuta.code}' не найден в кеше." +
+                             (f" Есть курсы к: {quoted}." if quoted else ''))
+        codes = [valuta.code]
+    else:
+        # Уже отсортированы по убыванию курса
+        codes = index['by_base'].get(base_valuta.code, [])
+
+    changes = dict()
+    if sort == 'change':
+        # Изменения за 24 ч уже посчитаны инкрементально при обновлении курсов
+        stats = storage.load_rolling_stats()
+        for code in codes:
+            summary = stats.summary(f"{code}_{base_valuta.code}")
+            if '24h' in summary:
+                changes[code] = summary['24h']['change_pct']
+        codes = heapq.nlargest(len(codes) if top is None else top, codes,
+                               key=lambda code: abs(changes.get(code, 0.0)))
+    elif top is not None:
+        codes = codes[:top]
 
-    if top is not None:
-        result = result[:top]
+    result = [(code, base_valuta.code,
+               pairs[f"{code}_{base_valuta.code}"]['rate']) for code in codes]
 
     info = f"Rates from cache (updated at {rates.get('last_refresh', '<unknown>')}):\n"
-    info += '\n'.join([f"- {rate[0]}_{rate[1]}: {rate[2]:.8f}" for rate in result])
+    info += '\n'.join([f"- {rate[0]}_{rate[1]}: {rate[2]:.8f}" +
+                       (f" (24h: {changes[rate[0]]:+.2f}%)"
+                        if rate[0] in changes else '')
+                       for rate in result])
+    print(info)
+
+
+def show_rate_stats(pair: str) -> None:
+    """
+    Отобразить скользящую статистику курса пары за 1ч/24ч/7д.
+    
+    :param pair: Пара (например, BTC_USD)
+    :type pair: str
+    """
+
+    import time
+
+    pair = _validate_pair(pair)
+    summary = RatesStorage().load_rolling_stats().summary(pair, time.time())
+    if not summary:
+        raise ValueError(f"Статистики для '{pair}' нет: выполните update-rates.")
+
+    info = f"Статистика {pair}:\n"
+    info += f"{'окно':>5} {'изм.%':>8} {'SMA':>16} {'EMA':>16} "\
+            f"{'min':>16} {'max':>16} {'stddev':>14} {'точек':>6}\n"
+    for name, values in summary.items():
+        info += f"{name:>5} {values['change_pct']:+8.2f} {values['sma']:16.8f} "\
+                f"{values['ema']:16.8f} {values['min']:16.8f} "\
+                f"{values['max']:16.8f} {values['stddev']:14.8f} "\
+                f"{values['count']:6d}\n"
+    info += f"Последний курс: {next(iter(summary.values()))['last']:.8f}"
+    print(info)
+
+
+def show_best_route(from_currency: str, to_currency: str) -> None:
+    """
+    Отобразить маршрут конвертации с наилучшим курсом (через все пары
+    и провайдеров кэша) в сравнении с прямым курсом.
+    
+    :param from_currency: Исходная валюта
+    :type from_currency: str
+    :param to_currency: Целевая валюта
+    :type to_currency: str
+    """
+
+    from valutatrade_hub.core.conversion_graph import (
+        ConversionGraph,
+        format_route,
+    )
+
+    from_currency = get_currency(from_currency).code
+    to_currency = get_currency(to_currency).code
+    if from_currency == to_currency:
+        raise ValueError('Исходная и целевая валюты совпадают!')
+
+    graph = ConversionGraph.from_rates(RatesStorage().load_rates())
+    route = graph.best_route(from_currency, to_currency,
+                             config.get('route_max_hops', 4))
+    if route is None:
+        raise ValueError(f"Маршрут {from_currency}→{to_currency} не найден: "
+                         "выполните update-rates.")
+
+    info = f"Лучший маршрут {from_currency}→{to_currency}: "\
+           f"{format_route(route['hops'])}, курс {route['rate']:.8f}\n"
+    for hop in route['hops']:
+        info += f"  {hop['from']}→{hop['to']}: {hop['rate']:.8f} "\
+                f"({hop['pair']}, {hop['source']})\n"
+    direct = graph.best_route(from_currency, to_currency, 1)
+    if direct is None:
+        info += 'Прямого курса нет.'
+    else:
+        gain = (route['rate'] / direct['rate'] - 1) * 100
+        info += f"Прямой курс: {direct['rate']:.8f} (выгода маршрута {gain:+.4f}%)"
+    print(info)
+
+
+def show_arbitrage() -> None:
+    """
+    Отобразить арбитражные циклы в текущем кэше курсов.
+    """
+
+    from valutatrade_hub.core.conversion_graph import (
+        check_arbitrage,
+        format_route,
+    )
+
+    cycles = check_arbitrage()
+    if not cycles:
+        print('Арбитражных циклов нет.')
+        return None
+
+    info = f"Арбитражные циклы ({len(cycles)}):"
+    for cycle in sorted(cycles, key=lambda cycle: -cycle['profit_pct']):
+        sources = ', '.join(sorted({hop['source'] for hop in cycle['hops']}))
+        info += f"\n{format_route(cycle['hops'])}: "\
+                f"+{cycle['profit_pct']:.4f}% ({sources})"
     print(info)
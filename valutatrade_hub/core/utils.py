@@ -1,5 +1,282 @@
 import json
 import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
+
+# Глубина захвата блокировки каталога данных в текущем потоке
+# (путь → число вложенных data_lock), чтобы вложенный захват не ждал сам себя
+_lock_depth = threading.local()
+
+# Размер журнала users.json/portfolios.json (байты), после которого он
+# сворачивается в основной файл
+RECORDS_JOURNAL_BYTES = 1 << 20
+
+# Контрольные суммы прочитанных и записанных файлов (путь → ((inode,
+# mtime_ns, размер), crc32 содержимого)): журнал привязан к содержимому
+# файла, а не к inode, и переживает копирование каталога данных
+_checksums: dict[str, tuple[tuple[int, int, int], int]] = dict()
+
+
+@contextmanager
+def data_lock(data_path: str) -> Iterator[None]:
+    """
+    Монопольная блокировка каталога данных на время чтения-изменения-записи
+    (файл .lock, fcntl.flock). Работает и между процессами, и между потоками
+    одного процесса; вложенный захват в том же потоке не блокируется.
+    
+    :param data_path: Путь к данным
+    :type data_path: str
+    """
+
+    depth = getattr(_lock_depth, 'paths', None)
+    if depth is None:
+        depth = _lock_depth.paths = dict()
+    key = os.path.abspath(data_path)
+    if depth.get(key) or fcntl is None:
+        depth[key] = depth.get(key, 0) + 1
+        try:
+            yield None
+        finally:
+            depth[key] -= 1
+        return None
+
+    os.makedirs(data_path, exist_ok=True)
+    with open(os.path.join(data_path, '.lock'), 'a') as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        depth[key] = 1
+        try:
+            yield None
+        finally:
+            depth[key] = 0
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+def _journal_path(filepath: str) -> str:
+    """
+    Путь к журналу дописанных записей файла (users.json → users.journal).
+
+    :param filepath: Путь к файлу
+    :type filepath: str
+    :return: Путь к журналу
+    :rtype: str
+    """
+
+    return f"{os.path.splitext(filepath)[0]}.journal"
+
+
+def _stat_key(stat: os.stat_result) -> tuple[int, int, int]:
+    """
+    Ключ версии файла: (inode, mtime_ns, размер).
+
+    :param stat: Результат stat
+    :type stat: os.stat_result
+    :return: Ключ
+    :rtype: tuple[int, int, int]
+    """
+
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _checksum(filepath: str) -> int:
+    """
+    Контрольная сумма содержимого файла (из памяти, если файл не менялся
+    с последнего чтения или записи в этом процессе).
+
+    :param filepath: Путь к файлу
+    :type filepath: str
+    :return: crc32 содержимого (0, если файла нет)
+    :rtype: int
+    """
+
+    try:
+        with open(filepath, 'rb') as fp:
+            key = _stat_key(os.fstat(fp.fileno()))
+            cached = _checksums.get(filepath)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            checksum = zlib.crc32(fp.read())
+    except FileNotFoundError:
+        return 0
+    _checksums[filepath] = (key, checksum)
+    return checksum
+
+
+def _dump_atomic(data: list[dict], filepath: str) -> None:
+    """
+    Атомарно записать JSON: читатели без блокировки видят либо старый,
+    либо новый файл целиком. Журнал файла после этого не нужен: его
+    записи уже вошли в data (а если процесс упадёт до удаления журнала,
+    журнал не совпадёт с новым файлом по контрольной сумме и будет
+    пропущен).
+    
+    :param data: Данные
+    :type data: list[dict]
+    :param filepath: Путь к файлу
+    :type filepath: str
+    """
+
+    tmp_file = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    text = json.dumps(data, indent=4).encode()
+    with open(tmp_file, 'wb') as fp:
+        fp.write(text)
+        key = _stat_key(os.fstat(fp.fileno()))
+    os.replace(tmp_file, filepath)
+    _checksums[filepath] = (key, zlib.crc32(text))
+    try:
+        os.remove(_journal_path(filepath))
+    except FileNotFoundError:
+        pass
+
+
+def _read_journal(filepath: str, base: int) -> list[dict]:
+    """
+    Прочитать записи журнала, если он относится к версии файла base.
+
+    :param filepath: Путь к файлу
+    :type filepath: str
+    :param base: Контрольная сумма основного файла
+    :type base: int
+    :return: Записи журнала по порядку
+    :rtype: list[dict]
+    """
+
+    try:
+        with open(_journal_path(filepath), 'rb') as fp:
+            lines = fp.read().split(b'\n')
+    except FileNotFoundError:
+        return []
+    # Последний элемент - недописанная строка (или пустой хвост)
+    lines = lines[:-1]
+    if not lines or json.loads(lines[0]).get('base') != base:
+        return []
+    return [json.loads(line) for line in lines[1:]]
+
+
+def _merge_records(records: list[dict], changes: list[dict]) -> list[dict]:
+    """
+    Применить изменённые записи: запись заменяет запись с тем же
+    user_id или добавляется в конец.
+
+    :param records: Записи
+    :type records: list[dict]
+    :param changes: Изменённые записи
+    :type changes: list[dict]
+    :return: Записи после изменений (список records)
+    :rtype: list[dict]
+    """
+
+    if not changes:
+        return records
+    positions = {record['user_id']: i for i, record in enumerate(records)}
+    for record in changes:
+        position = positions.get(record['user_id'])
+        if position is None:
+            positions[record['user_id']] = len(records)
+            records.append(record)
+        else:
+            records[position] = record
+    return records
+
+
+def _load_records(filepath: str) -> list[dict]:
+    """
+    Загрузить записи файла вместе с журналом.
+
+    :param filepath: Путь к файлу
+    :type filepath: str
+    :return: Записи
+    :rtype: list[dict]
+    """
+
+    while True:
+        try:
+            with open(filepath, 'rb') as fp:
+                key = _stat_key(os.fstat(fp.fileno()))
+                text = fp.read()
+        except FileNotFoundError:
+            key, text = None, None
+        if text is None:
+            base, records = 0, []
+        else:
+            base = zlib.crc32(text)
+            _checksums[filepath] = (key, base)
+            records = json.loads(text)
+        changes = _read_journal(filepath, base)
+        # Если журнал успели свернуть в новый файл, прочитать заново
+        try:
+            current = _stat_key(os.stat(filepath))
+        except FileNotFoundError:
+            current = None
+        if current == key:
+            return _merge_records(records, changes)
+
+
+def _append_records(records: list[dict], filepath: str) -> None:
+    """
+    Дописать изменённые записи в журнал файла (под data_lock): запись
+    стоит O(числа изменённых записей), а не O(размера файла). Если файла
+    ещё нет или журнал дорос до RECORDS_JOURNAL_BYTES, файл
+    перезаписывается целиком со всеми изменениями.
+
+    :param records: Изменённые записи (с полем user_id)
+    :type records: list[dict]
+    :param filepath: Путь к файлу
+    :type filepath: str
+    """
+
+    base = _checksum(filepath)
+    journal = _journal_path(filepath)
+    try:
+        size = os.path.getsize(journal)
+        with open(journal, 'rb') as fp:
+            header = fp.readline()
+        current = header.endswith(b'\n') and json.loads(header).get('base') == base
+    except FileNotFoundError:
+        size, current = 0, False
+
+    if not os.path.exists(filepath) or size >= RECORDS_JOURNAL_BYTES:
+        _dump_atomic(_merge_records(_load_records(filepath), records), filepath)
+        return None
+
+    lines = [] if current else [json.dumps({'base': base})]
+    lines += [json.dumps(record) for record in records]
+    with open(journal, 'a' if current else 'w') as fp:
+        fp.write(''.join(line + '\n' for line in lines))
+
+
+def records_version(data_path: str, name: str) -> Optional[tuple[int, ...]]:
+    """
+    Версия users.json/portfolios.json вместе с журналом: (inode, mtime_ns,
+    размер файла, размер журнала).
+
+    :param data_path: Путь к данным
+    :type data_path: str
+    :param name: Имя файла (users.json или portfolios.json)
+    :type name: str
+    :return: Версия (или None, если нет ни файла, ни журнала)
+    :rtype: Optional[tuple[int, ...]]
+    """
+
+    filepath = os.path.join(data_path, name)
+    try:
+        stat = os.stat(filepath)
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        version = (0, 0, 0)
+    try:
+        journal_size = os.path.getsize(_journal_path(filepath))
+    except FileNotFoundError:
+        journal_size = 0
+    if version == (0, 0, 0) and not journal_size:
+        return None
+    return version + (journal_size,)
 
 
 def load_users(data_path: str) -> list[dict]:
@@ -13,19 +290,7 @@ def load_users(data_path: str) -> list[dict]:
     """
     
     os.makedirs(data_path, exist_ok=True)
-    filepath = os.path.join(data_path, 'users.json')
-    
-    fp = None
-    try:
-        fp = open(filepath, 'r')
-    except (FileNotFoundError, json.JSONDecodeError, ValueError):
-        users = []
-    else:
-        users = json.load(fp)
-    finally:
-        if fp is not None:
-            fp.close()
-    return users
+    return _load_records(os.path.join(data_path, 'users.json'))
 
 
 def save_users(data: list[dict], data_path: str) -> None:
@@ -38,9 +303,7 @@ def save_users(data: list[dict], data_path: str) -> None:
     :type data_path: str
     """
 
-    filepath = os.path.join(data_path, 'users.json')
-    with open(filepath, 'w') as fp:
-        json.dump(data, fp, indent=4)
+    _dump_atomic(data, os.path.join(data_path, 'users.json'))
 
 
 def load_portfolios(data_path: str) -> list[dict]:
@@ -54,19 +317,7 @@ def load_portfolios(data_path: str) -> list[dict]:
     """
 
     os.makedirs(data_path, exist_ok=True)
-    filepath = os.path.join(data_path, 'portfolios.json')
-    
-    fp = None
-    try:
-        fp = open(filepath, 'r')
-    except (FileNotFoundError, json.JSONDecodeError, ValueError):
-        portfolios = []
-    else:
-        portfolios = json.load(fp)
-    finally:
-        if fp is not None:
-            fp.close()
-    return portfolios
+    return _load_records(os.path.join(data_path, 'portfolios.json'))
 
 
 def save_portfolios(data: list[dict], data_path: str) -> None:
@@ -79,6 +330,30 @@ def save_portfolios(data: list[dict], data_path: str) -> None:
     :type data_path: str
     """
 
-    filepath = os.path.join(data_path, 'portfolios.json')
-    with open(filepath, 'w') as fp:
-        json.dump(data, fp, indent=4)
\ No newline at end of file
+    _dump_atomic(data, os.path.join(data_path, 'portfolios.json'))
+
+
+def append_users(records: list[dict], data_path: str) -> None:
+    """
+    Записать изменённых и новых пользователей (дозаписью в журнал).
+    
+    :param records: Записи пользователей
+    :type records: list[dict]
+    :param data_path: Путь к данным
+    :type data_path: str
+    """
+
+    _append_records(records, os.path.join(data_path, 'users.json'))
+
+
+def append_portfolios(records: list[dict], data_path: str) -> None:
+    """
+    Записать изменённые и новые портфели (дозаписью в журнал).
+    
+    :param records: Записи портфелей
+    :type records: list[dict]
+    :param data_path: Путь к данным
+    :type data_path: str
+    """
+
+    _append_records(records, os.path.join(data_path, 'portfolios.json'))
@@ -0,0 +1,333 @@
+import json
+import math
+import os
+from typing import Any, Optional
+
+from valutatrade_hub.core.money import from_units
+from valutatrade_hub.core.portfolio_store import PortfolioStore
+from valutatrade_hub.core.ranking import RankIndex
+from valutatrade_hub.core.utils import records_version
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.storage import add_rates_listener
+
+# Версия файла: (mtime_ns, размер) или None, если файла нет; для
+# portfolios.json - вместе с журналом (core.utils.records_version)
+FileVersion = Optional[tuple[int, ...]]
+
+
+def file_version(path: str) -> FileVersion:
+    """
+    Версия файла для проверки актуальности кэша.
+
+    :param path: Путь к файлу
+    :type path: str
+    :return: (mtime_ns, размер) или None
+    :rtype: FileVersion
+    """
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ValuationCache:
+    """
+    Кэш оценки портфелей в одной базовой валюте.
+
+    Для каждого пользователя хранятся балансы, вклад каждой валюты в
+    стоимость (баланс * курс к базе) и итог, а обратный индекс
+    валюта → держатели позволяет при изменении курса пересчитать только
+    тех, кто держит эту валюту. Сделка меняет вклад одной валюты
+    пользователя. Шард загружается целиком при первом обращении и
+    перечитывается, только если portfolios.json или его журнал изменён
+    другим процессом; курсы сверяются с rates.json по версии файла.
+    Если включён рейтинг, каждое изменение итога переносится и в него.
+    """
+
+    __slots__ = ('base', 'rates', 'last_refresh', 'rates_version', 'balances',
+                 'values', 'totals', 'holders', 'shards', 'members', 'versions',
+                 'ranking')
+
+    def __init__(self, base: str) -> None:
+        """
+        Создать пустой кэш.
+
+        :param base: Код базовой валюты
+        :type base: str
+        """
+
+        self.base = base
+        # Курс каждой валюты к базе (из пар X_<база>)
+        self.rates: dict[str, float] = {base: 1.0}
+        self.last_refresh: Optional[str] = None
+        self.rates_version: FileVersion = None
+        # Пользователь → {валюта: баланс} / {валюта: вклад} / итог
+        self.balances: dict[int, dict[str, float]] = dict()
+        self.values: dict[int, dict[str, float]] = dict()
+        self.totals: dict[int, float] = dict()
+        # Валюта → держатели
+        self.holders: dict[str, set[int]] = dict()
+        # Пользователь → шард, шард → пользователи и версия portfolios.json
+        self.shards: dict[int, str] = dict()
+        self.members: dict[str, set[int]] = dict()
+        self.versions: dict[str, FileVersion] = dict()
+        # Рейтинг по итогам (создаётся при первом запросе рейтинга)
+        self.ranking: Optional[RankIndex] = None
+
+
+    def enable_ranking(self) -> RankIndex:
+        """
+        Включить рейтинг пользователей по итогу (заполняется по уже
+        загруженным портфелям, дальше обновляется вместе с итогами).
+
+        :return: Рейтинг
+        :rtype: RankIndex
+        """
+
+        if self.ranking is None:
+            self.ranking = RankIndex()
+            for user_id, total in self.totals.items():
+                self.ranking.update(user_id, total)
+        return self.ranking
+
+
+    def _retotal(self, user_id: int) -> None:
+        """
+        Пересчитать итог пользователя по вкладам его кошельков (и его место
+        в рейтинге). Итог не ведётся приращениями: ошибки округления
+        накапливались бы с каждой сделкой и изменением курса. Кошельков у
+        пользователя не больше, чем валют в реестре, а math.fsum даёт
+        корректно округлённую сумму независимо от порядка и истории.
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        """
+
+        total = math.fsum(self.values[user_id].values())
+        self.totals[user_id] = total
+        if self.ranking is not None:
+            self.ranking.update(user_id, total)
+
+
+    def refresh_rates(self) -> list[str]:
+        """
+        Сверить курсы с rates.json и пересчитать держателей изменившихся
+        валют (по файлу разбирается только rates.json, не портфели).
+
+        :return: Валюты, курс которых изменился
+        :rtype: list[str]
+        """
+
+        path = ParserConfig().RATES_FILE_PATH
+        version = file_version(path)
+        if version == self.rates_version:
+            return []
+        try:
+            with open(path, 'r') as fp:
+                rates = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            rates = dict()
+        self.rates_version = version
+        self.last_refresh = rates.get('last_refresh')
+
+        suffix = f'_{self.base}'
+        current = {self.base: 1.0}
+        for rate_key, record in rates.get('pairs', {}).items():
+            if rate_key.endswith(suffix) and record.get('rate'):
+                current[rate_key[:-len(suffix)]] = float(record['rate'])
+
+        moved = [code for code in set(self.rates) | set(current)
+                 if self.rates.get(code) != current.get(code)]
+        self.rates = current
+        for code in moved:
+            self._revalue(code)
+        return moved
+
+
+    def _revalue(self, code: str) -> None:
+        """
+        Пересчитать вклад валюты у её держателей (баланс * курс).
+
+        :param code: Код валюты
+        :type code: str
+        """
+
+        rate = self.rates.get(code, 0.0)
+        for user_id in self.holders.get(code, ()):
+            self.values[user_id][code] = self.balances[user_id][code] * rate
+            self._retotal(user_id)
+
+
+    def set_balance(self, user_id: int, code: str, units: int) -> None:
+        """
+        Учесть новый баланс кошелька (после сделки).
+
+        :param user_id: ID пользователя
+        :type user_id: int
+        :param code: Код валюты
+        :type code: str
+        :param units: Баланс в минимальных единицах
+        :type units: int
+        """
+
+        balance = from_units(units, code)
+        self.balances.setdefault(user_id, dict())[code] = balance
+        self.values.setdefault(user_id, dict())[code] = \
+            balance * self.rates.get(code, 0.0)
+        self.holders.setdefault(code, set()).add(user_id)
+        self._retotal(user_id)
+
+
+    def _drop_shard(self, data_path: str) -> None:
+        """
+        Забыть пользователей шарда.
+
+        :param data_path: Путь к данным шарда
+        :type data_path: str
+        """
+
+        for user_id in self.members.pop(data_path, set()):
+            for code in self.balances.pop(user_id, {}):
+                self.holders[code].discard(user_id)
+            self.values.pop(user_id, None)
+            self.totals.pop(user_id, None)
+            self.shards.pop(user_id, None)
+            if self.ranking is not None:
+                self.ranking.discard(user_id)
+        self.versions.pop(data_path, None)
+
+
+    def load_shard(self, data_path: str) -> None:
+        """
+        Загрузить портфели шарда, если их нет в кэше или файл изменён
+        другим процессом.
+
+        :param data_path: Путь к данным шарда
+        :type data_path: str
+        """
+
+        data_path = os.path.normpath(data_path)
+        version = records_version(data_path, 'portfolios.json')
+        if data_path in self.versions and self.versions[data_path] == version:
+            return None
+
+        self._drop_shard(data_path)
+        store = PortfolioStore.load(data_path)
+        members = self.members[data_path] = set()
+        for user_id in store.user_ids:
+            self.shards[user_id] = data_path
+            members.add(user_id)
+            for code, units in store.wallets(user_id).items():
+                self.set_balance(user_id, code, units)
+        self.versions[data_path] = version
+
+
+    def record_commit(self,
+                      data_path: str,
+                      before: FileVersion,
+                      changes: dict[int, dict[str, int]]) -> None:
+        """
+        Учесть записанные в шард изменения кошельков.
+
+        :param data_path: Путь к данным шарда
+        :type data_path: str
+        :param before: Версия portfolios.json до записи
+        :type before: FileVersion
+        :param changes: {ID пользователя: {валюта: баланс в мин. единицах}}
+        :type changes: dict[int, dict[str, int]]
+        """
+
+        data_path = os.path.normpath(data_path)
+        if data_path not in self.versions:
+            return None
+        if self.versions[data_path] != before:
+            # Файл успел изменить другой процесс: шард перечитается целиком
+            self._drop_shard(data_path)
+            return None
+
+        for user_id, wallets in changes.items():
+            if self.shards.setdefault(user_id, data_path) != data_path:
+                continue
+            self.members[data_path].add(user_id)
+            for code, units in wallets.items():
+                self.set_balance(user_id, code, units)
+        self.versions[data_path] = records_version(data_path, 'portfolios.json')
+
+
+    def portfolio(self, data_path: str, user_id: int) -> dict[str, Any]:
+        """
+        Оценка портфеля пользователя.
+
+        :param data_path: Путь к данным шарда пользователя
+        :type data_path: str
+        :param user_id: ID пользователя
+        :type user_id: int
+        :return: balances, values ({валюта: значение}) и total
+        :rtype: dict[str, Any]
+        """
+
+        self.refresh_rates()
+        self.load_shard(data_path)
+        return {'balances': self.balances.get(user_id, {}),
+                'values': self.values.get(user_id, {}),
+                'total': self.totals.get(user_id, 0.0)}
+
+
+# Кэши оценки (базовая валюта → кэш), общие для процесса
+_caches: dict[str, ValuationCache] = dict()
+
+
+def get_valuation_cache(base: str = 'USD') -> ValuationCache:
+    """
+    Кэш оценки портфелей в базовой валюте.
+
+    :param base: Код базовой валюты
+    :type base: str
+    :return: Кэш
+    :rtype: ValuationCache
+    """
+
+    cache = _caches.get(base)
+    if cache is None:
+        cache = _caches[base] = ValuationCache(base)
+    return cache
+
+
+def record_commit(data_path: str,
+                  before: FileVersion,
+                  changes: dict[int, dict[str, int]]) -> None:
+    """
+    Передать записанные изменения кошельков всем кэшам оценки.
+
+    :param data_path: Путь к данным шарда
+    :type data_path: str
+    :param before: Версия portfolios.json до записи
+    :type before: FileVersion
+    :param changes: {ID пользователя: {валюта: баланс в мин. единицах}}
+    :type changes: dict[int, dict[str, int]]
+    """
+
+    for cache in _caches.values():
+        cache.record_commit(data_path, before, changes)
+
+
+def _on_rates_update(changes: dict[str, tuple[Optional[float], float]]) -> None:
+    """
+    Обработчик изменений курсов из хранилища.
+
+    :param changes: Изменения курсов
+    :type changes: dict[str, tuple[Optional[float], float]]
+    """
+
+    for cache in _caches.values():
+        cache.refresh_rates()
+
+
+def install() -> None:
+    """
+    Подключить кэши оценки к обновлениям кэша курсов.
+    """
+
+    add_rates_listener(_on_rates_update)
@@ -27,6 +27,15 @@ class SettingsLoader:
     
 
     def __init__(self) -> None:
+        """
+        Создать загрузчик. Сам файл конфигурации читается лениво,
+        при первом обращении к get(), а не во время импорта модуля.
+        """
+
+        return None
+
+
+    def _load(self) -> None:
         """
         Загрузить конфигурацию системы.
         """
@@ -65,6 +74,7 @@ class SettingsLoader:
         :rtype: Any
         """
 
+        self._load()
         if self._config is not None:
             return self._config.get(key, default)
 
@@ -1,6 +1,8 @@
+import threading
+import time
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import Any, Dict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
@@ -8,10 +10,57 @@ from valutatrade_hub.core.exceptions import ApiRequestError
 from valutatrade_hub.parser_service.config import ParserConfig
 
 
+class _RateLimiter:
+    """
+    Ограничитель частоты запросов, общий для всех потоков клиента.
+    """
+
+    def __init__(self, min_interval: float) -> None:
+        """
+        Создать ограничитель.
+
+        :param min_interval: Минимальный интервал между запросами, секунды
+        :type min_interval: float
+        """
+
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+
+    def acquire(self) -> None:
+        """
+        Дождаться очереди на запрос.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+    def delay(self, seconds: float) -> None:
+        """
+        Отложить все следующие запросы (например, по Retry-After).
+
+        :param seconds: Задержка, секунды
+        :type seconds: float
+        """
+
+        with self._lock:
+            self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
 class BaseApiClient(ABC):
     """
     Абстрактный базовый класс клиентского API.
     """
+
+    # Источник в записях истории и размер окна одного исторического запроса
+    SOURCE: str = 'Unknown'
+    HISTORY_WINDOW_SECONDS: int = 24 * 3600
     
     def __init__(self, config: ParserConfig) -> None:
         """
@@ -24,6 +73,37 @@ class BaseApiClient(ABC):
         if not config.EXCHANGERATE_API_KEY:
             raise ValueError('Добавьте API-ключ в переменную окружения.')
         self.config = config
+        self.limiter = _RateLimiter(0.0)
+
+
+    def _get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET-запрос с ограничением частоты и повтором при 429.
+
+        :param url: Адрес
+        :type url: str
+        :param params: Параметры запроса
+        :type params: Optional[Dict[str, Any]]
+        :return: Разобранный JSON ответа
+        :rtype: Any
+        """
+
+        for attempt in range(self.config.REQUEST_RETRIES + 1):
+            self.limiter.acquire()
+            try:
+                response = requests.get(url, params=params,
+                                        timeout=self.config.REQUEST_TIMEOUT)
+                if response.status_code == 429 and \
+                   attempt < self.config.REQUEST_RETRIES:
+                    retry_after = response.headers.get('Retry-After', '')
+                    self.limiter.delay(float(retry_after)
+                                       if retry_after.isdigit() else 2 ** attempt)
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                raise ApiRequestError(f"{self.SOURCE}: {e}")
+        raise ApiRequestError(f"{self.SOURCE}: превышен лимит запросов")
     
 
     @abstractmethod
@@ -37,7 +117,137 @@ class BaseApiClient(ABC):
         pass
 
 
+    def supports_history(self, pair: str) -> bool:
+        """
+        Может ли клиент загрузить историю пары.
+
+        :param pair: Пара (например, 'BTC_USD')
+        :type pair: str
+        :return: True, если история пары доступна
+        :rtype: bool
+        """
+
+        return False
+
+
+    def fetch_history(self,
+                      pair: str,
+                      start: datetime,
+                      end: datetime) -> List[Tuple[int, float]]:
+        """
+        Получить исторические курсы пары за окно [start, end).
+
+        :param pair: Пара
+        :type pair: str
+        :param start: Начало окна (UTC)
+        :type start: datetime
+        :param end: Конец окна (UTC)
+        :type end: datetime
+        :return: Точки (время в микросекундах от эпохи, курс)
+        :rtype: List[Tuple[int, float]]
+        """
+
+        raise ApiRequestError(f"{self.SOURCE}: история пары {pair} недоступна")
+
+
 class CoinGeckoClient(BaseApiClient):
+    SOURCE = 'CoinGecko'
+    # До 90 дней на запрос: провайдер отдаёт часовые точки
+    HISTORY_WINDOW_SECONDS = 90 * 24 * 3600
+
+    def __init__(self, config: ParserConfig) -> None:
+        """
+        Создать клиент CoinGecko.
+
+        :param config: Конфигурация парсера
+        :type config: ParserConfig
+        """
+
+        super().__init__(config)
+        self.limiter = _RateLimiter(config.COINGECKO_MIN_INTERVAL)
+
+
+    def supports_history(self, pair: str) -> bool:
+        """
+        История есть для криптовалют к фиатным валютам.
+
+        :param pair: Пара
+        :type pair: str
+        :return: True, если история пары доступна
+        :rtype: bool
+        """
+
+        from_code, _, to_code = pair.partition('_')
+        return from_code in self.config.CRYPTO_ID_MAP and \
+            to_code in (self.config.BASE_CURRENCY, *self.config.FIAT_CURRENCIES)
+
+
+    def fetch_history(self,
+                      pair: str,
+                      start: datetime,
+                      end: datetime) -> List[Tuple[int, float]]:
+        """
+        Получить исторические курсы с CoinGecko (/market_chart/range).
+
+        :param pair: Пара
+        :type pair: str
+        :param start: Начало окна (UTC)
+        :type start: datetime
+        :param end: Конец окна (UTC)
+        :type end: datetime
+        :return: Точки (время в микросекундах от эпохи, курс)
+        :rtype: List[Tuple[int, float]]
+        """
+
+        from_code, _, to_code = pair.partition('_')
+        url = self.config.COINGECKO_HISTORY_URL.format(
+            coin_id=self.config.CRYPTO_ID_MAP[from_code])
+        data = self._get(url, {'vs_currency': to_code.lower(),
+                               'from': int(start.timestamp()),
+                               'to': int(end.timestamp())})
+
+        return [(int(stamp_ms) * 1000, float(price))
+                for stamp_ms, price in data.get('prices', [])
+                if start.timestamp() * 1000 <= stamp_ms < end.timestamp() * 1000]
+
+
+    def fetch_markets(self, codes: List[str]) -> Dict[str, Any]:
+        """
+        Получить метаданные монет (название, капитализация, эмиссия) с
+        CoinGecko (/coins/markets): один запрос на MARKETS_PAGE_SIZE монет.
+
+        :param codes: Коды криптовалют
+        :type codes: List[str]
+        :return: {код: {name, market_cap, circulating_supply, total_supply,
+                        max_supply, updated_at}}
+        :rtype: Dict[str, Any]
+        """
+
+        id_to_code = {self.config.CRYPTO_ID_MAP[code]: code for code in codes
+                      if code in self.config.CRYPTO_ID_MAP}
+        ids = list(id_to_code)
+        size = self.config.MARKETS_PAGE_SIZE
+
+        markets = dict()
+        for start in range(0, len(ids), size):
+            data = self._get(self.config.COINGECKO_MARKETS_URL,
+                             {'vs_currency': self.config.BASE_CURRENCY.lower(),
+                              'ids': ','.join(ids[start:start + size]),
+                              'per_page': size,
+                              'page': 1})
+            for coin in data:
+                code = id_to_code.get(coin.get('id'))
+                if code is None:
+                    continue
+                markets[code] = {'name': coin.get('name'),
+                                 'market_cap': coin.get('market_cap'),
+                                 'circulating_supply': coin.get('circulating_supply'),
+                                 'total_supply': coin.get('total_supply'),
+                                 'max_supply': coin.get('max_supply'),
+                                 'updated_at': coin.get('last_updated')}
+        return markets
+
+
     def fetch_rates(self) -> Dict[str, Any]:
         """
         Получить курс валют с CoinGecko API.
@@ -88,6 +298,72 @@ class CoinGeckoClient(BaseApiClient):
 
 
 class ExchangeRateApiClient(BaseApiClient):
+    SOURCE = 'ExchangeRate-API'
+    # Исторический эндпоинт отдаёт один день на запрос
+    HISTORY_WINDOW_SECONDS = 24 * 3600
+
+    def __init__(self, config: ParserConfig) -> None:
+        """
+        Создать клиент ExchangeRate-API.
+
+        :param config: Конфигурация парсера
+        :type config: ParserConfig
+        """
+
+        super().__init__(config)
+        self.limiter = _RateLimiter(config.EXCHANGERATE_MIN_INTERVAL)
+
+
+    def supports_history(self, pair: str) -> bool:
+        """
+        История есть для пар фиатных валют.
+
+        :param pair: Пара
+        :type pair: str
+        :return: True, если история пары доступна
+        :rtype: bool
+        """
+
+        fiat = (self.config.BASE_CURRENCY, *self.config.FIAT_CURRENCIES)
+        from_code, _, to_code = pair.partition('_')
+        return from_code in fiat and to_code in fiat and from_code != to_code
+
+
+    def fetch_history(self,
+                      pair: str,
+                      start: datetime,
+                      end: datetime) -> List[Tuple[int, float]]:
+        """
+        Получить дневные курсы с ExchangeRate-API (/history).
+
+        :param pair: Пара
+        :type pair: str
+        :param start: Начало окна (UTC)
+        :type start: datetime
+        :param end: Конец окна (UTC)
+        :type end: datetime
+        :return: Точки (время в микросекундах от эпохи, курс)
+        :rtype: List[Tuple[int, float]]
+        """
+
+        from_code, _, to_code = pair.partition('_')
+        points = []
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < end:
+            if day >= start:
+                url = f"{self.config.EXCHANGERATE_API_URL}/"\
+                      f"{self.config.EXCHANGERATE_API_KEY}/history/{to_code}/"\
+                      f"{day.year}/{day.month}/{day.day}"
+                data = self._get(url)
+                if data.get('result') != 'success':
+                    raise ApiRequestError(f"{self.SOURCE}: {data.get('error-type')}")
+                rate = data.get('conversion_rates', {}).get(from_code)
+                if rate:
+                    points.append((int(day.timestamp() * 1_000_000), 1 / float(rate)))
+            day += timedelta(days=1)
+        return points
+
+
     def fetch_rates(self) -> Dict[str, Any]:
         """
         Получить курс валют с ExchangeRate-API.
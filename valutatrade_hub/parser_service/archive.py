@@ -0,0 +1,378 @@
+import json
+import lzma
+import os
+import struct
+import time
+import zlib
+from array import array
+from typing import Any, Iterable, Optional
+
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.snapshot import epoch_to_iso, iso_to_epoch
+
+# Формат сегмента архива истории (один файл - одна пара, один уровень):
+#   magic, длина метаданных (uint32), метаданные JSON, сжатые колонки.
+# Колонки: метки времени в микросекундах int64 (первая - абсолютная,
+# остальные - приращения), курсы float64, номера источников uint8
+# (словарь источников хранится в метаданных). Диапазон времени и пара
+# записаны и в имени файла, поэтому чтение по паре/интервалу не распаковывает
+# лишние сегменты.
+SEGMENT_MAGIC = b'VTHS'
+SEGMENT_SUFFIX = '.seg'
+_META_LENGTH = struct.Struct('<I')
+
+
+def _downsample(samples: list[tuple[int, float, str]],
+                bucket_seconds: int) -> list[tuple[int, float, str]]:
+    """
+    Оставить последнюю точку в каждом интервале bucket_seconds.
+
+    :param samples: Точки (время в мкс, курс, источник), отсортированные
+    :type samples: list[tuple[int, float, str]]
+    :param bucket_seconds: Ширина интервала, секунды (0 - без прореживания)
+    :type bucket_seconds: int
+    :return: Прореженные точки
+    :rtype: list[tuple[int, float, str]]
+    """
+
+    if bucket_seconds <= 0:
+        return samples
+    bucket_us = bucket_seconds * 1_000_000
+    result: dict[int, tuple[int, float, str]] = dict()
+    for sample in samples:
+        result[sample[0] // bucket_us] = sample
+    return [result[bucket] for bucket in sorted(result)]
+
+
+class HistoryArchive:
+    """
+    Сжатый колоночный архив истории курсов с уровнями хранения.
+    """
+
+    def __init__(self, config: Optional[ParserConfig] = None) -> None:
+        """
+        Создать архив.
+
+        :param config: Конфигурация парсера
+        :type config: Optional[ParserConfig]
+        """
+
+        self.config = config if config is not None else ParserConfig()
+        self.directory = self.config.HISTORY_ARCHIVE_DIR
+
+
+    def _segments(self,
+                  pair: Optional[str] = None,
+                  tier: Optional[str] = None,
+                  start_us: Optional[int] = None,
+                  end_us: Optional[int] = None) -> list[dict[str, Any]]:
+        """
+        Найти сегменты по имени файла (без распаковки).
+
+        :param pair: Пара
+        :type pair: Optional[str]
+        :param tier: Уровень хранения
+        :type tier: Optional[str]
+        :param start_us: Начало интервала, мкс
+        :type start_us: Optional[int]
+        :param end_us: Конец интервала, мкс
+        :type end_us: Optional[int]
+        :return: Описания сегментов (путь, пара, уровень, границы)
+        :rtype: list[dict[str, Any]]
+        """
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        segments = []
+        for name in names:
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            try:
+                seg_pair, seg_tier, bounds = name[:-len(SEGMENT_SUFFIX)].split('.')
+                first, last = (int(value) for value in bounds.split('-'))
+            except ValueError:
+                continue
+            if (pair is not None and seg_pair != pair) or \
+               (tier is not None and seg_tier != tier) or \
+               (start_us is not None and last < start_us) or \
+               (end_us is not None and first > end_us):
+                continue
+            segments.append({'path': os.path.join(self.directory, name),
+                             'pair': seg_pair,
+                             'tier': seg_tier,
+                             'first': first,
+                             'last': last})
+        return sorted(segments, key=lambda segment: (segment['pair'],
+                                                     segment['first']))
+
+
+    def write_segment(self,
+                      pair: str,
+                      tier: str,
+                      samples: list[tuple[int, float, str]]) -> Optional[str]:
+        """
+        Записать точки одной пары в новый сжатый сегмент.
+
+        :param pair: Пара
+        :type pair: str
+        :param tier: Уровень хранения
+        :type tier: str
+        :param samples: Точки (время в мкс, курс, источник)
+        :type samples: list[tuple[int, float, str]]
+        :return: Путь к сегменту (None, если точек нет)
+        :rtype: Optional[str]
+        """
+
+        if not samples:
+            return None
+        samples = sorted(samples)
+
+        # Сегмент с тем же диапазоном уже есть - объединить, а не затереть
+        name = f"{pair}.{tier}.{samples[0][0]}-{samples[-1][0]}{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            samples = sorted(set(samples) | set(self.read_segment(path)[1]))
+
+        sources = sorted({sample[2] for sample in samples})
+        source_index = {source: i for i, source in enumerate(sources)}
+        stamps = [sample[0] for sample in samples]
+        deltas = array('q', [stamps[0]] + [b - a for a, b in zip(stamps, stamps[1:])])
+        rates = array('d', [sample[1] for sample in samples])
+        codes = array('B', [source_index[sample[2]] for sample in samples])
+
+        payload = deltas.tobytes() + rates.tobytes() + codes.tobytes()
+        codec = self.config.HISTORY_ARCHIVE_CODEC
+        compressed = lzma.compress(payload) if codec == 'lzma' \
+            else zlib.compress(payload, 9)
+        meta = json.dumps({'pair': pair,
+                           'tier': tier,
+                           'count': len(samples),
+                           'codec': codec,
+                           'sources': sources}).encode('utf-8')
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'wb') as fp:
+            fp.write(SEGMENT_MAGIC)
+            fp.write(_META_LENGTH.pack(len(meta)))
+            fp.write(meta)
+            fp.write(compressed)
+        os.replace(tmp_file, path)
+        return path
+
+
+    @staticmethod
+    def read_segment(path: str) -> tuple[str, list[tuple[int, float, str]]]:
+        """
+        Прочитать и распаковать сегмент.
+
+        :param path: Путь к сегменту
+        :type path: str
+        :return: Пара и точки (время в мкс, курс, источник)
+        :rtype: tuple[str, list[tuple[int, float, str]]]
+        """
+
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        if data[:4] != SEGMENT_MAGIC:
+            raise ValueError(f'Неизвестный формат сегмента истории: {path}')
+
+        (meta_length,) = _META_LENGTH.unpack_from(data, 4)
+        meta_end = 4 + _META_LENGTH.size + meta_length
+        meta = json.loads(data[4 + _META_LENGTH.size:meta_end])
+        compressed = data[meta_end:]
+        payload = lzma.decompress(compressed) if meta['codec'] == 'lzma' \
+            else zlib.decompress(compressed)
+
+        count = meta['count']
+        deltas = array('q')
+        deltas.frombytes(payload[:8 * count])
+        rates = array('d')
+        rates.frombytes(payload[8 * count:16 * count])
+        codes = payload[16 * count:17 * count]
+
+        samples = []
+        stamp = 0
+        for delta, rate, code in zip(deltas, rates, codes):
+            stamp += delta
+            samples.append((stamp, rate, meta['sources'][code]))
+        return meta['pair'], samples
+
+
+    def load(self,
+             pair: Optional[str] = None,
+             start: Optional[str] = None,
+             end: Optional[str] = None) -> list[dict[str, Any]]:
+        """
+        Прочитать архивную историю в формате записей exchange_rates.json.
+
+        :param pair: Пара (None - все)
+        :type pair: Optional[str]
+        :param start: Начало интервала (ISO)
+        :type start: Optional[str]
+        :param end: Конец интервала (ISO)
+        :type end: Optional[str]
+        :return: Записи истории
+        :rtype: list[dict[str, Any]]
+        """
+
+        start_us = None if start is None else round(iso_to_epoch(start) * 1e6)
+        end_us = None if end is None else round(iso_to_epoch(end) * 1e6)
+
+        records = []
+        for segment in self._segments(pair, None, start_us, end_us):
+            seg_pair, samples = self.read_segment(segment['path'])
+            from_currency, _, to_currency = seg_pair.partition('_')
+            for stamp, rate, source in samples:
+                if (start_us is not None and stamp < start_us) or \
+                   (end_us is not None and stamp > end_us):
+                    continue
+                timestamp = epoch_to_iso(stamp / 1e6) + 'Z'
+                records.append({'id': f"{seg_pair}_{timestamp}",
+                                'from_currency': from_currency,
+                                'to_currency': to_currency,
+                                'rate': rate,
+                                'timestamp': timestamp,
+                                'source': source,
+                                'tier': segment['tier']})
+        return records
+
+
+    def compact(self,
+                history: list[dict[str, Any]],
+                now: Optional[float] = None) -> tuple[list[dict], dict[str, int]]:
+        """
+        Перенести устаревшие записи в архив согласно уровням хранения.
+
+        :param history: Сырые записи exchange_rates.json
+        :type history: list[dict[str, Any]]
+        :param now: Текущее время (эпоха), по умолчанию - time.time()
+        :type now: Optional[float]
+        :return: Записи, остающиеся сырыми, и статистика по уровням
+        :rtype: tuple[list[dict], dict[str, int]]
+        """
+
+        now = time.time() if now is None else now
+        tiers = self.config.HISTORY_TIERS
+        stats = {name: 0 for name, _, _ in tiers}
+
+        # 1. Сырые записи старше первого уровня уходят в архив
+        raw_age = tiers[0][2]
+        keep = []
+        expired: dict[str, list[tuple[int, float, str]]] = dict()
+        for record in history:
+            stamp = iso_to_epoch(record.get('timestamp'))
+            if stamp != stamp or now - stamp <= raw_age:
+                keep.append(record)
+                continue
+            pair = f"{record['from_currency']}_{record['to_currency']}"
+            expired.setdefault(pair, []).append(
+                (round(stamp * 1e6), float(record['rate']),
+                 record.get('source', 'Unknown')))
+        stats[tiers[0][0]] = len(keep)
+
+        for pair, samples in expired.items():
+            self._place(pair, samples, now, tiers, 1)
+
+        # 2. Сегменты промежуточных уровней, вышедшие за срок хранения,
+        #    прореживаются до следующего уровня
+        for level in range(1, len(tiers) - 1):
+            name, _, max_age = tiers[level]
+            cutoff_us = round((now - max_age) * 1e6)
+            for segment in self._segments(tier=name):
+                if segment['first'] >= cutoff_us:
+                    continue
+                pair, samples = self.read_segment(segment['path'])
+                os.remove(segment['path'])
+                self._place(pair, samples, now, tiers, level)
+
+        for segment in self._segments():
+            stats[segment['tier']] = stats.get(segment['tier'], 0) + \
+                self._count(segment['path'])
+        return keep, stats
+
+
+    def bulk_load(self,
+                  pair: str,
+                  samples: list[tuple[int, float, str]],
+                  now: Optional[float] = None) -> None:
+        """
+        Записать готовый блок точек сразу в сегменты архива (без сверки
+        с сырыми записями) - для загрузки исторических данных.
+
+        :param pair: Пара
+        :type pair: str
+        :param samples: Точки (время в мкс, курс, источник)
+        :type samples: list[tuple[int, float, str]]
+        :param now: Текущее время (эпоха), по умолчанию - time.time()
+        :type now: Optional[float]
+        """
+
+        now = time.time() if now is None else now
+        self._place(pair, samples, now, self.config.HISTORY_TIERS, 1)
+
+
+    def _place(self,
+               pair: str,
+               samples: list[tuple[int, float, str]],
+               now: float,
+               tiers: Iterable[tuple[str, int, Optional[int]]],
+               level: int) -> None:
+        """
+        Разложить точки по уровням начиная с level, прореживая каждую часть.
+
+        :param pair: Пара
+        :type pair: str
+        :param samples: Точки (время в мкс, курс, источник)
+        :type samples: list[tuple[int, float, str]]
+        :param now: Текущее время (эпоха)
+        :type now: float
+        :param tiers: Уровни хранения (имя, интервал, срок хранения)
+        :type tiers: Iterable[tuple[str, int, Optional[int]]]
+        :param level: Начальный уровень
+        :type level: int
+        """
+
+        tiers = list(tiers)
+        remaining = sorted(samples)
+        for name, bucket, max_age in tiers[level:]:
+            if max_age is None:
+                current, remaining = remaining, []
+            else:
+                cutoff_us = round((now - max_age) * 1e6)
+                current = [sample for sample in remaining if sample[0] >= cutoff_us]
+                remaining = [sample for sample in remaining if sample[0] < cutoff_us]
+            self.write_segment(pair, name, _downsample(current, bucket))
+            if not remaining:
+                break
+
+
+    @staticmethod
+    def _count(path: str) -> int:
+        """
+        Число точек в сегменте (из метаданных, без распаковки).
+
+        :param path: Путь к сегменту
+        :type path: str
+        :return: Число точек
+        :rtype: int
+        """
+
+        with open(path, 'rb') as fp:
+            header = fp.read(4 + _META_LENGTH.size)
+            (meta_length,) = _META_LENGTH.unpack_from(header, 4)
+            return json.loads(fp.read(meta_length))['count']
+
+
+    def disk_usage(self) -> int:
+        """
+        Суммарный размер сегментов архива.
+
+        :return: Размер в байтах
+        :rtype: int
+        """
+
+        return sum(os.path.getsize(segment['path']) for segment in self._segments())
@@ -0,0 +1,212 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service.api_clients import (
+    BaseApiClient,
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+)
+from valutatrade_hub.parser_service.archive import HistoryArchive
+from valutatrade_hub.parser_service.config import ParserConfig
+
+
+def parse_date(value: str) -> datetime:
+    """
+    Разобрать дату/время границы загрузки (без зоны - UTC).
+
+    :param value: Дата в ISO-формате (например, '2025-01-01')
+    :type value: str
+    :return: Момент времени в UTC
+    :rtype: datetime
+    """
+
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Некорректная дата '{value}'! Формат: ГГГГ-ММ-ДД.")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+class Backfiller:
+    """
+    Загрузка исторических курсов пары окнами, параллельно и с возобновлением.
+
+    Диапазон делится на окна размера HISTORY_WINDOW_SECONDS клиента; окна
+    загружаются в пуле потоков (частоту запросов ограничивает клиент),
+    каждое загруженное окно сразу пишется сегментом в архив истории
+    и отмечается в файле контрольной точки. Повторный запуск с теми же
+    параметрами пропускает уже загруженные окна.
+    """
+
+    def __init__(self,
+                 config: Optional[ParserConfig] = None,
+                 clients: Optional[list[BaseApiClient]] = None) -> None:
+        """
+        Создать загрузчик.
+
+        :param config: Конфигурация парсера
+        :type config: Optional[ParserConfig]
+        :param clients: Клиенты API (по умолчанию - CoinGecko и ExchangeRate-API)
+        :type clients: Optional[list[BaseApiClient]]
+        """
+
+        self.config = config if config is not None else ParserConfig()
+        self.clients = clients if clients is not None else \
+            [CoinGeckoClient(self.config), ExchangeRateApiClient(self.config)]
+        self.archive = HistoryArchive(self.config)
+
+
+    def client_for(self, pair: str) -> BaseApiClient:
+        """
+        Выбрать клиента, у которого есть история пары.
+
+        :param pair: Пара
+        :type pair: str
+        :return: Клиент API
+        :rtype: BaseApiClient
+        """
+
+        for client in self.clients:
+            if client.supports_history(pair):
+                return client
+        raise ValueError(f"История пары {pair} не поддерживается провайдерами!")
+
+
+    def _checkpoint_path(self, pair: str, start: datetime, end: datetime) -> str:
+        """
+        Путь к файлу контрольной точки задания.
+
+        :param pair: Пара
+        :type pair: str
+        :param start: Начало диапазона
+        :type start: datetime
+        :param end: Конец диапазона
+        :type end: datetime
+        :return: Путь к файлу
+        :rtype: str
+        """
+
+        name = f"{pair}_{int(start.timestamp())}-{int(end.timestamp())}.json"
+        return os.path.join(self.config.BACKFILL_DIR, name)
+
+
+    def _load_checkpoint(self, path: str) -> dict[str, Any]:
+        """
+        Прочитать контрольную точку (или пустую, если задание новое).
+
+        :param path: Путь к файлу
+        :type path: str
+        :return: Состояние задания
+        :rtype: dict[str, Any]
+        """
+
+        try:
+            with open(path, 'r') as fp:
+                return json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'done': [], 'points': 0}
+
+
+    @staticmethod
+    def _save_checkpoint(path: str, state: dict[str, Any]) -> None:
+        """
+        Атомарно сохранить контрольную точку.
+
+        :param path: Путь к файлу
+        :type path: str
+        :param state: Состояние задания
+        :type state: dict[str, Any]
+        """
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump(state, fp, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, path)
+
+
+    def run(self,
+            pair: str,
+            start: datetime,
+            end: datetime,
+            progress: Optional[Callable[[int, int, int], None]] = None
+            ) -> dict[str, Any]:
+        """
+        Загрузить историю пары за [start, end).
+
+        :param pair: Пара (например, 'BTC_USD')
+        :type pair: str
+        :param start: Начало диапазона (UTC)
+        :type start: datetime
+        :param end: Конец диапазона (UTC)
+        :type end: datetime
+        :param progress: Обработчик (загружено окон, всего окон, точек)
+        :type progress: Optional[Callable[[int, int, int], None]]
+        :return: Итог: окна всего/пропущено/загружено/с ошибкой, точки, ошибки
+        :rtype: dict[str, Any]
+        """
+
+        if start >= end:
+            raise ValueError('Начало диапазона должно быть раньше конца!')
+
+        client = self.client_for(pair)
+        step = timedelta(seconds=client.HISTORY_WINDOW_SECONDS)
+        windows = []
+        window_start = start
+        while window_start < end:
+            windows.append((window_start, min(window_start + step, end)))
+            window_start += step
+
+        path = self._checkpoint_path(pair, start, end)
+        state = self._load_checkpoint(path)
+        state.update(pair=pair, start=start.isoformat(), end=end.isoformat(),
+                     source=client.SOURCE)
+        done = set(state['done'])
+        pending = [window for window in windows
+                   if int(window[0].timestamp()) not in done]
+
+        result = {'windows': len(windows),
+                  'skipped': len(windows) - len(pending),
+                  'loaded': 0,
+                  'failed': 0,
+                  'errors': []}
+
+        executor = ThreadPoolExecutor(max_workers=self.config.BACKFILL_WORKERS)
+        try:
+            futures = {executor.submit(client.fetch_history, pair, *window): window
+                       for window in pending}
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    points = future.result()
+                except ApiRequestError as e:
+                    result['failed'] += 1
+                    result['errors'].append(f"{window[0].date()}: {e.reason}")
+                    continue
+
+                # Окно целиком уходит в архив, затем отмечается как загруженное:
+                # после прерывания оно не будет загружено повторно.
+                self.archive.bulk_load(pair, [(stamp, rate, client.SOURCE)
+                                              for stamp, rate in points])
+                done.add(int(window[0].timestamp()))
+                state['done'] = sorted(done)
+                state['points'] += len(points)
+                self._save_checkpoint(path, state)
+
+                result['loaded'] += 1
+                if progress is not None:
+                    progress(len(done), len(windows), state['points'])
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        else:
+            executor.shutdown()
+
+        result['points'] = state['points']
+        return result
@@ -9,6 +9,9 @@ class ParserConfig:
 
     # Эндпоинты
     COINGECKO_URL: str = "https://api.coingecko.com/api/v3/simple/price"
+    COINGECKO_HISTORY_URL: str = "https://api.coingecko.com/api/v3/coins/"\
+                                 "{coin_id}/market_chart/range"
+    COINGECKO_MARKETS_URL: str = "https://api.coingecko.com/api/v3/coins/markets"
     EXCHANGERATE_API_URL: str = "https://v6.exchangerate-api.com/v6"
 
     # Списки валют
@@ -23,7 +26,55 @@ class ParserConfig:
 
     # Пути
     RATES_FILE_PATH: str = "data/rates.json"
+    RATES_SNAPSHOT_PATH: str = "data/rates.bin"
+    RATES_STATS_PATH: str = "data/rate_stats.json"
+    CURRENCIES_FILE_PATH: str = "data/currencies.json"
     HISTORY_FILE_PATH: str = "data/exchange_rates.json"
+    HISTORY_ARCHIVE_DIR: str = "data/history/"
+
+    # Уровни хранения истории: (имя, интервал прореживания в секундах,
+    # срок хранения в секундах; None - бессрочно). Первый уровень - сырые
+    # записи exchange_rates.json, остальные - сжатые сегменты архива.
+    HISTORY_TIERS: tuple = (("raw", 0, 7 * 24 * 3600),
+                            ("1m", 60, 90 * 24 * 3600),
+                            ("1h", 3600, None))
+    # Сжатие сегментов архива: "zlib" или "lzma"
+    HISTORY_ARCHIVE_CODEC: str = "zlib"
 
     # Сетевые параметры
-    REQUEST_TIMEOUT: int = 10
\ No newline at end of file
+    REQUEST_TIMEOUT: int = 10
+    # Минимальный интервал между запросами к провайдеру, секунды
+    COINGECKO_MIN_INTERVAL: float = 2.5
+    EXCHANGERATE_MIN_INTERVAL: float = 0.5
+    # Повторы запроса при ответе 429 Too Many Requests
+    REQUEST_RETRIES: int = 3
+
+    # Метаданные валют (капитализация, эмиссия, названия): период обновления,
+    # секунды, и число монет в одном запросе /coins/markets (не больше 250)
+    METADATA_REFRESH_SECONDS: float = 12 * 3600
+    MARKETS_PAGE_SIZE: int = 250
+
+    # Загрузка исторических курсов (backfill)
+    BACKFILL_DIR: str = "data/backfill/"
+    BACKFILL_WORKERS: int = 4
+
+    # Рассылка обновлений курсов между узлами (publish-rates/subscribe-rates)
+    FANOUT_ADDRESS: str = os.getenv("VALUTATRADE_FANOUT_ADDRESS",
+                                    "127.0.0.1:8765")
+    FANOUT_INTERVAL_SECONDS: float = 60
+    # Сколько ждать отправки сообщения подписчику, прежде чем отключить его
+    FANOUT_SEND_TIMEOUT_SECONDS: float = 5
+
+    # Симулятор провайдеров (python -m valutatrade_hub.parser_service.simulator):
+    # если адрес задан, клиенты обращаются к нему, и API-ключ не нужен
+    SIMULATOR_URL: str = os.getenv("VALUTATRADE_SIMULATOR_URL", "")
+
+    def __post_init__(self) -> None:
+        if self.SIMULATOR_URL:
+            base = self.SIMULATOR_URL.rstrip('/')
+            self.COINGECKO_URL = f"{base}/api/v3/simple/price"
+            self.COINGECKO_HISTORY_URL = f"{base}/api/v3/coins/"\
+                                         "{coin_id}/market_chart/range"
+            self.COINGECKO_MARKETS_URL = f"{base}/api/v3/coins/markets"
+            self.EXCHANGERATE_API_URL = f"{base}/v6"
+            self.EXCHANGERATE_API_KEY = self.EXCHANGERATE_API_KEY or "simulator"
\ No newline at end of file
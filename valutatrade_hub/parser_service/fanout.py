@@ -0,0 +1,477 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Any, Optional
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+# Протокол: по одному JSON-сообщению на строку.
+#   {"type": "snapshot", "seq": N, "last_refresh": ..., "pairs": {...}}
+#       - полный кэш, отправляется подписчику сразу после подключения;
+#   {"type": "delta", "seq": N, "last_refresh": ..., "pairs": {...}}
+#       - только изменившиеся пары, seq растёт на единицу.
+# Пропуск seq означает потерю сообщения: подписчик переподключается
+# и получает полный снимок заново.
+
+
+def parse_address(address: str) -> tuple[int, Any]:
+    """
+    Разобрать адрес вида 'host:port' или 'unix:/path/to.sock'.
+
+    :param address: Адрес
+    :type address: str
+    :return: Семейство сокета и адрес для bind/connect
+    :rtype: tuple[int, Any]
+    """
+
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Некорректный адрес '{address}': ожидается host:port "
+                         "или unix:/путь")
+    return socket.AF_INET, (host, int(port))
+
+
+def _encode(message: dict[str, Any]) -> bytes:
+    """
+    Сериализовать сообщение протокола.
+
+    :param message: Сообщение
+    :type message: dict[str, Any]
+    :return: Строка JSON с переводом строки
+    :rtype: bytes
+    """
+
+    return (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class _SubscriberHandler(socketserver.BaseRequestHandler):
+    """
+    Обработчик подключения подписчика.
+    """
+
+    def handle(self) -> None:
+        """
+        Отправить полный снимок и держать соединение до отключения клиента.
+        """
+
+        publisher: RatesPublisher = self.server.publisher
+        publisher._attach(self.request)
+        try:
+            while True:
+                try:
+                    if not self.request.recv(1024):
+                        break
+                except socket.timeout:
+                    # Таймаут сокета нужен для отправки, а не для чтения
+                    continue
+        except OSError:
+            pass
+        finally:
+            publisher._detach(self.request)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    """
+    TCP-сервер публикатора (поток на подписчика).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        """
+        Сервер публикатора на Unix-сокете (поток на подписчика).
+        """
+
+        daemon_threads = True
+
+
+class RatesPublisher:
+    """
+    Рассылка обновлений кэша курсов подписчикам по TCP/Unix-сокету.
+
+    Состояние (пары, seq, список подписчиков) меняется под _lock, а
+    отправка идёт вне его: медленный подписчик не задерживает
+    подключение и отключение остальных. Порядок сообщений сохраняет
+    отдельная блокировка отправки. Подписчик, которому не удалось
+    отправить сообщение за send_timeout секунд, отключается и при
+    переподключении получает полный снимок.
+    """
+
+    def __init__(self, address: str, send_timeout: Optional[float] = None) -> None:
+        """
+        Запустить сервер публикации в фоновом потоке.
+
+        :param address: Адрес прослушивания ('host:port' или 'unix:/путь')
+        :type address: str
+        :param send_timeout: Таймаут отправки подписчику, секунды
+                             (по умолчанию - FANOUT_SEND_TIMEOUT_SECONDS)
+        :type send_timeout: Optional[float]
+        """
+
+        family, bind_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):
+                os.remove(bind_address)
+            self._server = _UnixServer(bind_address, _SubscriberHandler)
+        else:
+            self._server = _TCPServer(bind_address, _SubscriberHandler)
+        self._server.publisher = self
+
+        self.send_timeout = send_timeout if send_timeout is not None \
+            else ParserConfig().FANOUT_SEND_TIMEOUT_SECONDS
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._clients: list[socket.socket] = []
+        self._pairs: dict[str, dict] = dict()
+        self._last_refresh: Optional[str] = None
+        self._seq = 0
+
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+
+    @property
+    def address(self) -> Any:
+        """
+        Геттер.
+
+        :return: Фактический адрес сервера (порт известен и при bind на 0)
+        :rtype: Any
+        """
+
+        return self._server.server_address
+
+
+    @property
+    def n_subscribers(self) -> int:
+        """
+        Геттер.
+
+        :return: Число подключённых подписчиков
+        :rtype: int
+        """
+
+        with self._lock:
+            return len(self._clients)
+
+
+    def _send(self, clients: list[socket.socket], payload: bytes) -> None:
+        """
+        Отправить сообщение подписчикам (вне _lock) и отключить тех,
+        кому отправить не удалось.
+
+        :param clients: Сокеты подписчиков
+        :type clients: list[socket.socket]
+        :param payload: Сообщение
+        :type payload: bytes
+        """
+
+        failed = []
+        for client in clients:
+            try:
+                client.sendall(payload)
+            except OSError:
+                failed.append(client)
+        if not failed:
+            return None
+
+        with self._lock:
+            for client in failed:
+                if client in self._clients:
+                    self._clients.remove(client)
+        for client in failed:
+            # Сообщение могло уйти частично: соединение закрывается, и
+            # подписчик переподключается за полным снимком
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+    def _attach(self, client: socket.socket) -> None:
+        """
+        Зарегистрировать подписчика и отправить ему полный снимок.
+
+        :param client: Сокет подписчика
+        :type client: socket.socket
+        """
+
+        client.settimeout(self.send_timeout)
+        # Снимок уходит раньше следующей дельты: публикация ждёт _send_lock
+        with self._send_lock:
+            with self._lock:
+                payload = _encode({'type': 'snapshot',
+                                   'seq': self._seq,
+                                   'last_refresh': self._last_refresh,
+                                   'pairs': self._pairs})
+                self._clients.append(client)
+            self._send([client], payload)
+
+
+    def _detach(self, client: socket.socket) -> None:
+        """
+        Удалить подписчика.
+
+        :param client: Сокет подписчика
+        :type client: socket.socket
+        """
+
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+
+    def publish(self, rates: dict[str, Any]) -> int:
+        """
+        Разослать изменения кэша курсов всем подписчикам.
+
+        :param rates: Кэш курсов в формате rates.json
+        :type rates: dict[str, Any]
+        :return: Число изменившихся и удалённых пар
+        :rtype: int
+        """
+
+        pairs = rates.get('pairs', {})
+        with self._send_lock:
+            with self._lock:
+                delta = {rate_key: record for rate_key, record in pairs.items()
+                         if self._pairs.get(rate_key) != record}
+                removed = sorted(set(self._pairs) - set(pairs))
+                if not delta and not removed:
+                    return 0
+
+                self._pairs = dict(pairs)
+                self._last_refresh = rates.get('last_refresh')
+                self._seq += 1
+                seq, last_refresh = self._seq, self._last_refresh
+                clients = list(self._clients)
+            payload = _encode({'type': 'delta',
+                               'seq': seq,
+                               'last_refresh': last_refresh,
+                               'pairs': delta,
+                               'removed': removed})
+            self._send(clients, payload)
+        return len(delta) + len(removed)
+
+
+    def close(self) -> None:
+        """
+        Остановить сервер и отключить подписчиков.
+        """
+
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            for client in self._clients:
+                try:
+                    client.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self._clients.clear()
+
+
+class RatesSubscriber:
+    """
+    Подписчик: применяет полученные снимки и дельты к локальному кэшу курсов.
+    """
+
+    def __init__(self,
+                 address: str,
+                 storage: Optional[RatesStorage] = None) -> None:
+        """
+        Создать подписчика.
+
+        :param address: Адрес публикатора ('host:port' или 'unix:/путь')
+        :type address: str
+        :param storage: Локальное хранилище курсов
+        :type storage: Optional[RatesStorage]
+        """
+
+        self.address = address
+        self.storage = storage if storage is not None else RatesStorage()
+        self.seq: Optional[int] = None
+        self._stopped = threading.Event()
+
+
+    def _apply(self, message: dict[str, Any]) -> int:
+        """
+        Применить сообщение к локальному кэшу: снимок заменяет набор пар
+        (пар, которых в нём нет, у публикатора больше нет), дельта
+        обновляет пары и удаляет перечисленные в removed.
+
+        :param message: Снимок или дельта
+        :type message: dict[str, Any]
+        :return: Число обновлённых и удалённых пар
+        :rtype: int
+        """
+
+        pairs = message.get('pairs', {})
+        if message['type'] == 'snapshot':
+            removed = [rate_key for rate_key in self.storage.load_rates()
+                       .get('pairs', {}) if rate_key not in pairs]
+        else:
+            removed = message.get('removed', [])
+
+        n_changed = self.storage.remove_rates(removed) if removed else 0
+        rates = {rate_key: {'rate': record.get('rate', 0),
+                            'timestamp': record.get('updated_at', ''),
+                            'source': record.get('source', 'Unknown')}
+                 for rate_key, record in pairs.items()}
+        if rates:
+            n_changed += self.storage.save_rates(rates)
+        return n_changed
+
+
+    def listen_once(self, max_messages: Optional[int] = None) -> None:
+        """
+        Подключиться к публикатору и применять сообщения до разрыва связи
+        или пропуска номера сообщения.
+
+        :param max_messages: Остановиться после N сообщений (для тестов)
+        :type max_messages: Optional[int]
+        """
+
+        family, connect_address = parse_address(self.address)
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.connect(connect_address)
+            reader = sock.makefile('r', encoding='utf-8')
+            n_messages = 0
+            for line in reader:
+                message = json.loads(line)
+                if message['type'] == 'delta' and self.seq is not None and \
+                   message['seq'] != self.seq + 1:
+                    print(f"WARNING: Пропущены обновления (ожидался seq "
+                          f"{self.seq + 1}, получен {message['seq']}). "
+                          "Переподключение...")
+                    self.seq = None
+                    return None
+
+                n_updated = self._apply(message)
+                self.seq = message['seq']
+                print(f"INFO: Received {message['type']} #{message['seq']}: "
+                      f"{len(message.get('pairs', {}))} pairs, "
+                      f"{len(message.get('removed', []))} removed, "
+                      f"{n_updated} changed")
+
+                n_messages += 1
+                if self._stopped.is_set() or \
+                   (max_messages is not None and n_messages >= max_messages):
+                    return None
+
+
+    def run(self, retry_delay: float = 1.0) -> None:
+        """
+        Слушать публикатора, переподключаясь при обрывах.
+
+        :param retry_delay: Пауза перед переподключением, секунды
+        :type retry_delay: float
+        """
+
+        while not self._stopped.is_set():
+            try:
+                self.listen_once()
+            except OSError as e:
+                print(f"ERROR: Нет связи с публикатором {self.address}: {e}")
+            self.seq = None
+            self._stopped.wait(retry_delay)
+
+
+    def stop(self) -> None:
+        """
+        Остановить цикл подписчика.
+        """
+
+        self._stopped.set()
+
+
+def run_publisher(address: str,
+                  interval: float,
+                  source: Optional[str] = None) -> None:
+    """
+    Режим публикатора: периодически обновлять курсы из внешних API
+    и рассылать их подписчикам. Работает до Ctrl+C.
+
+    :param address: Адрес прослушивания
+    :type address: str
+    :param interval: Период обновления, секунды
+    :type interval: float
+    :param source: Клиент (coingecko, exchangerate или None - оба)
+    :type source: Optional[str]
+    """
+
+    from valutatrade_hub.parser_service.metadata import MetadataRefresher
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    updater = RatesUpdater()
+    refresher = MetadataRefresher(updater.config)
+    publisher = RatesPublisher(address)
+    publisher.publish(updater.storage.load_rates())
+    print(f"INFO: Publishing rates on {address} every {interval:g}s...")
+    try:
+        while True:
+            try:
+                updater.run_update(source)
+            except ApiRequestError as e:
+                print(f"ERROR: {e}")
+            # Метаданные валют обновляются редко, отдельно от курсов
+            try:
+                n_coins = refresher.refresh()
+                if n_coins:
+                    print(f"INFO: Refreshed metadata for {n_coins} currencies")
+            except ApiRequestError as e:
+                print(f"ERROR: {e}")
+            n_changed = publisher.publish(updater.storage.load_rates())
+            print(f"INFO: Published {n_changed} changed pairs "
+                  f"to {publisher.n_subscribers} subscribers")
+            time.sleep(interval)
+    finally:
+        publisher.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Запуск публикатора или подписчика отдельным процессом.
+
+    :param argv: Аргументы командной строки
+    :type argv: Optional[list[str]]
+    """
+
+    config = ParserConfig()
+    parser = argparse.ArgumentParser(description='Рассылка курсов валют')
+    parser.add_argument('mode', choices=['publish', 'subscribe'])
+    parser.add_argument('--address', default=config.FANOUT_ADDRESS)
+    parser.add_argument('--interval', type=float,
+                        default=config.FANOUT_INTERVAL_SECONDS)
+    args = parser.parse_args(argv)
+
+    # Оповещения, заявки и арбитраж проверяются на каждом узле по его локальному кэшу
+    from valutatrade_hub.core import alerts, conversion_graph, orders, recurring
+    alerts.install()
+    orders.install()
+    recurring.install()
+    conversion_graph.install()
+
+    try:
+        if args.mode == 'publish':
+            run_publisher(args.address, args.interval)
+        else:
+            RatesSubscriber(args.address).run()
+    except KeyboardInterrupt:
+        print('Остановлено.')
+
+
+if __name__ == '__main__':
+    main()
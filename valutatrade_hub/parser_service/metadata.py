@@ -0,0 +1,102 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from valutatrade_hub.core.currencies import (
+    CURRENCY_REGISTRY,
+    CryptoCurrency,
+    get_currency,
+    reload_currency_metadata,
+)
+from valutatrade_hub.parser_service.api_clients import CoinGeckoClient
+from valutatrade_hub.parser_service.config import ParserConfig
+
+
+class MetadataRefresher:
+    """
+    Обновление метаданных валют (название, капитализация, эмиссия).
+
+    Метаданные всех отслеживаемых монет запрашиваются у CoinGecko
+    пакетно (/coins/markets, до MARKETS_PAGE_SIZE монет на запрос) не
+    чаще раза в METADATA_REFRESH_SECONDS и записываются в файл реестра
+    валют (currencies.json); get_currency отдаёт их из памяти. Курсы
+    этим запросом не обновляются и не читаются.
+    """
+
+    def __init__(self, config: Optional[ParserConfig] = None) -> None:
+        """
+        Создать обновлятор метаданных.
+
+        :param config: Конфигурация парсера (по умолчанию - из окружения)
+        :type config: Optional[ParserConfig]
+        """
+
+        self.config = config if config is not None else ParserConfig()
+        self.coingecko = CoinGeckoClient(self.config)
+
+
+    def load(self) -> dict[str, Any]:
+        """
+        Загрузить файл реестра валют.
+
+        :return: last_refresh, source и currencies ({код: метаданные})
+        :rtype: dict[str, Any]
+        """
+
+        try:
+            with open(self.config.CURRENCIES_FILE_PATH, 'r') as fp:
+                return json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'last_refresh': None, 'currencies': {}}
+
+
+    def is_due(self, registry: Optional[dict[str, Any]] = None) -> bool:
+        """
+        Проверить, пора ли обновлять метаданные.
+
+        :param registry: Содержимое файла реестра (по умолчанию - из файла)
+        :type registry: Optional[dict[str, Any]]
+        :return: Флаг
+        :rtype: bool
+        """
+
+        registry = registry if registry is not None else self.load()
+        last_refresh = registry.get('last_refresh') or '2000-01-01T00:00:00'
+        return datetime.fromisoformat(last_refresh) < \
+            datetime.now() - timedelta(seconds=self.config.METADATA_REFRESH_SECONDS)
+
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Обновить метаданные всех криптовалют реестра, если подошёл срок.
+
+        :param force: Обновить независимо от срока
+        :type force: bool
+        :return: Число обновлённых валют (0, если срок не подошёл)
+        :rtype: int
+        """
+
+        registry = self.load()
+        if not force and not self.is_due(registry):
+            return 0
+
+        codes = [code for code in CURRENCY_REGISTRY
+                 if isinstance(get_currency(code), CryptoCurrency)]
+        markets = self.coingecko.fetch_markets(codes)
+
+        currencies = registry.get('currencies', {})
+        for code, record in markets.items():
+            currencies.setdefault(code, {}).update(
+                {key: value for key, value in record.items() if value is not None})
+        data = {'last_refresh': datetime.now().isoformat(),
+                'source': self.coingecko.SOURCE,
+                'currencies': currencies}
+
+        path = self.config.CURRENCIES_FILE_PATH
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump(data, fp, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, path)
+        reload_currency_metadata()
+        return len(markets)
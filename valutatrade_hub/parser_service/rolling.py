@@ -0,0 +1,400 @@
+import json
+import math
+import os
+from collections import deque
+from typing import Any, Optional
+
+# Окна скользящей статистики: имя → длина, секунды
+ROLLING_WINDOWS = {'1h': 3600, '24h': 24 * 3600, '7d': 7 * 24 * 3600}
+# Число записей журнала точек, после которого пересобирается снимок
+ROLLING_JOURNAL_LIMIT = 5000
+
+
+class RollingWindow:
+    """
+    Скользящая статистика курса одной пары за окно фиксированной длины.
+
+    Точки хранятся в очереди по времени; среднее и дисперсия ведутся
+    алгоритмом Уэлфорда (добавление и удаление точки - O(1)), минимум
+    и максимум - монотонными очередями. EMA - по числу точек: период N
+    равен числу точек в окне, вес новой точки - 2 / (N + 1), так что
+    запаздывание EMA совпадает с запаздыванием SMA того же окна (а пока
+    окно заполняется, EMA быстро догоняет курс). Каждая точка добавляется
+    и вытесняется ровно один раз, поэтому обновление - амортизированно O(1).
+    """
+
+    __slots__ = ('length', 'samples', 'lows', 'highs', 'mean', 'm2', 'ema')
+
+    def __init__(self, length: float) -> None:
+        """
+        Создать пустое окно.
+
+        :param length: Длина окна, секунды
+        :type length: float
+        """
+
+        self.length = length
+        self.samples: deque[tuple[float, float]] = deque()
+        self.lows: deque[tuple[float, float]] = deque()
+        self.highs: deque[tuple[float, float]] = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ema: Optional[float] = None
+
+
+    def add(self, moment: float, rate: float) -> None:
+        """
+        Добавить точку и вытеснить вышедшие из окна.
+
+        :param moment: Время точки (эпоха)
+        :type moment: float
+        :param rate: Курс
+        :type rate: float
+        """
+
+        self.samples.append((moment, rate))
+        count = len(self.samples)
+        delta = rate - self.mean
+        self.mean += delta / count
+        self.m2 += delta * (rate - self.mean)
+
+        while self.lows and self.lows[-1][1] >= rate:
+            self.lows.pop()
+        self.lows.append((moment, rate))
+        while self.highs and self.highs[-1][1] <= rate:
+            self.highs.pop()
+        self.highs.append((moment, rate))
+
+        self.evict(moment)
+        if self.ema is None:
+            self.ema = rate
+        else:
+            self.ema += 2 / (len(self.samples) + 1) * (rate - self.ema)
+
+
+    def evict(self, now: float) -> None:
+        """
+        Удалить точки старше now - length (последняя точка остаётся).
+
+        :param now: Текущее время (эпоха)
+        :type now: float
+        """
+
+        cutoff = now - self.length
+        while len(self.samples) > 1 and self.samples[0][0] < cutoff:
+            _, rate = self.samples.popleft()
+            count = len(self.samples)
+            delta = rate - self.mean
+            self.mean -= delta / count
+            self.m2 = max(self.m2 - delta * (rate - self.mean), 0.0)
+        while len(self.lows) > 1 and self.lows[0][0] < cutoff:
+            self.lows.popleft()
+        while len(self.highs) > 1 and self.highs[0][0] < cutoff:
+            self.highs.popleft()
+
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Текущие значения статистики окна.
+
+        :return: last, change_pct, sma, ema, min, max, stddev, count
+        :rtype: dict[str, Any]
+        """
+
+        first = self.samples[0][1]
+        last = self.samples[-1][1]
+        count = len(self.samples)
+        return {'last': last,
+                'change_pct': (last - first) / first * 100 if first else 0.0,
+                'sma': self.mean,
+                'ema': self.ema,
+                'min': self.lows[0][1],
+                'max': self.highs[0][1],
+                'stddev': math.sqrt(self.m2 / (count - 1)) if count > 1 else 0.0,
+                'count': count}
+
+
+    def to_record(self) -> dict[str, Any]:
+        """
+        Агрегаты окна для сохранения. Сами точки окна - хвост общей
+        очереди точек пары, поэтому сохраняется только их число.
+
+        :return: Запись окна
+        :rtype: dict[str, Any]
+        """
+
+        return {'length': self.length,
+                'count': len(self.samples),
+                'lows': list(self.lows),
+                'highs': list(self.highs),
+                'mean': self.mean,
+                'm2': self.m2,
+                'ema': self.ema}
+
+
+    @classmethod
+    def from_record(cls,
+                    length: float,
+                    record: Optional[dict[str, Any]],
+                    samples: list[tuple[float, float]]) -> 'RollingWindow':
+        """
+        Восстановить окно из сохранённых агрегатов. Если окна не было
+        или его длина изменилась, агрегаты пересчитываются по точкам пары,
+        а вышедшие из нового окна точки вытесняются.
+
+        :param length: Длина окна, секунды
+        :type length: float
+        :param record: Запись окна (None - окна в файле нет)
+        :type record: Optional[dict[str, Any]]
+        :param samples: Сохранённые точки пары по времени
+        :type samples: list[tuple[float, float]]
+        :return: Окно
+        :rtype: RollingWindow
+        """
+
+        window = cls(length)
+        if record is None or record.get('length') != length:
+            for moment, rate in samples:
+                window.add(moment, rate)
+            return window
+
+        window.samples = deque(samples[len(samples) - record['count']:])
+        window.lows = deque(tuple(sample) for sample in record['lows'])
+        window.highs = deque(tuple(sample) for sample in record['highs'])
+        window.mean = record['mean']
+        window.m2 = record['m2']
+        window.ema = record['ema']
+        return window
+
+
+class RollingStats:
+    """
+    Скользящая статистика по всем парам и окнам (файл рядом с rates.json).
+
+    Новые точки дописываются в журнал (*.journal рядом с файлом), поэтому
+    сохранение обновления стоит O(число новых точек), а не O(размер окна).
+    Снимок с агрегатами окон и одной общей на все окна пары очередью
+    точек пересобирается, когда журнал дорастает до ROLLING_JOURNAL_LIMIT
+    записей.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Создать пустую статистику.
+
+        :param path: Путь к файлу снимка
+        :type path: str
+        """
+
+        self.path = path
+        self.journal_path = f"{os.path.splitext(path)[0]}.journal"
+        self.pairs: dict[str, dict[str, RollingWindow]] = dict()
+        self._version: Optional[tuple[int, int, int]] = None
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._loaded = False
+
+
+    @classmethod
+    def load(cls, path: str) -> 'RollingStats':
+        """
+        Загрузить статистику из снимка и журнала (пустую, если их нет).
+
+        :param path: Путь к файлу снимка
+        :type path: str
+        :return: Статистика
+        :rtype: RollingStats
+        """
+
+        stats = cls(path)
+        stats.sync()
+        return stats
+
+
+    def exists(self) -> bool:
+        """
+        Проверить, сохранялась ли статистика.
+
+        :return: Флаг наличия снимка или журнала
+        :rtype: bool
+        """
+
+        return os.path.exists(self.path) or os.path.exists(self.journal_path)
+
+
+    def _file_version(self) -> Optional[tuple[int, int, int]]:
+        """
+        Версия снимка: (inode, mtime_ns, размер).
+
+        :return: Версия (или None, если снимка нет)
+        :rtype: Optional[tuple[int, int, int]]
+        """
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+    def _load_snapshot(self, version: Optional[tuple[int, int, int]]) -> None:
+        """
+        Перечитать снимок. Окна, которых больше нет в ROLLING_WINDOWS,
+        отбрасываются, новые и изменившие длину - пересчитываются.
+
+        :param version: Версия снимка
+        :type version: Optional[tuple[int, int, int]]
+        """
+
+        data = dict()
+        if version is not None:
+            try:
+                with open(self.path, 'r') as fp:
+                    data = json.load(fp)
+            except json.JSONDecodeError:
+                data = dict()
+
+        self.pairs = dict()
+        for pair, record in data.get('pairs', {}).items():
+            samples = [tuple(sample) for sample in record.get('samples', [])]
+            if not samples:
+                continue
+            windows = record.get('windows', {})
+            self.pairs[pair] = {name: RollingWindow.from_record(length,
+                                                                windows.get(name),
+                                                                samples)
+                                for name, length in ROLLING_WINDOWS.items()}
+        self._version = version
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._loaded = True
+
+
+    def sync(self) -> None:
+        """
+        Привести статистику в памяти к файлам: перечитать снимок, если он
+        изменился, и применить новые записи журнала.
+        """
+
+        version = self._file_version()
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            journal_size = 0
+
+        if not self._loaded or version != self._version or \
+           journal_size < self._journal_offset:
+            self._load_snapshot(version)
+        if journal_size == self._journal_offset:
+            return None
+
+        with open(self.journal_path, 'rb') as fp:
+            fp.seek(self._journal_offset)
+            for line in fp:
+                # Недописанная строка будет прочитана при следующей сверке
+                if not line.endswith(b'\n'):
+                    break
+                pair, moment, rate = json.loads(line)
+                self.add(pair, moment, rate)
+                self._journal_offset += len(line)
+                self._journal_lines += 1
+
+
+    def append(self, points: list[tuple[str, float, float]]) -> None:
+        """
+        Учесть новые точки и дописать их в журнал (при переполнении
+        журнала - пересобрать снимок).
+
+        :param points: (пара, время точки, курс)
+        :type points: list[tuple[str, float, float]]
+        """
+
+        added = [point for point in points if self.add(*point)]
+        if not added:
+            return None
+        if self._journal_lines + len(added) >= ROLLING_JOURNAL_LIMIT:
+            self.save()
+            return None
+
+        payload = ''.join(json.dumps(point) + '\n' for point in added)
+        with open(self.journal_path, 'a') as fp:
+            fp.write(payload)
+        self._journal_offset += len(payload.encode())
+        self._journal_lines += len(added)
+
+
+    def save(self) -> None:
+        """
+        Атомарно сохранить снимок статистики и очистить журнал.
+        """
+
+        pairs = dict()
+        for pair, windows in self.pairs.items():
+            # Точки всех окон пары - хвосты очереди самого полного окна
+            samples = max((window.samples for window in windows.values()),
+                          key=len)
+            pairs[pair] = {'samples': list(samples),
+                           'windows': {name: window.to_record()
+                                       for name, window in windows.items()}}
+        data = {'windows': ROLLING_WINDOWS, 'pairs': pairs}
+
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump(data, fp, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+        # Если процесс упадёт здесь, точки журнала уже учтены в снимке и
+        # при повторном применении будут пропущены как не новые
+        open(self.journal_path, 'w').close()
+        self._version = self._file_version()
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._loaded = True
+
+
+    def add(self, pair: str, moment: float, rate: float) -> bool:
+        """
+        Учесть новую точку пары во всех окнах.
+
+        :param pair: Пара
+        :type pair: str
+        :param moment: Время точки (эпоха)
+        :type moment: float
+        :param rate: Курс
+        :type rate: float
+        :return: False, если точка не новее последней учтённой
+        :rtype: bool
+        """
+
+        windows = self.pairs.get(pair)
+        if windows is None:
+            windows = self.pairs[pair] = {name: RollingWindow(length)
+                                          for name, length
+                                          in ROLLING_WINDOWS.items()}
+        if any(window.samples and window.samples[-1][0] >= moment
+               for window in windows.values()):
+            return False
+        for window in windows.values():
+            window.add(moment, rate)
+        return True
+
+
+    def summary(self,
+                pair: str,
+                now: Optional[float] = None) -> dict[str, dict[str, Any]]:
+        """
+        Статистика пары по всем окнам.
+
+        :param pair: Пара
+        :type pair: str
+        :param now: Вытеснить точки старше окна на этот момент (эпоха)
+        :type now: Optional[float]
+        :return: {окно: статистика} (пусто, если точек нет)
+        :rtype: dict[str, dict[str, Any]]
+        """
+
+        result = dict()
+        for name, window in self.pairs.get(pair, {}).items():
+            if now is not None:
+                window.evict(now)
+            result[name] = window.summary()
+        return result
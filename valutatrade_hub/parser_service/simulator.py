@@ -0,0 +1,368 @@
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from valutatrade_hub.parser_service.config import ParserConfig
+
+# Записанные ответы провайдеров, с которых начинается случайное блуждание
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@dataclass
+class SimulatorConfig:
+    # Адрес прослушивания (порт 0 - выбрать свободный)
+    HOST: str = "127.0.0.1"
+    PORT: int = 8900
+
+    # Задержка ответа: базовая и случайная добавка, миллисекунды
+    LATENCY_MS: float = 0.0
+    JITTER_MS: float = 0.0
+
+    # Доли запросов с ошибкой 429, ошибкой 5xx и зависанием
+    RATE_LIMIT_RATE: float = 0.0
+    SERVER_ERROR_RATE: float = 0.0
+    TIMEOUT_RATE: float = 0.0
+    # Сколько длится зависание (больше REQUEST_TIMEOUT клиента), секунды
+    HANG_SECONDS: float = 15.0
+    # Значение Retry-After в ответах 429, секунды
+    RETRY_AFTER_SECONDS: int = 1
+
+    # Случайное блуждание курсов: стандартное отклонение шага на запрос
+    VOLATILITY: float = 0.001
+    # Зерно генератора (одинаковое зерно - одинаковая последовательность)
+    SEED: int = 0
+
+
+class ProviderSimulator:
+    """
+    Локальный HTTP-сервер, отвечающий в форматах CoinGecko и ExchangeRate-API.
+
+    Отдаёт записанные ответы из fixtures/ с курсами, которые на каждый
+    запрос делают шаг случайного блуждания, и по настройкам добавляет
+    задержку, ответы 429/5xx и зависания.
+    """
+
+    def __init__(self, config: Optional[SimulatorConfig] = None) -> None:
+        """
+        Создать симулятор.
+
+        :param config: Настройки симулятора
+        :type config: Optional[SimulatorConfig]
+        """
+
+        self.config = config if config is not None else SimulatorConfig()
+        self.parser_config = ParserConfig()
+        self._random = random.Random(self.config.SEED)
+        self._lock = threading.Lock()
+
+        with open(os.path.join(FIXTURES_DIR, 'coingecko_simple_price.json')) as fp:
+            self._coingecko = json.load(fp)
+        with open(os.path.join(FIXTURES_DIR, 'exchangerate_latest.json')) as fp:
+            self._exchangerate = json.load(fp)
+        with open(os.path.join(FIXTURES_DIR, 'coingecko_markets.json')) as fp:
+            self._markets = {coin['id']: coin for coin in json.load(fp)}
+
+        # Текущие курсы к USD: криптовалюты - из CoinGecko, фиат - обратные
+        # к conversion_rates ExchangeRate-API
+        self._prices: dict[str, float] = {'USD': 1.0}
+        for code, coin_id in self.parser_config.CRYPTO_ID_MAP.items():
+            if coin_id in self._coingecko:
+                self._prices[code] = float(self._coingecko[coin_id]['usd'])
+        for code, rate in self._exchangerate['conversion_rates'].items():
+            if code != 'USD':
+                self._prices[code] = 1 / float(rate)
+        self._fixture_prices = dict(self._prices)
+
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0,
+                      'server_error': 0, 'timeout': 0}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+
+    @property
+    def url(self) -> str:
+        """
+        Базовый адрес симулятора (для ParserConfig.SIMULATOR_URL).
+
+        :return: Адрес вида http://хост:порт
+        :rtype: str
+        """
+
+        host, port = self._server.server_address[:2] if self._server is not None \
+            else (self.config.HOST, self.config.PORT)
+        return f"http://{host}:{port}"
+
+
+    def _step(self) -> dict[str, float]:
+        """
+        Сделать шаг случайного блуждания и вернуть курсы к USD.
+
+        :return: Курсы валют к USD
+        :rtype: dict[str, float]
+        """
+
+        with self._lock:
+            for code in self._prices:
+                if code != 'USD':
+                    self._prices[code] *= math.exp(
+                        self._random.gauss(0.0, self.config.VOLATILITY))
+            return dict(self._prices)
+
+
+    def _fault(self) -> Optional[str]:
+        """
+        Решить, какую ошибку внести в ответ (под блокировкой генератора).
+
+        :return: 'timeout', 'rate_limited', 'server_error' или None
+        :rtype: Optional[str]
+        """
+
+        with self._lock:
+            self.stats['requests'] += 1
+            roll = self._random.random()
+            delay = self.config.LATENCY_MS + \
+                self._random.uniform(0.0, self.config.JITTER_MS)
+
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        for name, rate in (('timeout', self.config.TIMEOUT_RATE),
+                           ('rate_limited', self.config.RATE_LIMIT_RATE),
+                           ('server_error', self.config.SERVER_ERROR_RATE)):
+            if roll < rate:
+                with self._lock:
+                    self.stats[name] += 1
+                return name
+            roll -= rate
+        return None
+
+
+    def _historic_price(self, code: str, moment: int) -> float:
+        """
+        Детерминированный исторический курс: одинаковые запросы получают
+        одинаковые данные.
+
+        :param code: Код валюты
+        :type code: str
+        :param moment: Эпоха (секунды)
+        :type moment: int
+        :return: Курс к USD
+        :rtype: float
+        """
+
+        rnd = random.Random(f"{self.config.SEED}:{code}:{moment}")
+        if code == 'USD':
+            return 1.0
+        return self._fixture_prices[code] * (1 + 0.05 * rnd.uniform(-1.0, 1.0))
+
+
+    def handle(self, path: str, query: dict[str, list[str]]) -> tuple[int, Any]:
+        """
+        Сформировать ответ на запрос (без внесения ошибок).
+
+        :param path: Путь запроса
+        :type path: str
+        :param query: Параметры запроса
+        :type query: dict[str, list[str]]
+        :return: Код ответа и тело (JSON)
+        :rtype: tuple[int, Any]
+        """
+
+        parts = [part for part in path.split('/') if part]
+        id_to_code = {coin_id: code for code, coin_id
+                      in self.parser_config.CRYPTO_ID_MAP.items()}
+
+        # CoinGecko: /api/v3/simple/price?ids=...&vs_currencies=...
+        if parts[:3] == ['api', 'v3', 'simple'] and parts[3:] == ['price']:
+            prices = self._step()
+            ids = query.get('ids', [''])[0].split(',')
+            vs = [code.upper() for code in
+                  query.get('vs_currencies', ['usd'])[0].split(',')]
+            return 200, {coin_id: {code.lower(): prices[id_to_code[coin_id]] /
+                                   prices[code]
+                                   for code in vs if code in prices}
+                         for coin_id in ids if coin_id in id_to_code}
+
+        # CoinGecko: /api/v3/coins/markets?vs_currency=...&ids=...
+        if parts[:3] == ['api', 'v3', 'coins'] and parts[3:] == ['markets']:
+            prices = self._step()
+            vs = query.get('vs_currency', ['usd'])[0].upper()
+            if vs not in prices:
+                return 400, {'error': 'invalid vs_currency'}
+            ids = query.get('ids', [''])[0].split(',')
+            now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            coins = []
+            for coin_id in ids:
+                if coin_id not in id_to_code or coin_id not in self._markets:
+                    continue
+                coin = dict(self._markets[coin_id])
+                price = prices[id_to_code[coin_id]] / prices[vs]
+                coin.update(current_price=price,
+                            market_cap=round(price * coin['circulating_supply']),
+                            last_updated=now)
+                coins.append(coin)
+            return 200, coins
+
+        # CoinGecko: /api/v3/coins/{id}/market_chart/range?vs_currency&from&to
+        if parts[:3] == ['api', 'v3', 'coins'] and \
+           parts[4:] == ['market_chart', 'range'] and parts[3] in id_to_code:
+            code = id_to_code[parts[3]]
+            vs = query.get('vs_currency', ['usd'])[0].upper()
+            start = int(float(query.get('from', ['0'])[0]))
+            end = int(float(query.get('to', ['0'])[0]))
+            if vs not in self._prices:
+                return 404, {'error': 'invalid vs_currency'}
+            first = -(-start // 3600) * 3600
+            return 200, {'prices': [[hour * 1000,
+                                     self._historic_price(code, hour) /
+                                     self._historic_price(vs, hour)]
+                                    for hour in range(first, end + 1, 3600)]}
+
+        # ExchangeRate-API: /v6/{key}/latest/{base}, /v6/{key}/history/{base}/Y/M/D
+        if parts[:1] == ['v6'] and len(parts) >= 4 and parts[2] in ('latest',
+                                                                    'history'):
+            base = parts[3]
+            if base not in self._prices:
+                return 404, {'result': 'error', 'error-type': 'unsupported-code'}
+
+            if parts[2] == 'latest':
+                prices = self._step()
+                moment = datetime.now(timezone.utc)
+            else:
+                try:
+                    year, month, day = (int(value) for value in parts[4:7])
+                    moment = datetime(year, month, day, tzinfo=timezone.utc)
+                except ValueError:
+                    return 400, {'result': 'error', 'error-type': 'malformed-request'}
+                prices = {code: self._historic_price(code, int(moment.timestamp()))
+                          for code in self._prices}
+
+            data = dict(self._exchangerate)
+            data.update(base_code=base,
+                        time_last_update_unix=int(moment.timestamp()),
+                        time_last_update_utc=moment.strftime(
+                            '%a, %d %b %Y %H:%M:%S +0000'),
+                        conversion_rates={code: prices[base] / price
+                                          for code, price in prices.items()})
+            return 200, data
+
+        return 404, {'error': 'not found'}
+
+
+    def start(self) -> str:
+        """
+        Запустить сервер в фоновом потоке.
+
+        :return: Базовый адрес симулятора
+        :rtype: str
+        """
+
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                fault = simulator._fault()
+                if fault == 'timeout':
+                    time.sleep(simulator.config.HANG_SECONDS)
+                    status, body, headers = 504, {'error': 'timeout'}, {}
+                elif fault == 'rate_limited':
+                    status, body = 429, {'error': 'Too Many Requests'}
+                    headers = {'Retry-After':
+                               str(simulator.config.RETRY_AFTER_SECONDS)}
+                elif fault == 'server_error':
+                    status, body, headers = 503, {'error': 'unavailable'}, {}
+                else:
+                    status, body = simulator.handle(url.path, parse_qs(url.query))
+                    headers = {'ETag': f'W/"{simulator.stats["requests"]}"'}
+                    if status == 200:
+                        with simulator._lock:
+                            simulator.stats['ok'] += 1
+
+                payload = json.dumps(body).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return None
+
+        self._server = ThreadingHTTPServer((self.config.HOST, self.config.PORT),
+                                           Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self.url
+
+
+    def stop(self) -> None:
+        """
+        Остановить сервер.
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Запуск симулятора провайдеров отдельным процессом.
+
+    :param argv: Аргументы командной строки
+    :type argv: Optional[list[str]]
+    """
+
+    defaults = SimulatorConfig()
+    parser = argparse.ArgumentParser(description='Симулятор провайдеров курсов')
+    parser.add_argument('--host', default=defaults.HOST)
+    parser.add_argument('--port', type=int, default=defaults.PORT)
+    parser.add_argument('--latency-ms', type=float, default=defaults.LATENCY_MS)
+    parser.add_argument('--jitter-ms', type=float, default=defaults.JITTER_MS)
+    parser.add_argument('--rate-limit-rate', type=float,
+                        default=defaults.RATE_LIMIT_RATE)
+    parser.add_argument('--server-error-rate', type=float,
+                        default=defaults.SERVER_ERROR_RATE)
+    parser.add_argument('--timeout-rate', type=float, default=defaults.TIMEOUT_RATE)
+    parser.add_argument('--volatility', type=float, default=defaults.VOLATILITY)
+    parser.add_argument('--seed', type=int, default=defaults.SEED)
+    args = parser.parse_args(argv)
+
+    simulator = ProviderSimulator(SimulatorConfig(
+        HOST=args.host, PORT=args.port,
+        LATENCY_MS=args.latency_ms, JITTER_MS=args.jitter_ms,
+        RATE_LIMIT_RATE=args.rate_limit_rate,
+        SERVER_ERROR_RATE=args.server_error_rate,
+        TIMEOUT_RATE=args.timeout_rate,
+        VOLATILITY=args.volatility, SEED=args.seed))
+    url = simulator.start()
+    print(f"Симулятор провайдеров запущен: {url}")
+    print(f"export VALUTATRADE_SIMULATOR_URL={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulator.stop()
+        print(f"Остановлено. Статистика: {simulator.stats}")
+
+
+if __name__ == '__main__':
+    main()
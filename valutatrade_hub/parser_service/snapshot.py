@@ -0,0 +1,286 @@
+import math
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from valutatrade_hub.core.utils import data_lock
+
+# Формат бинарного снимка курсов (little-endian):
+#   заголовок  - magic, версия формата, флаги, число валют N, seq (seqlock),
+#                эпоха последнего обновления, число пар;
+#   таблица    - N кодов валют по 8 байт ASCII (порядок реестра валют);
+#   курсы      - float64[N*N], ячейка [i*N + j] - курс i → j (NaN - нет пары);
+#   обновления - float64[N*N], эпоха обновления пары.
+# Писатель делает seq нечётным на время записи и чётным после неё; читатель
+# повторяет чтение, пока не увидит одинаковое чётное seq до и после.
+# Seqlock рассчитан на одного писателя: писатели (обновление курсов,
+# публикатор, восстановление из копии) работают под data_lock каталога.
+MAGIC = b'VTRS'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<4sHHIQdI4x')
+SEQ_OFFSET = struct.calcsize('<4sHHI')
+CODE_SIZE = 8
+FLAG_RETIRED = 1
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def iso_to_epoch(timestamp: Optional[str]) -> float:
+    """
+    Перевести ISO-строку (наивное время, возможно с 'Z') в эпоху.
+
+    :param timestamp: Метка времени
+    :type timestamp: Optional[str]
+    :return: Секунды от 1970-01-01 (NaN, если метки нет)
+    :rtype: float
+    """
+
+    if not timestamp:
+        return math.nan
+    moment = datetime.fromisoformat(timestamp.replace('Z', ''))
+    return (moment.replace(tzinfo=None) - _EPOCH).total_seconds()
+
+
+def epoch_to_iso(epoch: float) -> Optional[str]:
+    """
+    Перевести эпоху обратно в ISO-строку без потери микросекунд.
+
+    :param epoch: Секунды от 1970-01-01
+    :type epoch: float
+    :return: Метка времени (или None для NaN)
+    :rtype: Optional[str]
+    """
+
+    if math.isnan(epoch):
+        return None
+    return (_EPOCH + timedelta(microseconds=round(epoch * 1e6))).isoformat()
+
+
+def _layout_size(n_codes: int) -> int:
+    """
+    Размер файла снимка для N валют.
+
+    :param n_codes: Число валют
+    :type n_codes: int
+    :return: Размер в байтах
+    :rtype: int
+    """
+
+    return HEADER.size + n_codes * CODE_SIZE + 2 * 8 * n_codes * n_codes
+
+
+def write_snapshot(path: str, rates: dict[str, Any], codes: list[str]) -> None:
+    """
+    Опубликовать бинарный снимок курсов.
+
+    Если файл с тем же набором валют уже есть, он обновляется на месте под
+    seqlock (читатели с открытым mmap видят новые данные). Иначе создаётся
+    новый файл, а старый помечается как выведенный из обращения. Запись
+    идёт под блокировкой каталога снимка, поэтому писатели не
+    перемешивают шаги seqlock.
+
+    :param path: Путь к файлу снимка
+    :type path: str
+    :param rates: Кэш курсов в формате rates.json
+    :type rates: dict[str, Any]
+    :param codes: Коды валют в порядке реестра
+    :type codes: list[str]
+    """
+
+    n_codes = len(codes)
+    position = {code: i for i, code in enumerate(codes)}
+    values = [math.nan] * (n_codes * n_codes)
+    updated = [math.nan] * (n_codes * n_codes)
+    pair_count = 0
+
+    for rate_key, record in rates.get('pairs', {}).items():
+        from_code, _, to_code = rate_key.partition('_')
+        if from_code not in position or to_code not in position:
+            continue
+        cell = position[from_code] * n_codes + position[to_code]
+        values[cell] = float(record.get('rate', math.nan))
+        updated[cell] = iso_to_epoch(record.get('updated_at'))
+        pair_count += 1
+
+    table = b''.join(code.encode('ascii').ljust(CODE_SIZE, b'\0') for code in codes)
+    body = struct.pack(f'<{2 * n_codes * n_codes}d', *values, *updated)
+    refresh_epoch = iso_to_epoch(rates.get('last_refresh'))
+    with data_lock(os.path.dirname(path) or '.'):
+        _write_locked(path, n_codes, table, body, refresh_epoch, pair_count)
+
+
+def _write_locked(path: str,
+                  n_codes: int,
+                  table: bytes,
+                  body: bytes,
+                  refresh_epoch: float,
+                  pair_count: int) -> None:
+    """
+    Записать снимок (вызывается под data_lock каталога снимка).
+
+    :param path: Путь к файлу снимка
+    :type path: str
+    :param n_codes: Число валют
+    :type n_codes: int
+    :param table: Таблица кодов валют
+    :type table: bytes
+    :param body: Курсы и времена обновления
+    :type body: bytes
+    :param refresh_epoch: Эпоха последнего обновления кэша
+    :type refresh_epoch: float
+    :param pair_count: Число пар
+    :type pair_count: int
+    """
+
+    size = _layout_size(n_codes)
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        with open(path, 'r+b') as fp, mmap.mmap(fp.fileno(), size) as mm:
+            magic, version, _, old_n, seq, _, _ = HEADER.unpack_from(mm, 0)
+            same_layout = (magic == MAGIC and version == LAYOUT_VERSION and
+                           old_n == n_codes and
+                           mm[HEADER.size:HEADER.size + len(table)] == table)
+            if same_layout:
+                seq += 1 if seq % 2 == 0 else 0
+                struct.pack_into('<Q', mm, SEQ_OFFSET, seq)
+                mm[HEADER.size + len(table):size] = body
+                HEADER.pack_into(mm, 0, MAGIC, LAYOUT_VERSION, 0, n_codes,
+                                 seq + 1, refresh_epoch, pair_count)
+                mm.flush()
+                return None
+
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'wb') as fp:
+        fp.write(HEADER.pack(MAGIC, LAYOUT_VERSION, 0, n_codes, 0,
+                             refresh_epoch, pair_count))
+        fp.write(table)
+        fp.write(body)
+    _retire(path)
+    os.replace(tmp_file, path)
+
+
+def _retire(path: str) -> None:
+    """
+    Пометить существующий снимок как устаревший (читатели переоткроют файл).
+
+    :param path: Путь к файлу снимка
+    :type path: str
+    """
+
+    try:
+        with open(path, 'r+b') as fp, mmap.mmap(fp.fileno(), HEADER.size) as mm:
+            struct.pack_into('<H', mm, 6, FLAG_RETIRED)
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+
+
+class RatesSnapshot:
+    """
+    Читатель бинарного снимка курсов через mmap (без разбора JSON и копий).
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Открыть снимок.
+
+        :param path: Путь к файлу снимка
+        :type path: str
+        """
+
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._position: dict[str, int] = dict()
+        self._n_codes = 0
+        self._open()
+
+
+    def _open(self) -> None:
+        """
+        Отобразить файл в память и прочитать таблицу валют.
+        """
+
+        self.close()
+        with open(self.path, 'rb') as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, n_codes, _, _, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.close()
+            raise ValueError(f'Неизвестный формат снимка курсов: {self.path}')
+
+        self._n_codes = n_codes
+        self._position = dict()
+        for i in range(n_codes):
+            offset = HEADER.size + i * CODE_SIZE
+            code = bytes(self._mm[offset:offset + CODE_SIZE]).rstrip(b'\0')
+            self._position[code.decode('ascii')] = i
+
+
+    def close(self) -> None:
+        """
+        Закрыть отображение файла.
+        """
+
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+    def lookup(self, rate_key: str) -> tuple[Optional[dict], Optional[str]]:
+        """
+        Согласованно прочитать курс пары и время последнего обновления кэша.
+
+        :param rate_key: Ключ пары (например, 'BTC_USD')
+        :type rate_key: str
+        :return: Запись пары ({'rate', 'updated_at'} или None) и last_refresh
+        :rtype: tuple[Optional[dict], Optional[str]]
+        """
+
+        from_code, _, to_code = rate_key.partition('_')
+
+        while True:
+            if self._mm is None:
+                self._open()
+            seq, flags, refresh_epoch, rate, updated = self._read(from_code,
+                                                                  to_code)
+            if flags & FLAG_RETIRED:
+                self._open()
+                continue
+            if seq % 2 == 0 and struct.unpack_from('<Q', self._mm,
+                                                    SEQ_OFFSET)[0] == seq:
+                break
+            time.sleep(0)
+
+        last_refresh = epoch_to_iso(refresh_epoch)
+        if math.isnan(rate):
+            return None, last_refresh
+        return {'rate': rate, 'updated_at': epoch_to_iso(updated)}, last_refresh
+
+
+    def _read(self,
+              from_code: str,
+              to_code: str) -> tuple[int, int, float, float, float]:
+        """
+        Прочитать заголовок и ячейку пары (без проверки seqlock).
+
+        :param from_code: Исходная валюта
+        :type from_code: str
+        :param to_code: Целевая валюта
+        :type to_code: str
+        :return: seq, флаги, эпоха обновления кэша, курс, эпоха обновления пары
+        :rtype: tuple[int, int, float, float, float]
+        """
+
+        _, _, flags, _, seq, refresh_epoch, _ = HEADER.unpack_from(self._mm, 0)
+        i = self._position.get(from_code)
+        j = self._position.get(to_code)
+        if i is None or j is None:
+            return seq, flags, refresh_epoch, math.nan, math.nan
+
+        cells = self._n_codes * self._n_codes
+        offset = HEADER.size + self._n_codes * CODE_SIZE + 8 * (i * self._n_codes + j)
+        rate = struct.unpack_from('<d', self._mm, offset)[0]
+        updated = struct.unpack_from('<d', self._mm, offset + 8 * cells)[0]
+        return seq, flags, refresh_epoch, rate, updated
@@ -1,9 +1,122 @@
 import json
+import logging
 import os
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, Optional
 
+from valutatrade_hub.core.currencies import CURRENCY_REGISTRY
 from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.rolling import RollingStats
+from valutatrade_hub.parser_service.snapshot import (
+    RatesSnapshot,
+    iso_to_epoch,
+    write_snapshot,
+)
+
+# Открытые снимки курсов (путь → читатель), общие для всех экземпляров
+_snapshots: dict[str, RatesSnapshot] = dict()
+
+# Скользящая статистика в памяти (путь → статистика): в долгоживущем
+# процессе снимок не разбирается заново, дочитывается только журнал
+_rolling: dict[str, RollingStats] = dict()
+
+# Подписчики на изменения курсов: вызываются после каждого save_rates
+# со словарём {ключ пары: (старый курс или None, новый курс)}
+RatesListener = Callable[[dict[str, tuple[Optional[float], float]]], None]
+_listeners: list[RatesListener] = []
+
+# Отложенная установка подписчиков: вызывается один раз перед первой
+# рассылкой изменений, чтобы процесс, не записывающий курсы, не
+# импортировал движки оповещений, заявок и т. п.
+_setups: list[Callable[[], None]] = []
+
+
+def add_rates_listener(listener: RatesListener) -> None:
+    """
+    Подписаться на изменения курсов в кэше.
+    
+    :param listener: Обработчик изменений
+    :type listener: RatesListener
+    """
+
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def add_rates_setup(setup: Callable[[], None]) -> None:
+    """
+    Отложить установку подписчиков до первой записи изменений курсов.
+
+    :param setup: Функция, подключающая подписчиков (add_rates_listener)
+    :type setup: Callable[[], None]
+    """
+
+    if setup not in _setups:
+        _setups.append(setup)
+
+
+def remove_rates_listener(listener: RatesListener) -> None:
+    """
+    Отписаться от изменений курсов.
+    
+    :param listener: Обработчик изменений
+    :type listener: RatesListener
+    """
+
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _notify_listeners(changes: dict[str, tuple[Optional[float], float]]) -> None:
+    """
+    Передать изменения курсов подписчикам. Ошибка одного подписчика
+    не прерывает сохранение курсов и не мешает остальным.
+    
+    :param changes: Изменения курсов
+    :type changes: dict[str, tuple[Optional[float], float]]
+    """
+
+    while _setups:
+        setup = _setups.pop(0)
+        try:
+            setup()
+        except Exception as e:
+            logging.getLogger('base').error(
+                f"RATES_SETUP type='{e.__class__.__name__}' msg='{e}'")
+
+    for listener in list(_listeners):
+        try:
+            listener(changes)
+        except Exception as e:
+            logging.getLogger('base').error(
+                f"RATES_LISTENER type='{e.__class__.__name__}' msg='{e}'")
+
+
+def build_rates_index(pairs: dict[str, dict]) -> dict[str, dict[str, list[str]]]:
+    """
+    Построить индекс пар кэша курсов: by_base - исходные валюты каждой
+    целевой (базовой) валюты, by_from - целевые валюты каждой исходной.
+    Списки отсортированы по убыванию курса, поэтому топ курсов к базе -
+    срез списка, а разбор ключей и сортировка выполняются один раз при
+    сохранении курсов, а не при каждом показе.
+    
+    :param pairs: Пары кэша курсов
+    :type pairs: dict[str, dict]
+    :return: {'by_base': {база: [валюта, ...]}, 'by_from': {валюта: [база, ...]}}
+    :rtype: dict[str, dict[str, list[str]]]
+    """
+
+    by_base: dict[str, list[tuple[float, str]]] = dict()
+    by_from: dict[str, list[tuple[float, str]]] = dict()
+    for rate_key, record in pairs.items():
+        from_code, _, to_code = rate_key.partition('_')
+        rate = record.get('rate', 0)
+        by_base.setdefault(to_code, []).append((-rate, from_code))
+        by_from.setdefault(from_code, []).append((-rate, to_code))
+    return {'by_base': {code: [other for _, other in sorted(items)]
+                        for code, items in by_base.items()},
+            'by_from': {code: [other for _, other in sorted(items)]
+                        for code, items in by_from.items()}}
 
 
 class RatesStorage:
@@ -45,11 +158,11 @@ class RatesStorage:
         return rates
 
 
-    def load_exchange_rates(self) -> list[dict]:
+    def _load_raw_history(self) -> list[dict]:
         """
-        Загрузить историю курсов.
+        Загрузить сырые (ещё не заархивированные) записи истории курсов.
     
-        :return: Список истории курсов
+        :return: Список записей exchange_rates.json
         :rtype: list[dict]
         """
     
@@ -66,6 +179,71 @@ class RatesStorage:
             if fp is not None:
                 fp.close()
         return rates
+
+
+    def load_exchange_rates(self,
+                            pair: Optional[str] = None,
+                            start: Optional[str] = None,
+                            end: Optional[str] = None) -> list[dict]:
+        """
+        Загрузить историю курсов: сжатый архив и свежие сырые записи.
+    
+        :param pair: Пара (None - все)
+        :type pair: Optional[str]
+        :param start: Начало интервала (ISO)
+        :type start: Optional[str]
+        :param end: Конец интервала (ISO)
+        :type end: Optional[str]
+        :return: Список истории курсов
+        :rtype: list[dict]
+        """
+
+        from valutatrade_hub.parser_service.archive import HistoryArchive
+
+        history = HistoryArchive(self.config).load(pair, start, end)
+        start_epoch = None if start is None else iso_to_epoch(start)
+        end_epoch = None if end is None else iso_to_epoch(end)
+
+        for record in self._load_raw_history():
+            if pair is not None and \
+               f"{record['from_currency']}_{record['to_currency']}" != pair:
+                continue
+            if start_epoch is not None or end_epoch is not None:
+                stamp = iso_to_epoch(record.get('timestamp'))
+                if (start_epoch is not None and not stamp >= start_epoch) or \
+                   (end_epoch is not None and not stamp <= end_epoch):
+                    continue
+            history.append(record)
+        return history
+
+
+    def compact_history(self, now: Optional[float] = None) -> dict[str, Any]:
+        """
+        Перенести устаревшую историю в сжатый архив по уровням хранения.
+        
+        :param now: Текущее время (эпоха), по умолчанию - текущее
+        :type now: Optional[float]
+        :return: Число точек по уровням и размеры до/после, байты
+        :rtype: dict[str, Any]
+        """
+
+        from valutatrade_hub.parser_service.archive import HistoryArchive
+
+        archive = HistoryArchive(self.config)
+        path = self.config.HISTORY_FILE_PATH
+        size_before = (os.path.getsize(path) if os.path.exists(path) else 0) + \
+            archive.disk_usage()
+
+        keep, tiers = archive.compact(self._load_raw_history(), now)
+
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as fp:
+            json.dump(keep, fp, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, path)
+
+        return {'tiers': tiers,
+                'size_before': size_before,
+                'size_after': os.path.getsize(path) + archive.disk_usage()}
     
     
     def save_rates(self, rates: dict[str, Any]):
@@ -78,7 +256,9 @@ class RatesStorage:
 
         current_rates = self.load_rates()
         pairs = current_rates.get('pairs', {})
+        changes = dict()
         n_updated = 0
+        samples = []
 
         for rate_key, rate_value in rates.items():
             rate_record = {'rate': rate_value.get('rate', 0),
@@ -91,21 +271,118 @@ class RatesStorage:
                 datetime.fromisoformat(rate_value\
                                        .get('timestamp', '2000-01-01T00:00:01Z')\
                                        .replace('Z', '+00:00'))):
+                old_rate = pairs.get(rate_key, {}).get('rate')
                 pairs[rate_key] = rate_record
                 n_updated += 1
+                samples.append((rate_key, rate_record['updated_at'],
+                                rate_record['rate']))
+                if old_rate != rate_record['rate']:
+                    changes[rate_key] = (old_rate, rate_record['rate'])
         
-        current_time = datetime.now().isoformat()
+        self._write_cache(pairs)
+
+        if samples:
+            points = []
+            for rate_key, updated_at, rate in samples:
+                moment = iso_to_epoch(updated_at)
+                if moment == moment:
+                    points.append((rate_key, moment, float(rate)))
+            self.load_rolling_stats().append(points)
+
+        if changes:
+            _notify_listeners(changes)
+
+        return n_updated
+
+
+    def remove_rates(self, rate_keys: list[str]) -> int:
+        """
+        Удалить пары из кэша курсов (например, пропавшие у публикатора).
+
+        :param rate_keys: Ключи пар
+        :type rate_keys: list[str]
+        :return: Число удалённых пар
+        :rtype: int
+        """
+
+        pairs = self.load_rates().get('pairs', {})
+        removed = [rate_key for rate_key in rate_keys if rate_key in pairs]
+        if not removed:
+            return 0
+        for rate_key in removed:
+            del pairs[rate_key]
+        self._write_cache(pairs)
+        return len(removed)
+
+
+    def _write_cache(self, pairs: dict[str, dict]) -> None:
+        """
+        Записать кэш курсов (rates.json и бинарный снимок).
+
+        :param pairs: Пары кэша
+        :type pairs: dict[str, dict]
+        """
+
         data = {'pairs': pairs,
+                'index': build_rates_index(pairs),
                 'source': 'ParserService',
-                'last_refresh': current_time}
-   
-        tmp_file = f"{os.path.dirname(self.config.RATES_FILE_PATH)}.tmp"
+                'last_refresh': datetime.now().isoformat()}
 
+        tmp_file = f"{os.path.dirname(self.config.RATES_FILE_PATH)}.tmp"
         with open(tmp_file, 'w') as fp:
             json.dump(data, fp, indent=4, ensure_ascii=False)
         os.replace(tmp_file, self.config.RATES_FILE_PATH)
 
-        return n_updated
+        write_snapshot(self.config.RATES_SNAPSHOT_PATH, data,
+                       list(CURRENCY_REGISTRY))
+
+
+    def load_rolling_stats(self) -> RollingStats:
+        """
+        Загрузить скользящую статистику курсов (из памяти, дочитав новые
+        записи журнала). Если статистика ещё не сохранялась, она строится
+        по сырым записям истории (они покрывают самое длинное окно).
+        
+        :return: Статистика по парам
+        :rtype: RollingStats
+        """
+
+        path = self.config.RATES_STATS_PATH
+        stats = _rolling.get(path)
+        if stats is None:
+            stats = _rolling[path] = RollingStats(path)
+        stats.sync()
+
+        if not stats.pairs and not stats.exists():
+            history = sorted(((iso_to_epoch(record.get('timestamp')), record)
+                              for record in self._load_raw_history()
+                              if record.get('timestamp')),
+                             key=lambda item: item[0])
+            for moment, record in history:
+                stats.add(f"{record['from_currency']}_{record['to_currency']}",
+                          moment, float(record['rate']))
+            if stats.pairs:
+                stats.save()
+        return stats
+
+
+    def open_snapshot(self) -> Optional[RatesSnapshot]:
+        """
+        Открыть бинарный снимок курсов (отображение в память переиспользуется).
+        
+        :return: Читатель снимка (или None, если снимок ещё не опубликован)
+        :rtype: RatesSnapshot | None
+        """
+
+        path = self.config.RATES_SNAPSHOT_PATH
+        snapshot = _snapshots.get(path)
+        if snapshot is None:
+            try:
+                snapshot = RatesSnapshot(path)
+            except (FileNotFoundError, ValueError):
+                return None
+            _snapshots[path] = snapshot
+        return snapshot
 
     
     def save_exchange_rates(self, rates: dict[str, Any]):
@@ -116,8 +393,8 @@ class RatesStorage:
         :type rates: dict[str, Any]
         """
 
-        history = self.load_exchange_rates()
-        history_ids = [h['id'] for h in history]
+        history = self._load_raw_history()
+        history_ids = {h['id'] for h in history}
 
         for rate_key, rate_value in rates.items():
             from_currency, to_currency = rate_key.split('_')
@@ -139,5 +416,9 @@ class RatesStorage:
                 if record_id not in history_ids:
                     history.append(history_record)
         
-        with open(self.config.HISTORY_FILE_PATH, 'w') as fp:
+        # Атомарная запись: файл не меняется на месте, поэтому резервная
+        # копия может ссылаться на него жёсткой ссылкой
+        tmp_file = f"{self.config.HISTORY_FILE_PATH}.tmp"
+        with open(tmp_file, 'w') as fp:
             json.dump(history, fp, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.config.HISTORY_FILE_PATH)
@@ -15,12 +15,15 @@ class RatesUpdater:
     Точка входа для обновления курса валют.
     """
     
-    def __init__(self):
+    def __init__(self, config: Optional[ParserConfig] = None):
         """
         Инициализировать класс.
+        
+        :param config: Конфигурация парсера (по умолчанию - из окружения)
+        :type config: Optional[ParserConfig]
         """
 
-        self.config = ParserConfig()
+        self.config = config if config is not None else ParserConfig()
         
         self.coingecko = CoinGeckoClient(self.config)
         self.exchangerate = ExchangeRateApiClient(self.config)
@@ -0,0 +1,184 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Iterator, Optional
+
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+# Константы inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    """
+    Минимальная обёртка над inotify через ctypes (только Linux).
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Начать наблюдение за каталогом.
+
+        :param directory: Каталог
+        :type directory: str
+        """
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify недоступен')
+
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, 'inotify_add_watch')
+
+
+    def wait(self, timeout: Optional[float]) -> set[str]:
+        """
+        Дождаться событий в каталоге.
+
+        :param timeout: Таймаут ожидания, секунды (None - без таймаута)
+        :type timeout: Optional[float]
+        :return: Имена изменившихся файлов (пусто по таймауту)
+        :rtype: set[str]
+        """
+
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        names = set()
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            _, _, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+            names.add(os.fsdecode(name))
+        return names
+
+
+    def close(self) -> None:
+        """
+        Прекратить наблюдение.
+        """
+
+        os.close(self._fd)
+
+
+def _file_state(path: str) -> Optional[tuple[int, int, int]]:
+    """
+    Отпечаток файла для опроса по mtime.
+
+    :param path: Путь к файлу
+    :type path: str
+    :return: (inode, mtime_ns, размер) или None, если файла нет
+    :rtype: Optional[tuple[int, int, int]]
+    """
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def watch_rates(pairs: Optional[list[str]] = None,
+                initial: bool = False,
+                poll_interval: float = 1.0,
+                timeout: Optional[float] = None,
+                use_inotify: bool = True) -> Iterator[dict[str, dict]]:
+    """
+    Следить за кэшем курсов и выдавать только изменившиеся пары.
+
+    Ожидание блокируется на уведомлениях inotify об изменении каталога
+    с rates.json; если inotify недоступен, файл опрашивается по mtime.
+    Кэш перечитывается только после изменения файла.
+
+    :param pairs: Отслеживаемые пары (None - все)
+    :type pairs: Optional[list[str]]
+    :param initial: Выдать текущие значения пар перед ожиданием изменений
+    :type initial: bool
+    :param poll_interval: Период опроса mtime, секунды
+    :type poll_interval: float
+    :param timeout: Завершить наблюдение, если изменений нет столько секунд
+    :type timeout: Optional[float]
+    :param use_inotify: Использовать inotify, если он доступен
+    :type use_inotify: bool
+    :return: Итератор словарей {пара: {'old': запись|None, 'new': запись}}
+    :rtype: Iterator[dict[str, dict]]
+    """
+
+    storage = RatesStorage()
+    path = storage.config.RATES_FILE_PATH
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    notifier = None
+    if use_inotify:
+        try:
+            notifier = _Inotify(directory)
+        except (OSError, AttributeError):
+            notifier = None
+
+    def select_pairs(rates: dict) -> dict[str, dict]:
+        current = rates.get('pairs', {})
+        if pairs is None:
+            return current
+        return {key: current[key] for key in pairs if key in current}
+
+    try:
+        state = _file_state(path)
+        known = select_pairs(storage.load_rates())
+        if initial and known:
+            yield {key: {'old': None, 'new': record}
+                   for key, record in known.items()}
+
+        while True:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                remaining = None if deadline is None \
+                    else max(0.0, deadline - time.monotonic())
+                if deadline is not None and remaining == 0:
+                    return None
+
+                if notifier is not None:
+                    names = notifier.wait(remaining)
+                    if os.path.basename(path) not in names:
+                        continue
+                else:
+                    time.sleep(poll_interval if remaining is None
+                               else min(poll_interval, remaining))
+                new_state = _file_state(path)
+                if new_state != state:
+                    state = new_state
+                    break
+
+            current = select_pairs(storage.load_rates())
+            changed = {key: {'old': known.get(key), 'new': record}
+                       for key, record in current.items()
+                       if known.get(key, {}).get('rate') != record.get('rate')}
+            known = current
+            if changed:
+                yield changed
+    finally:
+        if notifier is not None:
+            notifier.close()